@@ -0,0 +1,54 @@
+import os
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Dict, Optional, Set
+
+# stage_profiler.py de la raíz del repositorio: TrainTSST_PVZ.py añade la raíz a sys.path
+from stage_profiler import PROFILE_ENV, PROFILE_EVERY_ENV, StageProfiler, parse_profile_spec
+
+# Perfilado por etapas de TrainTSST_PVZ.py. La implementación (StageProfiler, formato de
+# PVZ_PROFILE) es la de stage_profiler.py en la raíz; aquí solo se adapta a la configuración
+# y al logger de este script. Las etapas usan el nombre del Stage en minúsculas.
+
+
+@dataclass
+class ProfileConfig:
+    stages: Dict[str, Set[str]] = field(default_factory=dict)
+    every: int = 100
+    output_dir: str = 'profiles'
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            stages=parse_profile_spec(os.environ.get(PROFILE_ENV)),
+            every=max(1, int(os.environ.get(PROFILE_EVERY_ENV, 100)))
+        )
+
+    def modes_for(self, stage: str) -> Optional[Set[str]]:
+        return self.stages.get(stage) or self.stages.get('all')
+
+
+class ProfilingManager:
+    def __init__(self, config: ProfileConfig, logger):
+        self.config = config
+        self.logger = logger
+        self.active: Optional[StageProfiler] = None
+
+    @contextmanager
+    def profile_stage(self, stage: str):
+        modes = self.config.modes_for(stage)
+        if not modes or self.active is not None:
+            yield None
+            return
+
+        self.active = StageProfiler(stage, modes, self.config.every, self.config.output_dir, self.logger.info)
+        self.active.start()
+        try:
+            yield self.active
+        finally:
+            profiler, self.active = self.active, None
+            profiler.stop()
+
+    def tick(self):
+        if self.active is not None:
+            self.active.tick()
@@ -0,0 +1,50 @@
+import os
+import json
+import dataclasses
+from dataclasses import dataclass, field, fields
+from functools import cached_property
+from typing import List, Optional
+
+# Configuración de TrainTSST_PVZ.py. Se construye en el primer uso, no al importar: importar
+# el script no lista fuentes, no crea carpetas ni configura logs.
+# Prioridad: valores por defecto < variables de entorno < --config archivo.json < línea de comandos.
+# Las variables son las mismas que usa train_tesseract_pvz.py.
+ENV_VARS = {
+    'fonts_dir': 'PVZ_FONTS_DIR',
+    'output_dir': 'PVZ_OUTPUT_DIR',
+    'profile': 'PVZ_PROFILE'
+}
+
+
+@dataclass
+class TrainConfig:
+    fonts_dir: str = 'Fonts'
+    output_dir: str = 'output'
+    font_sizes: List[int] = field(default_factory=lambda: [9, 12, 16, 20, 24, 28, 32, 36, 40, 48, 56])
+    # Especificación de perfilado (formato de PVZ_PROFILE)
+    profile: Optional[str] = None
+    # Etapas a ejecutar (nombre del Stage en minúsculas); None reanuda desde progress.json
+    stages: Optional[List[str]] = None
+
+    @classmethod
+    def from_env(cls):
+        return cls(**{name: os.environ[variable] for name, variable in ENV_VARS.items() if os.environ.get(variable)})
+
+    def load(self, path):
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        return self.replace(**data)
+
+    def replace(self, **values):
+        unknown = set(values) - {f.name for f in fields(self)}
+        if unknown:
+            raise ValueError(f"Campos de configuración desconocidos: {', '.join(sorted(unknown))}")
+        if isinstance(values.get('stages'), str):
+            values['stages'] = [stage.strip() for stage in values['stages'].split(',') if stage.strip()]
+        return dataclasses.replace(self, **values)
+
+    @cached_property
+    def fonts(self):
+        if not os.path.isdir(self.fonts_dir):
+            return []
+        return [os.path.join(self.fonts_dir, f) for f in sorted(os.listdir(self.fonts_dir)) if f.endswith('.ttf')]
@@ -1,5 +1,7 @@
 import os
 import sys
+import argparse
+import logging
 from tqdm import tqdm
 import time
 from datetime import timedelta
@@ -10,30 +12,45 @@ from itertools import product
 
 script_dir = os.path.dirname(os.path.abspath(__file__))
 lib_dir = os.path.join(script_dir, 'Libs')
+repo_dir = os.path.dirname(script_dir)
 sys.path.append(lib_dir)
+sys.path.append(repo_dir)
 
 from Libs.colors import TEXT_COLORS, BG_COLORS
 from Libs.log_config import setup_logging
 from Libs.progress_tracker import ProgressTracker, Stage, StageStatus, ScriptStatus
+from Libs.profiling import ProfileConfig, ProfilingManager, parse_profile_spec
+from Libs.train_config import TrainConfig
 
-# Configuración
-FONTS_DIR = 'Fonts'
-fonts = [os.path.join(FONTS_DIR, f) for f in os.listdir(FONTS_DIR) if f.endswith('.ttf')]
-OUTPUT_DIR = 'output'
-FONT_SIZES = [9, 12, 16, 20, 24, 28, 32, 36, 40, 48, 56]
+# Importar el script no tiene efectos: configure() crea la salida, los logs y el perfilador.
+#   python TrainTSST_PVZ.py [--stages generate_training_data,process_unicharset]
+#                           [--config config.json] [--profile generate_training_data] [--dry-run]
+config = None
+logger = logging.getLogger()
+tracker = ProgressTracker()
+profiler = ProfilingManager(ProfileConfig(), logger)
 
-# Asegúrate de que el directorio de salida exista
-os.makedirs(OUTPUT_DIR, exist_ok=True)
+def get_config():
+    global config
+    if config is None:
+        config = TrainConfig.from_env()
+    return config
 
-# Inicializar el logger y el tracker de progreso
-logger = setup_logging()
-tracker = ProgressTracker()
+def configure(train_config):
+    global config, logger, profiler
+    config = train_config
+    os.makedirs(config.output_dir, exist_ok=True)
+    logger = setup_logging()
+    profile = ProfileConfig.from_env()
+    if config.profile is not None:
+        profile.stages = parse_profile_spec(config.profile)
+    profiler = ProfilingManager(profile, logger)
 
-def main_workflow():
-    def placeholder_function():
-        print("Función en proceso")
+def placeholder_function():
+    print("Función en proceso")
 
-    stages = [
+def workflow_stages():
+    return [
         (Stage.GENERATE_TRAINING_DATA, generate_training_data),
         (Stage.PROCESS_UNICHARSET, process_unicharset),
         (Stage.GENERATE_FONT_PROPERTIES, placeholder_function),
@@ -45,6 +62,26 @@ def main_workflow():
         (Stage.COMBINE_TRAINING_DATA, placeholder_function)
     ]
 
+def selected_stages(names):
+    stages = workflow_stages()
+    available = [stage.name.lower() for stage, _ in stages]
+    unknown = set(names) - set(available)
+    if unknown:
+        raise ValueError(f"Etapas desconocidas: {', '.join(sorted(unknown))} (disponibles: {', '.join(available)})")
+    return [(stage, function) for stage, function in stages if stage.name.lower() in names]
+
+def main_workflow():
+    if get_config().stages:
+        # --stages: solo esas etapas, aunque progress.json las marque como terminadas
+        for stage, stage_function in selected_stages(get_config().stages):
+            logger.info(f"Iniciando etapa: {stage.value}")
+            with profiler.profile_stage(stage.name.lower()):
+                stage_function()
+            logger.info(f"Etapa completada: {stage.value}")
+        logger.info("Etapas seleccionadas completadas.")
+        return
+
+    stages = workflow_stages()
     current_progress = tracker.load_progress()
     start_index = 0
 
@@ -60,7 +97,8 @@ def main_workflow():
             continue
         
         logger.info(f"Iniciando etapa: {stage.value}")
-        stage_function()
+        with profiler.profile_stage(stage.name.lower()):
+            stage_function()
         
         tracker.update_progress(
             stage=stage,
@@ -84,7 +122,8 @@ def generate_training_data():
 
     lines_per_image = 25
     image_width = 1600
-    font_sizes = [9, 12, 16, 20, 24, 28, 32, 36, 40, 48, 56]
+    fonts = get_config().fonts
+    font_sizes = get_config().font_sizes
 
     total_iterations = len(fonts) * len(font_sizes) * (len(training_text) // lines_per_image)
     start_time = time.time()
@@ -99,9 +138,10 @@ def generate_training_data():
                 image_height = lines_per_image * line_height
                 
                 for i in range(0, len(training_text), lines_per_image):
+                    profiler.tick()
                     text_block = training_text[i:i+lines_per_image]
                     
-                    subdir = os.path.join(OUTPUT_DIR, f"{font_name}_{font_size}")
+                    subdir = os.path.join(get_config().output_dir, f"{font_name}_{font_size}")
                     os.makedirs(subdir, exist_ok=True)
                     
                     file_name = f"pvz{i//lines_per_image:05d}"
@@ -171,20 +211,22 @@ def process_unicharset():
         return
 
     logger.info("Iniciando procesamiento de unicharset")
+    base_dir = get_config().output_dir
     
-    output_dir = os.path.join(OUTPUT_DIR, 'pvz_unicharset_files')
+    output_dir = os.path.join(base_dir, 'pvz_unicharset_files')
     os.makedirs(output_dir, exist_ok=True)
     
-    box_dirs = [d for d in os.listdir(OUTPUT_DIR) if os.path.isdir(os.path.join(OUTPUT_DIR, d))]
+    box_dirs = [d for d in os.listdir(base_dir) if os.path.isdir(os.path.join(base_dir, d))]
     
     for box_dir in tqdm(box_dirs, desc="Procesando directorios"):
-        box_files = [f for f in os.listdir(os.path.join(OUTPUT_DIR, box_dir)) if f.startswith('pvz') and f.endswith('.box')]
+        profiler.tick()
+        box_files = [f for f in os.listdir(os.path.join(base_dir, box_dir)) if f.startswith('pvz') and f.endswith('.box')]
         
         if not box_files:
             continue
         
         unicharset_file = os.path.join(output_dir, f"pvz_unicharset_{box_dir}")
-        box_file_paths = [os.path.join(OUTPUT_DIR, box_dir, f) for f in box_files]
+        box_file_paths = [os.path.join(base_dir, box_dir, f) for f in box_files]
         
         command = [
             "unicharset_extractor",
@@ -198,7 +240,7 @@ def process_unicharset():
         except subprocess.CalledProcessError as e:
             logger.error(f"Error al procesar {box_dir}: {e}")
     
-    final_unicharset = os.path.join(OUTPUT_DIR, 'pvz_final_unicharset')
+    final_unicharset = os.path.join(base_dir, 'pvz_final_unicharset')
     unicharset_files = [os.path.join(output_dir, f) for f in os.listdir(output_dir) if f.startswith('pvz_unicharset_')]
     
     command = [
@@ -223,8 +265,37 @@ def process_unicharset():
     )
 
 
-if __name__ == "__main__":
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Entrenamiento de Tesseract para PvZ (versión 2.0)")
+    parser.add_argument('--stages', help="Etapas a ejecutar, separadas por comas (nombre del Stage en minúsculas)")
+    parser.add_argument('--config', help="JSON con campos de TrainConfig (Libs/train_config.py)")
+    parser.add_argument('--profile', help="Etapas a perfilar, con el formato de PVZ_PROFILE")
+    parser.add_argument('--dry-run', action='store_true', help="Mostrar la configuración y las etapas sin ejecutar nada")
+    args = parser.parse_args(argv)
+
+    try:
+        train_config = TrainConfig.from_env()
+        if args.config:
+            train_config = train_config.load(args.config)
+        overrides = {key: value for key, value in (('stages', args.stages), ('profile', args.profile)) if value}
+        train_config = train_config.replace(**overrides)
+        stages = selected_stages(train_config.stages) if train_config.stages else workflow_stages()
+    except (OSError, ValueError) as e:
+        print(f"Configuración no válida: {e}")
+        return 2
+
+    if args.dry_run:
+        print(f"Fuentes: {len(train_config.fonts)} en {train_config.fonts_dir} - salida: {train_config.output_dir}")
+        print(f"Etapas: {', '.join(stage.name.lower() for stage, _ in stages)}")
+        return 0
+
+    configure(train_config)
     logger.info("Iniciando el script principal")
     print("Iniciando proceso de entrenamiento...")
     main_workflow()
     print("Proceso completado.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
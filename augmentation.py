@@ -0,0 +1,304 @@
+import io
+import os
+import sys
+import json
+import zlib
+import argparse
+from dataclasses import dataclass, asdict, fields
+from typing import Tuple
+import numpy as np
+from PIL import Image
+
+# Aumentado de las páginas de entrenamiento: el juego muestra texto borroso, escalado, con
+# contorno y sobre fondos con ruido, no el texto limpio que renderiza page_renderer.py.
+#
+# Cada página recibe un generador propio sembrado con (semilla, fuente, tamaño, página): la
+# misma configuración produce siempre las mismas imágenes, sin importar en qué proceso o en
+# qué orden se renderice. Las operaciones de píxel (rejilla de puntos, contorno, composición
+# de colores, desenfoque y ruido) se aplican con NumPy sobre lotes de páginas del mismo
+# tamaño; las geométricas (escala y perspectiva) y el JPEG van página a página con PIL y
+# transforman también las cajas del .box.
+#
+# La perspectiva mantiene horizontales los bordes superior e inferior: cada fila de texto
+# sigue siendo una fila con la misma altura en todas sus cajas (lstm_finetune.py agrupa las
+# líneas por esa altura).
+#
+#   PVZ_AUGMENT=0                        sin aumentado (solo la rejilla de puntos original)
+#   PVZ_AUGMENT_CONFIG=augmentation.json probabilidades y rangos propios (campos de AugmentConfig)
+#   python augmentation.py preview <fuente.ttf> --size 24 --pages 4 --output aumentado/
+
+DOT_COLOR = (211, 211, 211)
+DOT_SPACING = 10
+BLUR_PASSES = 2
+LEVELS = np.arange(256, dtype=np.float32) / 255
+
+
+@dataclass
+class AugmentConfig:
+    seed: int = 0
+    # Probabilidad por página de cada operación y su rango de parámetros
+    dots: float = 0.5
+    outline: float = 0.35
+    outline_width: Tuple[int, int] = (1, 2)
+    blur: float = 0.3
+    blur_radius: Tuple[int, int] = (1, 2)
+    noise: float = 0.3
+    noise_sigma: Tuple[float, float] = (4.0, 16.0)
+    jpeg: float = 0.25
+    jpeg_quality: Tuple[int, int] = (35, 85)
+    scale: float = 0.3
+    scale_range: Tuple[float, float] = (0.6, 1.5)
+    perspective: float = 0.2
+    # Desplazamiento máximo de cada esquina, en fracción del ancho / alto
+    perspective_jitter: float = 0.03
+
+    @classmethod
+    def off(cls, seed=0):
+        # Equivale al render anterior: solo la rejilla de puntos en la mitad de las páginas
+        return cls(seed=seed, outline=0.0, blur=0.0, noise=0.0, jpeg=0.0, scale=0.0, perspective=0.0)
+
+    @classmethod
+    def from_dict(cls, data):
+        # Los rangos llegan como listas desde JSON
+        return cls(**{key: tuple(value) if isinstance(value, list) else value for key, value in data.items()})
+
+    def to_dict(self):
+        return asdict(self)
+
+
+def load_config(path=None, enabled=True, seed=0):
+    if not enabled:
+        return AugmentConfig.off(seed)
+    if not path:
+        return AugmentConfig(seed=seed)
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    known = {f.name for f in fields(AugmentConfig)}
+    unknown = set(data) - known
+    if unknown:
+        raise ValueError(f"Campos desconocidos en {path}: {', '.join(sorted(unknown))}")
+    data.setdefault('seed', seed)
+    return AugmentConfig.from_dict(data)
+
+
+@dataclass
+class PageParams:
+    dots: bool = False
+    outline_width: int = 0
+    outline_color: Tuple[int, int, int] = (0, 0, 0)
+    blur_radius: int = 0
+    noise_sigma: float = 0.0
+    jpeg_quality: int = 0
+    scale: float = 1.0
+    # Desplazamientos hacia dentro: x de las cuatro esquinas (si, sd, id, ii), y de los bordes
+    perspective: Tuple[float, ...] = ()
+
+
+def page_rng(seed, font_key, font_size, page_index):
+    return np.random.default_rng([seed, zlib.crc32(font_key.encode('utf-8')), font_size, page_index])
+
+
+def contrast_color(color):
+    # Contorno oscuro para texto claro y viceversa, como los textos del juego
+    luminance = 0.299 * color[0] + 0.587 * color[1] + 0.114 * color[2]
+    return (0, 0, 0) if luminance > 128 else (255, 255, 255)
+
+
+def sample_params(config, rng, text_color):
+    # Siempre se consume el mismo número de valores: activar una operación no cambia las demás
+    draws = rng.random(7)
+    params = PageParams()
+    params.dots = draws[0] < config.dots
+    width = int(rng.integers(config.outline_width[0], config.outline_width[1] + 1))
+    if draws[1] < config.outline:
+        params.outline_width = width
+        params.outline_color = contrast_color(text_color)
+    radius = int(rng.integers(config.blur_radius[0], config.blur_radius[1] + 1))
+    if draws[2] < config.blur:
+        params.blur_radius = radius
+    sigma = float(rng.uniform(*config.noise_sigma))
+    if draws[3] < config.noise:
+        params.noise_sigma = sigma
+    quality = int(rng.integers(config.jpeg_quality[0], config.jpeg_quality[1] + 1))
+    if draws[4] < config.jpeg:
+        params.jpeg_quality = quality
+    # Escala log-uniforme: reducir a la mitad es tan probable como duplicar
+    scale = float(np.exp(rng.uniform(np.log(config.scale_range[0]), np.log(config.scale_range[1]))))
+    if draws[5] < config.scale:
+        params.scale = scale
+    jitter = tuple(rng.uniform(0, config.perspective_jitter, 6))
+    if draws[6] < config.perspective:
+        params.perspective = jitter
+    return params
+
+
+def dilate(alpha, radius):
+    # Máximo en una ventana cuadrada de (2r+1)², separable: primero en x y después en y.
+    # Con la cobertura del texto, el resultado es la del contorno
+    result = alpha.copy()
+    for axis in (2, 1):
+        source = result.copy()
+        for offset in range(1, radius + 1):
+            lead = [slice(None)] * 3
+            lag = [slice(None)] * 3
+            lead[axis], lag[axis] = slice(offset, None), slice(None, -offset)
+            np.maximum(result[tuple(lag)], source[tuple(lead)], out=result[tuple(lag)])
+            np.maximum(result[tuple(lead)], source[tuple(lag)], out=result[tuple(lead)])
+    return result
+
+
+def box_blur(images, radius):
+    # Media móvil de (2r+1) píxeles con sumas acumuladas, en y y en x; dos pasadas ~ gaussiana
+    for _ in range(BLUR_PASSES):
+        for axis in (1, 2):
+            pad = [(0, 0)] * images.ndim
+            pad[axis] = (radius + 1, radius)
+            summed = np.cumsum(np.pad(images, pad, mode='edge'), axis=axis, dtype=np.float32)
+            size = images.shape[axis]
+            upper = np.take(summed, np.arange(2 * radius + 1, 2 * radius + 1 + size), axis=axis)
+            lower = np.take(summed, np.arange(0, size), axis=axis)
+            images = (upper - lower) / (2 * radius + 1)
+    return images
+
+
+def shade_table(background, outline, text):
+    # (256, 256, 3): color de un píxel según la cobertura del contorno (fila) y del texto (columna)
+    background, outline, text = (np.asarray(color, dtype=np.float32) for color in (background, outline, text))
+    base = background + (outline - background) * LEVELS[:, None]
+    table = base[:, None, :] + (text - base)[:, None, :] * LEVELS[None, :, None]
+    return np.rint(table).astype(np.uint8)
+
+
+def to_uint8(pages):
+    np.clip(pages, 0, 255, out=pages)
+    return np.rint(pages, out=pages).astype(np.uint8)
+
+
+def compose_batch(masks, backgrounds, colors, params, rngs):
+    # masks: (N, alto, ancho) uint8 con la cobertura del texto; devuelve (N, alto, ancho, 3) uint8.
+    # Fondo, contorno y texto solo dependen de las dos coberturas: cada página se colorea con una
+    # tabla de 256x256 y todo el lote se resuelve con un único indexado
+    count = len(masks)
+    rings = masks.copy()
+    for width in sorted({p.outline_width for p in params if p.outline_width}):
+        group = [i for i in range(count) if params[i].outline_width == width]
+        rings[group] = dilate(masks[group], width)
+
+    # Sin contorno, su color es el del fondo y la cobertura del anillo no cambia nada
+    outline_colors = [params[i].outline_color if params[i].outline_width else backgrounds[i] for i in range(count)]
+    tables = np.stack([shade_table(backgrounds[i], outline_colors[i], colors[i]) for i in range(count)])
+    pages = tables[np.arange(count)[:, None, None], rings, masks]
+
+    dotted = [i for i in range(count) if params[i].dots]
+    if dotted:
+        # Los puntos de la rejilla son fondo gris claro bajo el contorno y el texto
+        dot_tables = np.stack([shade_table(DOT_COLOR, outline_colors[i] if params[i].outline_width else DOT_COLOR,
+                                           colors[i]) for i in dotted])
+        pages[dotted, ::DOT_SPACING, ::DOT_SPACING] = dot_tables[
+            np.arange(len(dotted))[:, None, None],
+            rings[dotted, ::DOT_SPACING, ::DOT_SPACING], masks[dotted, ::DOT_SPACING, ::DOT_SPACING]]
+
+    for radius in sorted({p.blur_radius for p in params if p.blur_radius}):
+        group = [i for i in range(count) if params[i].blur_radius == radius]
+        pages[group] = to_uint8(box_blur(pages[group].astype(np.float32), radius))
+
+    for i in range(count):
+        if params[i].noise_sigma:
+            # Ruido de luminancia: el mismo valor en los tres canales
+            noise = rngs[i].standard_normal(masks.shape[1:], dtype=np.float32)
+            noise *= params[i].noise_sigma
+            pages[i] = to_uint8(pages[i] + noise[..., None])
+    return pages
+
+
+def homography(source, target):
+    # Matriz 3x3 que lleva las 4 esquinas de source a las de target
+    rows, values = [], []
+    for (x, y), (u, v) in zip(source, target):
+        rows.append([x, y, 1, 0, 0, 0, -u * x, -u * y])
+        rows.append([0, 0, 0, x, y, 1, -v * x, -v * y])
+        values.extend([u, v])
+    h = np.linalg.solve(np.asarray(rows, dtype=np.float64), np.asarray(values, dtype=np.float64))
+    return np.append(h, 1.0).reshape(3, 3)
+
+
+def page_transform(params, width, height):
+    # Transformación directa (perspectiva y después escala) y tamaño final, o None si no hay
+    if params.scale == 1.0 and not params.perspective:
+        return None
+    matrix = np.eye(3)
+    if params.perspective:
+        x_tl, x_tr, x_br, x_bl, y_top, y_bottom = params.perspective
+        source = [(0, 0), (width, 0), (width, height), (0, height)]
+        target = [(x_tl * width, y_top * height), (width - x_tr * width, y_top * height),
+                  (width - x_br * width, height - y_bottom * height), (x_bl * width, height - y_bottom * height)]
+        matrix = homography(source, target)
+    size = (max(1, round(width * params.scale)), max(1, round(height * params.scale)))
+    matrix = np.diag([params.scale, params.scale, 1.0]) @ matrix
+    return matrix, size
+
+
+def transform_boxes(boxes, matrix, size):
+    # boxes: (n, 4) izq, arriba, der, abajo. Los bordes horizontales siguen horizontales, así
+    # que la y nueva solo depende de la y original: se calcula en x=0 para toda la fila
+    if not len(boxes):
+        return boxes
+    left, top, right, bottom = boxes.T
+    xs = np.stack([left, right, right, left])
+    ys = np.stack([top, top, bottom, bottom])
+    w = matrix[2, 0] * xs + matrix[2, 1] * ys + matrix[2, 2]
+    new_x = (matrix[0, 0] * xs + matrix[0, 1] * ys + matrix[0, 2]) / w
+    row_y = [(matrix[1, 1] * y + matrix[1, 2]) / (matrix[2, 1] * y + matrix[2, 2]) for y in (top, bottom)]
+    result = np.stack([new_x.min(axis=0), row_y[0], new_x.max(axis=0), row_y[1]], axis=1)
+    result = np.rint(result)
+    result[:, [0, 2]] = np.clip(result[:, [0, 2]], 0, size[0])
+    result[:, [1, 3]] = np.clip(result[:, [1, 3]], 0, size[1])
+    return result
+
+
+def finish_page(array, boxes, params, background):
+    # Escala/perspectiva y JPEG de una página ya compuesta; devuelve (imagen PIL, cajas)
+    image = Image.fromarray(array)
+    transform = page_transform(params, image.width, image.height)
+    if transform is not None:
+        matrix, size = transform
+        # PIL pide la transformación inversa: de la imagen de salida a la de entrada
+        inverse = np.linalg.inv(matrix)
+        inverse /= inverse[2, 2]
+        image = image.transform(size, Image.PERSPECTIVE, tuple(inverse.flatten()[:8]),
+                                resample=Image.BILINEAR, fillcolor=tuple(background))
+        boxes = transform_boxes(boxes, matrix, size)
+    if params.jpeg_quality:
+        buffer = io.BytesIO()
+        image.save(buffer, format='JPEG', quality=params.jpeg_quality)
+        buffer.seek(0)
+        image = Image.open(buffer).convert('RGB')
+    return image, boxes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Aumentado de las páginas de entrenamiento")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    preview = subparsers.add_parser('preview', help="Renderizar páginas de muestra con el aumentado")
+    preview.add_argument('font')
+    preview.add_argument('--size', type=int, default=24)
+    preview.add_argument('--pages', type=int, default=4)
+    preview.add_argument('--first-page', type=int, default=0)
+    preview.add_argument('--config', help="JSON con los campos de AugmentConfig")
+    preview.add_argument('--seed', type=int, default=0)
+    preview.add_argument('--corpus', default='tesseract_output/pvz.corpus')
+    preview.add_argument('--output', default='aumentado')
+    args = parser.parse_args()
+
+    # Importación diferida: page_renderer importa este módulo
+    from page_renderer import render_preview
+    config = load_config(args.config, seed=args.seed)
+    os.makedirs(args.output, exist_ok=True)
+    for path in render_preview(args.font, args.size, args.corpus, args.first_page, args.pages,
+                               args.output, config):
+        print(path)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,153 @@
+import os
+import sys
+import glob
+
+# Sustitutos rápidos de las herramientas de Tesseract para el benchmark.
+# Respetan las entradas/salidas que espera train_tesseract_pvz.py, pero sin entrenar nada.
+# Uso: fake_tools.py <herramienta> [argumentos de la herramienta real]
+
+TOOLS = ('tesseract', 'unicharset_extractor', 'shapeclustering', 'mftraining',
+         'cntraining', 'wordlist2dawg', 'combine_tessdata', 'lstmtraining')
+
+
+def parse_options(args, with_value):
+    options, positional = {}, []
+    i = 0
+    while i < len(args):
+        if args[i] in with_value:
+            options[args[i]] = args[i + 1]
+            i += 2
+        else:
+            positional.append(args[i])
+            i += 1
+    return options, positional
+
+
+def require(paths):
+    missing = [p for p in paths if not os.path.exists(p)]
+    if missing:
+        sys.stderr.write(f"No existe: {', '.join(missing)}\n")
+        sys.exit(1)
+
+
+def read_box_chars(box_path):
+    with open(box_path, 'r', encoding='utf-8') as f:
+        return [line.split(' ', 1)[0] for line in f if line.strip()]
+
+
+def fake_unicharset_extractor(args):
+    options, box_files = parse_options(args, {'--output_unicharset', '--norm_mode'})
+    require(box_files)
+    chars = set()
+    for box_file in box_files:
+        chars.update(read_box_chars(box_file))
+    with open(options.get('--output_unicharset', 'unicharset'), 'w', encoding='utf-8') as f:
+        f.write(f"{len(chars) + 1}\n")
+        f.write("NULL 0 Common 0\n")
+        for char in sorted(chars):
+            f.write(f"{char} 1 Han 0\n")
+
+
+def fake_tesseract(args):
+    image_path, output_base = args[0], args[1]
+    configs = args[2:]
+    require([image_path])
+    if 'box.train' in configs:
+        box_path = os.path.splitext(image_path)[0] + '.box'
+        require([box_path])
+        # Un .tr real contiene rasgos por carácter; aquí una línea por caja
+        with open(f"{output_base}.tr", 'w', encoding='utf-8') as f:
+            for char in read_box_chars(box_path):
+                f.write(f"{char} 0 0 0 0 " + '0' * 64 + "\n")
+    elif 'lstm.train' in configs:
+        box_path = os.path.splitext(image_path)[0] + '.box'
+        require([box_path])
+        with open(box_path, 'r', encoding='utf-8') as src, open(f"{output_base}.lstmf", 'w', encoding='utf-8') as dst:
+            dst.write(src.readline())
+    else:
+        with open(f"{output_base}.txt", 'w', encoding='utf-8') as f:
+            f.write("\n")
+
+
+def fake_shapeclustering(args):
+    options, tr_files = parse_options(args, {'-F', '-U', '-O', '-D'})
+    require(tr_files + [options['-U']])
+    with open(options.get('-O', 'shapetable'), 'w', encoding='utf-8') as f:
+        f.write(f"{len(tr_files)}\n")
+
+
+def fake_mftraining(args):
+    options, tr_files = parse_options(args, {'-F', '-X', '-U', '-O', '-D'})
+    require(tr_files + [options['-U']])
+    output_dir = options.get('-D', '.')
+    for name in ('inttemp', 'pffmtable', 'shapetable'):
+        with open(os.path.join(output_dir, name), 'w', encoding='utf-8') as f:
+            f.write(f"{name} {len(tr_files)}\n")
+    with open(options['-U'], 'r', encoding='utf-8') as src, open(options['-O'], 'w', encoding='utf-8') as dst:
+        dst.write(src.read())
+
+
+def fake_cntraining(args):
+    options, tr_files = parse_options(args, {'-F', '-U', '-O', '-D'})
+    require(tr_files)
+    with open(os.path.join(options.get('-D', '.'), 'normproto'), 'w', encoding='utf-8') as f:
+        f.write(f"normproto {len(tr_files)}\n")
+
+
+def fake_wordlist2dawg(args):
+    wordlist, dawg, unicharset = args[-3:]
+    require([wordlist, unicharset])
+    with open(wordlist, 'r', encoding='utf-8') as f:
+        words = sum(1 for line in f if line.strip())
+    with open(dawg, 'w', encoding='utf-8') as f:
+        f.write(f"dawg {words}\n")
+
+
+def fake_combine_tessdata(args):
+    if args[0] == '-e':
+        # Extracción de un componente: se copia el modelo completo
+        require([args[1]])
+        with open(args[1], 'rb') as src, open(args[2], 'wb') as dst:
+            dst.write(src.read())
+        return
+    prefix = args[-1]
+    components = sorted(p for p in glob.glob(f"{glob.escape(prefix)}*") if not p.endswith('traineddata'))
+    require([f"{prefix}unicharset"])
+    with open(f"{prefix}traineddata", 'wb') as dst:
+        for component in components:
+            if os.path.isfile(component):
+                with open(component, 'rb') as src:
+                    dst.write(src.read())
+
+
+def fake_lstmtraining(args):
+    options, _ = parse_options(args, {'--model_output', '--continue_from', '--traineddata', '--train_listfile',
+                                      '--eval_listfile', '--max_iterations', '--target_error_rate'})
+    require([options['--continue_from'], options['--traineddata']])
+    if '--stop_training' in args:
+        with open(options['--model_output'], 'w', encoding='utf-8') as f:
+            f.write("lstm traineddata\n")
+        return
+    require([options['--train_listfile']])
+    with open(options['--train_listfile'], 'r', encoding='utf-8') as f:
+        samples = [line.strip() for line in f if line.strip()]
+    require(samples)
+    # Mismo formato de progreso que lstmtraining, cada 100 iteraciones
+    iterations = int(options.get('--max_iterations', 100))
+    for iteration in range(100, iterations + 1, 100):
+        sys.stderr.write(f"At iteration {iteration}/{iteration}/{iteration}, Mean rms=0.5%, delta=1%, "
+                         f"BCER train={100.0 / iteration:.3f}%, BWER train=5%, skip ratio=0%\n")
+    with open(f"{options['--model_output']}_checkpoint", 'w', encoding='utf-8') as f:
+        f.write(f"checkpoint {iterations}\n")
+
+
+def main():
+    tool, args = sys.argv[1], sys.argv[2:]
+    if tool not in TOOLS:
+        sys.stderr.write(f"Herramienta desconocida: {tool}\n")
+        sys.exit(2)
+    globals()[f"fake_{tool}"](args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+import os
+import sys
+import numpy as np
+
+# Comprobaciones de regresión sin Tesseract ni ventana: simulan fotogramas y lecturas de OCR
+# (estabilizador) y consultas de la memoria de traducción para los casos que ya fallaron
+# una vez. Devuelve 1 si alguna falla.
+#
+#   python benchmarks/regression_checks.py
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(BENCHMARK_DIR)
+sys.path.insert(0, REPO_ROOT)
+
+from ocr_engine import OcrLine
+from frame_change import ChangeDetector
+from text_stabilizer import TextStabilizer
+from translation_memory import TranslationMemory, bounded_levenshtein, normalize
+
+# Filtro de bigramas de la memoria de traducción: (glosario, consulta, traducción esperada).
+# Las líneas con caracteres repetidos (habituales en el texto del juego) se descartaban al
+# contar los bigramas repetidos una sola vez
+MEMORY_CASES = [
+    ([('aaaaaa', 'A'), ('哈哈哈哈哈', 'JA')], 'aaaaab', 'A'),
+    ([('aaaaaa', 'A'), ('哈哈哈哈哈', 'JA')], '哈哈哈哈哈哈', 'JA'),
+    ([('aaaaaa', 'A'), ('哈哈哈哈哈', 'JA')], '哈哈哈哈', 'JA'),
+    ([('啊啊啊僵尸来了', 'Ahh, zombies')], '啊啊啊啊僵尸来了', 'Ahh, zombies'),
+    ([('阳光阳光阳光', 'Sol sol sol')], '阳光阳光阳', 'Sol sol sol')
+]
+
+
+def scene(value):
+    # Fotograma en gris con un bloque de texto "pintado" con el valor dado
+    gray = np.zeros((180, 320), dtype=np.uint8)
+    gray[40:80, 40:280] = value
+    return gray
+
+
+def replay(frames, readings):
+    # Mismo criterio que interceptor.run_sync: OCR si el detector ve cambios o si el
+    # estabilizador espera lecturas; devuelve los textos mostrados tras cada fotograma
+    detector = ChangeDetector('diff')
+    stabilizer = TextStabilizer(str.upper, history=3, min_votes=2)
+    shown, labels = [], []
+    for gray, reading in zip(frames, readings):
+        if detector.has_changed(gray) or stabilizer.pending:
+            lines = [OcrLine(reading, 40, 40, 240, 40)] if reading else []
+            labels, _ = stabilizer.update(lines)
+        shown.append([translation for translation, _ in labels])
+    return shown
+
+
+def check_change_then_static():
+    # "hola" cambia en el sitio a "adios" y la pantalla queda quieta
+    frames = [scene(200)] * 3 + [scene(90)] * 10
+    readings = ['hola'] * 3 + ['adios'] * 10
+    shown = replay(frames, readings)
+    return shown[-1] == ['ADIOS'], f"tras el cambio se muestra {shown[-1]}"
+
+
+def check_disappear_then_static():
+    # La línea desaparece y la pantalla queda vacía
+    frames = [scene(200)] * 3 + [scene(0)] * 10
+    readings = ['hola'] * 3 + [None] * 10
+    shown = replay(frames, readings)
+    return shown[-1] == [], f"tras desaparecer se muestra {shown[-1]}"
+
+
+def check_noise_is_filtered():
+    # Una lectura errónea aislada no cambia la traducción
+    frames = [scene(200)] * 3 + [scene(120)] * 10
+    readings = ['hola'] * 3 + ['hoIa'] + ['hola'] * 9
+    shown = replay(frames, readings)
+    return all(labels == ['HOLA'] for labels in shown), f"se mostró {shown}"
+
+
+def brute_force_lookup(memory, text):
+    # Misma respuesta que TranslationMemory.lookup sin índice: referencia para el filtro
+    key = normalize(text)
+    limit = memory.distance_limit(key)
+    best = None
+    for source, target in zip(memory.sources, memory.targets):
+        distance = bounded_levenshtein(key, source, limit)
+        if distance <= limit and (best is None or distance < best[1]):
+            best = (target, distance)
+    return best
+
+
+def check_repeated_characters():
+    failures = []
+    for entries, text, expected in MEMORY_CASES:
+        memory = TranslationMemory(entries)
+        match = memory.lookup(text)
+        reference = brute_force_lookup(memory, text)
+        if match is None or match[0] != expected or match[1] != reference[1]:
+            failures.append(f"{text!r} -> {match!r} (se esperaba {expected!r})")
+    return not failures, '; '.join(failures)
+
+
+CHECKS = [
+    check_change_then_static,
+    check_disappear_then_static,
+    check_noise_is_filtered,
+    check_repeated_characters
+]
+
+
+def main():
+    failures = 0
+    for check in CHECKS:
+        ok, detail = check()
+        print(f"{'ok   ' if ok else 'FALLO'} {check.__name__}{'' if ok else ': ' + detail}")
+        failures += not ok
+    print(f"{len(CHECKS) - failures}/{len(CHECKS)} comprobaciones correctas")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,108 @@
+import os
+import sys
+import json
+import time
+import argparse
+
+# Benchmark del interceptor sobre fotogramas grabados, sin ventana (sirve en Linux).
+# Reproduce un directorio de capturas (o un vídeo) con el mismo bucle que interceptor.main
+# y mide fps, latencia captura -> traducción (p50/p95/p99), tiempos por etapa y aciertos
+# de las cachés de OCR y de etiquetas.
+#
+#   python benchmarks/replay_benchmark.py capturas/ --workers 2 --output replay.json
+#   python benchmarks/replay_benchmark.py capturas/ --workers 0 --language eng --tessdata /ruta/tessdata
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(BENCHMARK_DIR)
+
+
+def run_replay(path, workers, tiling, language, tessdata, fps, loops, change_method):
+    sys.path.insert(0, REPO_ROOT)
+    import interceptor
+    from capture import ReplayCapture
+    from frame_change import ChangeDetector
+    from frame_timing import FrameTimer
+
+    interceptor.ocr_workers = workers
+    interceptor.ocr_tiling = tiling
+    interceptor.ocr_language = language or interceptor.ocr_language
+    interceptor.tessdata_dir = tessdata or interceptor.tessdata_dir
+
+    timer = FrameTimer(window=100000)
+    counts = {'captured': 0, 'processed': 0, 'skipped': 0, 'dropped': 0, 'stable': 0}
+    start = time.perf_counter()
+    # Cada pasada reutiliza cachés y detector, como una sesión de juego que repite pantallas
+    detector = ChangeDetector(change_method)
+    run = interceptor.run_async if workers > 0 else interceptor.run_sync
+    for _ in range(loops):
+        with ReplayCapture(path, fps=fps) as source:
+            for key, value in run(source, detector, timer, headless=True).items():
+                counts[key] += value
+    elapsed = time.perf_counter() - start
+
+    latency = timer.percentiles('latency') or {}
+    renderer = interceptor.overlay_renderer
+    return {
+        'frames': path,
+        'workers': workers,
+        'tiling': tiling,
+        'elapsed': round(elapsed, 3),
+        **counts,
+        'capture_fps': round(counts['captured'] / elapsed, 2) if elapsed > 0 else 0.0,
+        'ocr_fps': round(counts['processed'] / elapsed, 2) if elapsed > 0 else 0.0,
+        'latency_ms': {f"p{p}": round(v, 2) for p, v in latency.items()},
+        'stages': timer.summary(),
+        'ocr_cache': interceptor.ocr_cache.stats(),
+        'label_cache_hit_rate': round(renderer.hit_rate, 4) if renderer else 0.0,
+        'translate_calls': interceptor.translation_memory.hits + interceptor.translation_memory.misses
+        if interceptor.translation_memory else 0
+    }
+
+
+def print_report(results):
+    print(f"Fotogramas: {results['captured']} capturados, {results['processed']} con OCR, "
+          f"{results['skipped']} sin cambios, {results['dropped']} descartados, "
+          f"{results['stable']} con texto estable en {results['elapsed']:.2f}s")
+    print(f"Captura: {results['capture_fps']:.1f} fps   OCR: {results['ocr_fps']:.1f} fps")
+    latency = results['latency_ms']
+    if latency:
+        print(f"Latencia captura -> traducción: p50 {latency['p50']:.1f} ms, p95 {latency['p95']:.1f} ms, "
+              f"p99 {latency['p99']:.1f} ms")
+    print(f"{'Etapa':<12}{'N':>8}{'p50 (ms)':>10}{'p95 (ms)':>10}{'p99 (ms)':>10}")
+    for stage, s in results['stages'].items():
+        print(f"{stage:<12}{s['count']:>8}{s['p50_ms']:>10.2f}{s['p95_ms']:>10.2f}{s['p99_ms']:>10.2f}")
+    cache = results['ocr_cache']
+    print(f"Caché OCR: {cache['hit_rate']:.1%} de aciertos ({cache['hits']}/{cache['hits'] + cache['misses']}), "
+          f"caché de etiquetas: {results['label_cache_hit_rate']:.1%}, "
+          f"llamadas a translate_text: {results['translate_calls']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del interceptor sobre fotogramas grabados")
+    parser.add_argument('frames', help="Directorio de capturas o vídeo")
+    parser.add_argument('--workers', type=int, default=2, help="Procesos de OCR (0: bucle síncrono)")
+    parser.add_argument('--tiling', default='regions', choices=('regions', 'bands'))
+    parser.add_argument('--language', help="Modelo de Tesseract (por defecto, el del interceptor)")
+    parser.add_argument('--tessdata', help="Directorio tessdata")
+    parser.add_argument('--fps', type=float, help="Ritmo de reproducción (por defecto, sin límite)")
+    parser.add_argument('--loops', type=int, default=1, help="Pasadas sobre la grabación")
+    parser.add_argument('--change-method', default='diff', choices=('diff', 'dhash'))
+    parser.add_argument('--output', help="Guardar resultados en JSON")
+    args = parser.parse_args()
+
+    try:
+        results = run_replay(os.path.abspath(args.frames), args.workers, args.tiling, args.language,
+                             args.tessdata, args.fps, args.loops, args.change_method)
+    except RuntimeError as e:
+        # OcrEngineError: motor de OCR no disponible o pool de OCR bloqueado
+        print(f"Error: {e}")
+        return 1
+    print_report(results)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,248 @@
+import os
+import sys
+import json
+import time
+import zlib
+import random
+import shutil
+import argparse
+import resource
+import tempfile
+
+# Benchmark de extremo a extremo del pipeline de entrenamiento con herramientas falsas.
+# Genera un corpus y fuentes sintéticas, ejecuta todas las etapas desde
+# generate_training_data hasta stage_combine_training_data (o hasta finish_lstm_model con
+# --mode lstm) y mide el coste de la orquestación en Python (throughput, latencia por
+# elemento y memoria máxima).
+#
+#   python benchmarks/run_benchmark.py --lines 300 --fonts 2 --output bench.json
+#   python benchmarks/run_benchmark.py --mode lstm
+#   python benchmarks/run_benchmark.py --baseline bench.json --threshold 0.2
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(BENCHMARK_DIR)
+FAKE_TOOLS = os.path.join(BENCHMARK_DIR, 'fake_tools.py')
+SYSTEM_FONT_DIRS = ['/usr/share/fonts', '/usr/local/share/fonts', '/Library/Fonts', r'C:\Windows\Fonts']
+
+
+def install_fake_tools(bin_dir):
+    os.makedirs(bin_dir, exist_ok=True)
+    for tool in ('tesseract', 'unicharset_extractor', 'shapeclustering', 'mftraining',
+                 'cntraining', 'wordlist2dawg', 'combine_tessdata', 'lstmtraining'):
+        for name in (tool, f"{tool}.exe"):
+            path = os.path.join(bin_dir, name)
+            with open(path, 'w') as f:
+                f.write(f'#!/bin/sh\nexec "{sys.executable}" "{FAKE_TOOLS}" {tool} "$@"\n')
+            os.chmod(path, 0o755)
+    os.environ['PATH'] = bin_dir + os.pathsep + os.environ.get('PATH', '')
+
+
+def generate_corpus(workdir, num_lines, rng):
+    pool = [chr(0x4E00 + k) for k in rng.sample(range(0x5000), 400)]
+    with open(os.path.join(workdir, 'training_text.txt'), 'w', encoding='utf-8') as f:
+        for _ in range(num_lines):
+            f.write(''.join(rng.choice(pool) for _ in range(rng.randint(2, 12))) + '\n')
+
+    with open(os.path.join(workdir, 'cedict_1_0_ts_utf-8_mdbg.txt'), 'w', encoding='utf-8') as f:
+        f.write("# CC-CEDICT sintético para benchmark\n")
+        for _ in range(num_lines // 4):
+            word = ''.join(rng.choice(pool) for _ in range(rng.randint(1, 4)))
+            f.write(f"{word} {word} [pin1 yin1] /definición/\n")
+
+    with open(os.path.join(workdir, 'training_dictionary.txt'), 'w', encoding='utf-8') as f:
+        for _ in range(num_lines):
+            f.write(''.join(rng.choice(pool) for _ in range(rng.randint(2, 6))) + '\n')
+    return pool
+
+
+def build_synthetic_font(path, chars, family, seed):
+    from fontTools.fontBuilder import FontBuilder
+    from fontTools.pens.ttGlyphPen import TTGlyphPen
+
+    glyph_names = {ord(c): f"uni{ord(c):04X}" for c in chars}
+    builder = FontBuilder(1000, isTTF=True)
+    builder.setupGlyphOrder(['.notdef'] + sorted(glyph_names.values()))
+    builder.setupCharacterMap(glyph_names)
+
+    glyphs, metrics = {}, {}
+    for name in ['.notdef'] + list(glyph_names.values()):
+        pen = TTGlyphPen(None)
+        pattern = zlib.crc32(f"{name}:{seed}".encode()) & 0x3F
+        # Cada glifo es un conjunto de barras horizontales que depende del carácter
+        for bar in range(6):
+            if name == '.notdef' or pattern & (1 << bar):
+                y = 60 + bar * 130
+                width = 300 + ((pattern >> bar) & 3) * 150
+                pen.moveTo((100, y))
+                pen.lineTo((100, y + 90))
+                pen.lineTo((100 + width, y + 90))
+                pen.lineTo((100 + width, y))
+                pen.closePath()
+        glyphs[name] = pen.glyph()
+        metrics[name] = (1000, 100)
+
+    builder.setupGlyf(glyphs)
+    builder.setupHorizontalMetrics(metrics)
+    builder.setupHorizontalHeader(ascent=880, descent=-120)
+    builder.setupNameTable({'familyName': family, 'styleName': 'Regular'})
+    builder.setupOS2(sTypoAscender=880, sTypoDescender=-120, usWinAscent=880, usWinDescent=120)
+    builder.setupPost()
+    builder.save(path)
+
+
+def generate_fonts(fonts_dir, num_fonts, chars):
+    os.makedirs(fonts_dir, exist_ok=True)
+    try:
+        for n in range(num_fonts):
+            build_synthetic_font(os.path.join(fonts_dir, f"bm{n}_synthetic.ttf"), chars, f"Bench{n}", n)
+        return
+    except ImportError:
+        print("fontTools no está instalado; se usan fuentes del sistema")
+
+    system_fonts = sorted(
+        os.path.join(root, f)
+        for directory in SYSTEM_FONT_DIRS if os.path.isdir(directory)
+        for root, _, files in os.walk(directory) for f in files if f.endswith('.ttf')
+    )
+    if not system_fonts:
+        raise SystemExit("No hay fuentes .ttf disponibles para el benchmark")
+    for n, font in enumerate(system_fonts[:num_fonts]):
+        shutil.copy(font, os.path.join(fonts_dir, f"bm{n}_{os.path.basename(font)}"))
+
+
+def count_files(folder, extension):
+    return sum(1 for _, _, files in os.walk(folder) for f in files if f.endswith(extension))
+
+
+def stage_items(stage, output_folder):
+    if stage == 'generate_training_data':
+        return count_files(output_folder, '.png')
+    if stage in ('process_unicharset', 'generate_font_properties'):
+        return count_files(output_folder, '.box')
+    if stage in ('generate_tr_files', 'complete_shapeclustering'):
+        return count_files(output_folder, '.tr')
+    if stage == 'run_mftraining':
+        return min(count_files(output_folder, '.tr'), 500 * 80)
+    if stage == 'rename_files':
+        return 3
+    if stage == 'generate_lstmf':
+        return count_files('lstm_output', '.lstmf')
+    if stage == 'lstm_training':
+        return int(os.environ['PVZ_LSTM_MAX_ITERATIONS']) // 100
+    return 1
+
+
+def run_benchmark(workdir, num_lines, num_fonts, seed, sample_interval, mode='legacy'):
+    rng = random.Random(seed)
+    install_fake_tools(os.path.join(workdir, 'bin'))
+    chars = generate_corpus(workdir, num_lines, rng)
+    fonts_dir = os.path.join(workdir, 'fonts')
+    generate_fonts(fonts_dir, num_fonts, chars)
+
+    os.environ['PVZ_FONTS_DIR'] = fonts_dir
+    os.environ['PVZ_TRAINING_MODE'] = mode
+    if mode == 'lstm':
+        base_model = os.path.join(workdir, 'base.traineddata')
+        with open(base_model, 'w', encoding='utf-8') as f:
+            f.write("modelo base\n")
+        os.environ['PVZ_LSTM_BASE'] = base_model
+        os.environ.setdefault('PVZ_LSTM_MAX_ITERATIONS', '1000')
+    os.chdir(workdir)
+    sys.path.insert(0, REPO_ROOT)
+    import train_tesseract_pvz as pipeline
+    from resource_sampler import start_sampler, stop_sampler, get_stage_summary
+    pipeline.setup_logging()
+
+    # evaluate_model necesita un pvz.traineddata real: las herramientas falsas no lo producen
+    stages = [('generate_training_data', pipeline.generate_training_data)] + \
+        [(stage, function) for stage, function in pipeline.training_stages() if stage != 'evaluate_model']
+    results = {}
+    start_sampler(pipeline.logs_folder, interval=sample_interval)
+    try:
+        for stage, stage_function in stages:
+            start = time.perf_counter()
+            ok = pipeline.run_stage(stage, stage_function)
+            elapsed = time.perf_counter() - start
+            items = stage_items(stage, pipeline.output_folder)
+            summary = get_stage_summary(stage)
+            # Sin muestras (etapa más corta que el intervalo) usamos el máximo del proceso
+            peak = summary['rss_peak'] if summary else resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+            results[stage] = {
+                'ok': ok is not False,
+                'wall_time': round(elapsed, 4),
+                'items': items,
+                'throughput': round(items / elapsed, 2) if elapsed > 0 else 0.0,
+                'latency_ms': round(elapsed * 1000 / items, 3) if items else 0.0,
+                'peak_rss_mb': round(peak / (1024 * 1024), 1)
+            }
+            if ok is False:
+                break
+    finally:
+        stop_sampler()
+    return results
+
+
+def print_report(results):
+    print(f"{'Etapa':<28}{'OK':>4}{'Tiempo (s)':>12}{'Elementos':>11}{'Elem/s':>10}{'ms/elem':>10}{'RSS (MB)':>10}")
+    for stage, r in results.items():
+        print(f"{stage:<28}{'sí' if r['ok'] else 'no':>4}{r['wall_time']:>12.3f}{r['items']:>11}"
+              f"{r['throughput']:>10.1f}{r['latency_ms']:>10.2f}{r['peak_rss_mb']:>10.1f}")
+
+
+def compare_with_baseline(results, baseline_path, threshold):
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)['stages']
+    regressions = []
+    for stage, r in results.items():
+        base = baseline.get(stage)
+        if base and base['throughput'] > 0 and r['throughput'] < base['throughput'] * (1 - threshold):
+            drop = 1 - r['throughput'] / base['throughput']
+            regressions.append(stage)
+            print(f"REGRESIÓN en {stage}: {base['throughput']:.1f} -> {r['throughput']:.1f} elem/s (-{drop:.0%})")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark sintético del pipeline de entrenamiento")
+    parser.add_argument('--lines', type=int, default=300, help="Líneas del corpus sintético")
+    parser.add_argument('--fonts', type=int, default=2, help="Número de fuentes sintéticas")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--mode', default='legacy', choices=('legacy', 'lstm'), help="Modo de entrenamiento")
+    parser.add_argument('--workdir', help="Directorio de trabajo (por defecto, uno temporal)")
+    parser.add_argument('--keep', action='store_true', help="No borrar el directorio de trabajo")
+    parser.add_argument('--sample-interval', type=float, default=0.05,
+                        help="Intervalo del muestreador de recursos en segundos")
+    parser.add_argument('--output', help="Guardar resultados en JSON")
+    parser.add_argument('--baseline', help="JSON de una ejecución anterior para detectar regresiones")
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help="Caída de throughput tolerada frente a la referencia")
+    args = parser.parse_args()
+
+    output = os.path.abspath(args.output) if args.output else None
+    baseline = os.path.abspath(args.baseline) if args.baseline else None
+    workdir = os.path.abspath(args.workdir) if args.workdir else tempfile.mkdtemp(prefix='pvz_bench_')
+    os.makedirs(workdir, exist_ok=True)
+    cwd = os.getcwd()
+
+    try:
+        results = run_benchmark(workdir, args.lines, args.fonts, args.seed, args.sample_interval, args.mode)
+    finally:
+        os.chdir(cwd)
+        if not args.keep and not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    print_report(results)
+    if output:
+        with open(output, 'w', encoding='utf-8') as f:
+            json.dump({'lines': args.lines, 'fonts': args.fonts, 'seed': args.seed, 'mode': args.mode,
+                       'stages': results}, f, indent=2)
+
+    failed = [stage for stage, r in results.items() if not r['ok']]
+    regressions = compare_with_baseline(results, baseline, args.threshold) if baseline else []
+    if failed:
+        print(f"Etapas fallidas: {', '.join(failed)}")
+    sys.exit(1 if failed or regressions else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,219 @@
+import os
+import time
+import ctypes
+import numpy as np
+import cv2
+
+# Fuentes de captura de fotogramas. Todas reservan sus buffers una sola vez y devuelven
+# una vista NumPy BGRA (alto, ancho, 4) sobre ese buffer: el fotograma se sobrescribe en
+# la siguiente llamada a grab(), así que quien necesite conservarlo debe copiarlo.
+#
+#   win32:<título de la ventana>   GDI sobre la ventana del juego (solo Windows)
+#   mss                            monitor principal con mss (multiplataforma)
+#   mss:<izq>,<arriba>,<ancho>,<alto>
+#   replay:<directorio o vídeo>    reproduce fotogramas grabados
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp')
+
+
+class FrameSource:
+    # True cuando la fuente no va a producir más fotogramas (fin de una grabación)
+    finished = False
+
+    def grab(self):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class BITMAPINFOHEADER(ctypes.Structure):
+    _fields_ = [
+        ('biSize', ctypes.c_uint32), ('biWidth', ctypes.c_int32), ('biHeight', ctypes.c_int32),
+        ('biPlanes', ctypes.c_uint16), ('biBitCount', ctypes.c_uint16),
+        ('biCompression', ctypes.c_uint32), ('biSizeImage', ctypes.c_uint32),
+        ('biXPelsPerMeter', ctypes.c_int32), ('biYPelsPerMeter', ctypes.c_int32),
+        ('biClrUsed', ctypes.c_uint32), ('biClrImportant', ctypes.c_uint32)
+    ]
+
+
+class Win32WindowCapture(FrameSource):
+    def __init__(self, window_name):
+        import win32gui
+        import win32ui
+        import win32con
+        self._win32gui, self._win32ui, self._win32con = win32gui, win32ui, win32con
+        self._gdi32 = ctypes.windll.gdi32
+        self.window_name = window_name
+        self.hwnd = None
+        self.size = None
+        self._buffer = None
+        self._handles = None
+
+    def _ensure_buffers(self):
+        win32gui = self._win32gui
+        if not self.hwnd or not win32gui.IsWindow(self.hwnd):
+            self._release()
+            self.hwnd = win32gui.FindWindow(None, self.window_name)
+            if not self.hwnd:
+                return False
+
+        left, top, right, bottom = win32gui.GetClientRect(self.hwnd)
+        size = (right - left, bottom - top)
+        if size == self.size and self._handles is not None:
+            return True
+
+        # Solo se recrean DCs y bitmap cuando cambia el tamaño de la ventana
+        self._release()
+        width, height = size
+        if width <= 0 or height <= 0:
+            return False
+        hwnd_dc = win32gui.GetWindowDC(self.hwnd)
+        mfc_dc = self._win32ui.CreateDCFromHandle(hwnd_dc)
+        save_dc = mfc_dc.CreateCompatibleDC()
+        bitmap = self._win32ui.CreateBitmap()
+        bitmap.CreateCompatibleBitmap(mfc_dc, width, height)
+        save_dc.SelectObject(bitmap)
+        self._handles = (hwnd_dc, mfc_dc, save_dc, bitmap)
+
+        header = BITMAPINFOHEADER()
+        header.biSize = ctypes.sizeof(BITMAPINFOHEADER)
+        header.biWidth = width
+        header.biHeight = -height  # Negativo: filas de arriba a abajo, como NumPy
+        header.biPlanes = 1
+        header.biBitCount = 32
+        self._header = header
+        self._buffer = np.empty((height, width, 4), dtype=np.uint8)
+        self.size = size
+        return True
+
+    def grab(self):
+        if not self._ensure_buffers():
+            return None
+        _, mfc_dc, save_dc, bitmap = self._handles
+        width, height = self.size
+        save_dc.BitBlt((0, 0), (width, height), mfc_dc, (0, 0), self._win32con.SRCCOPY)
+        # GetDIBits copia los píxeles directamente en el buffer NumPy reservado
+        lines = self._gdi32.GetDIBits(
+            save_dc.GetSafeHdc(), bitmap.GetHandle(), 0, height,
+            self._buffer.ctypes.data_as(ctypes.c_void_p), ctypes.byref(self._header), 0
+        )
+        return self._buffer if lines == height else None
+
+    def _release(self):
+        if self._handles is not None:
+            hwnd_dc, mfc_dc, save_dc, bitmap = self._handles
+            self._win32gui.DeleteObject(bitmap.GetHandle())
+            save_dc.DeleteDC()
+            mfc_dc.DeleteDC()
+            self._win32gui.ReleaseDC(self.hwnd, hwnd_dc)
+            self._handles = None
+            self.size = None
+
+    def close(self):
+        self._release()
+
+
+class MssCapture(FrameSource):
+    def __init__(self, region=None, monitor=1):
+        import mss
+        self._sct = mss.mss()
+        if region is not None:
+            left, top, width, height = region
+            self.monitor = {'left': left, 'top': top, 'width': width, 'height': height}
+        else:
+            self.monitor = self._sct.monitors[monitor]
+
+    def grab(self):
+        shot = self._sct.grab(self.monitor)
+        # shot.raw es un bytearray BGRA: la vista NumPy no copia los píxeles
+        return np.frombuffer(shot.raw, dtype=np.uint8).reshape(shot.height, shot.width, 4)
+
+    def close(self):
+        self._sct.close()
+
+
+class ReplayCapture(FrameSource):
+    def __init__(self, path, loop=False, fps=None):
+        self.path = path
+        self.loop = loop
+        self.frame_interval = 1.0 / fps if fps else None
+        self._last_time = None
+        self._buffer = None
+        self._video = None
+        self._files = None
+        self._index = 0
+        if os.path.isdir(path):
+            self._files = sorted(os.path.join(path, f) for f in os.listdir(path)
+                                 if f.lower().endswith(IMAGE_EXTENSIONS))
+            if not self._files:
+                raise ValueError(f"No hay fotogramas en {path}")
+        else:
+            self._video = cv2.VideoCapture(path)
+            if not self._video.isOpened():
+                raise ValueError(f"No se pudo abrir el vídeo {path}")
+            self._bgr = None
+
+    def __len__(self):
+        if self._files is not None:
+            return len(self._files)
+        return int(self._video.get(cv2.CAP_PROP_FRAME_COUNT))
+
+    def _read(self):
+        if self._files is not None:
+            if self._index >= len(self._files):
+                if not self.loop:
+                    self.finished = True
+                    return None
+                self._index = 0
+            frame = cv2.imread(self._files[self._index], cv2.IMREAD_COLOR)
+            self._index += 1
+            return frame
+
+        ok, frame = self._video.read(self._bgr)
+        if not ok and self.loop:
+            self._video.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ok, frame = self._video.read(self._bgr)
+        if not ok:
+            self.finished = True
+            return None
+        self._bgr = frame
+        return frame
+
+    def grab(self):
+        if self.frame_interval and self._last_time is not None:
+            delay = self.frame_interval - (time.perf_counter() - self._last_time)
+            if delay > 0:
+                time.sleep(delay)
+        self._last_time = time.perf_counter()
+
+        frame = self._read()
+        if frame is None:
+            return None
+        height, width = frame.shape[:2]
+        if self._buffer is None or self._buffer.shape[:2] != (height, width):
+            self._buffer = np.empty((height, width, 4), dtype=np.uint8)
+        cv2.cvtColor(frame, cv2.COLOR_BGR2BGRA, dst=self._buffer)
+        return self._buffer
+
+    def close(self):
+        if self._video is not None:
+            self._video.release()
+
+
+def open_capture(spec):
+    backend, _, argument = spec.partition(':')
+    if backend == 'win32':
+        return Win32WindowCapture(argument)
+    if backend == 'mss':
+        region = tuple(int(v) for v in argument.split(',')) if argument else None
+        return MssCapture(region)
+    if backend == 'replay':
+        return ReplayCapture(argument)
+    raise ValueError(f"Fuente de captura desconocida: {spec}")
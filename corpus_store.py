@@ -0,0 +1,184 @@
+import os
+import sys
+import mmap
+import time
+import struct
+import argparse
+import unicodedata
+import numpy as np
+
+from dictionary_index import file_hash, read_manifest, write_manifest
+
+# Corpus de entrenamiento compilado: training_text.txt + caracteres de CC-CEDICT.
+#
+#   pvz.corpus        binario pensado para mmap: cabecera, offsets uint64 de cada línea y
+#                     el texto UTF-8 de todas las líneas (terminadas en '\n'). Un bloque de
+#                     líneas consecutivas (una página) se lee con un único slice y un decode.
+#   pvz.corpus.json   manifiesto con el hash de las fuentes: si no cambiaron, no se recompila.
+#
+# Al compilar, cada línea se normaliza (NFKC, espacios colapsados), se descartan vacías,
+# comentarios y líneas con caracteres de control, y se eliminan duplicados conservando la
+# primera aparición. Los caracteres de CEDICT se añaden después, ordenados por código:
+# el mismo corpus da siempre las mismas páginas.
+#
+#   python corpus_store.py build [--force]
+#   python corpus_store.py show tesseract_output/pvz.corpus 120 5
+
+CORPUS_NAME = 'pvz.corpus'
+MANIFEST_NAME = 'pvz.corpus.json'
+TEXT_FILE = 'training_text.txt'
+CEDICT_FILE = 'cedict_1_0_ts_utf-8_mdbg.txt'
+FORMAT_VERSION = 1
+MAGIC = b'PVZCORP\x00'
+# magic, versión, relleno (offsets alineados a 8) y número de líneas
+HEADER = struct.Struct('<8sI4xQ')
+# Categorías Unicode que Tesseract no puede renderizar ni reconocer
+REJECTED_CATEGORIES = {'Cc', 'Cf', 'Cs', 'Co', 'Cn'}
+
+
+def normalize_line(line):
+    line = ' '.join(unicodedata.normalize('NFKC', line).split())
+    if not line or line.startswith('#'):
+        return None
+    if any(unicodedata.category(char) in REJECTED_CATEGORIES for char in line):
+        return None
+    return line
+
+
+def cedict_chars(path):
+    # Caracteres de la primera columna (tradicional) de cada entrada, como process_cedict
+    chars = set()
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if line.startswith('#'):
+                continue
+            parts = line.split(' ')
+            if len(parts) > 1:
+                chars.update(parts[0])
+    return sorted(char for char in (normalize_line(char) for char in chars) if char)
+
+
+def compile_lines(text_paths, cedict_path=None):
+    lines = {}
+    for path in text_paths:
+        with open(path, 'r', encoding='utf-8') as f:
+            for raw in f:
+                line = normalize_line(raw)
+                if line is not None:
+                    lines.setdefault(line, None)
+    if cedict_path:
+        for char in cedict_chars(cedict_path):
+            lines.setdefault(char, None)
+    return list(lines)
+
+
+def write_corpus(lines, path):
+    encoded = [f"{line}\n".encode('utf-8') for line in lines]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.uint64)
+    offsets[1:] = np.cumsum([len(line) for line in encoded])
+    temp_path = f"{path}.tmp"
+    with open(temp_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, FORMAT_VERSION, len(encoded)))
+        f.write(offsets.tobytes())
+        f.write(b''.join(encoded))
+    os.replace(temp_path, path)
+    return int(offsets[-1])
+
+
+class CorpusStore:
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'rb')
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.count = HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError(f"{path} no es un corpus compilado compatible")
+        self._offsets = np.frombuffer(self._mmap, dtype=np.uint64, count=self.count + 1, offset=HEADER.size)
+        self._text_offset = HEADER.size + (self.count + 1) * 8
+
+    def __len__(self):
+        return self.count
+
+    def line(self, index):
+        return self.lines(index, index + 1)[0]
+
+    def lines(self, start, stop):
+        # Líneas [start, stop) con una sola lectura del mmap
+        start, stop = max(0, start), min(stop, self.count)
+        if start >= stop:
+            return []
+        begin = self._text_offset + int(self._offsets[start])
+        end = self._text_offset + int(self._offsets[stop])
+        return self._mmap[begin:end].decode('utf-8').split('\n')[:-1]
+
+    def block_count(self, block_size):
+        return (self.count + block_size - 1) // block_size
+
+    def close(self):
+        self._offsets = None
+        self._mmap.close()
+        self._file.close()
+
+
+def compile_corpus(text_paths=(TEXT_FILE,), cedict_path=CEDICT_FILE, output_dir='tesseract_output',
+                   force=False, log=print):
+    # Recompila solo si cambió alguna fuente; devuelve (ruta del corpus, manifiesto, recompilado)
+    os.makedirs(output_dir, exist_ok=True)
+    corpus_path = os.path.join(output_dir, CORPUS_NAME)
+    manifest_path = os.path.join(output_dir, MANIFEST_NAME)
+    sources = list(text_paths) + ([cedict_path] if cedict_path and os.path.exists(cedict_path) else [])
+    manifest = read_manifest(manifest_path)
+    source_hash = file_hash(*sources)
+
+    up_to_date = (manifest.get('source_hash') == source_hash
+                  and manifest.get('sources') == [os.path.abspath(s) for s in sources]
+                  and manifest.get('version') == FORMAT_VERSION
+                  and os.path.exists(corpus_path))
+    if up_to_date and not force:
+        log(f"Corpus sin cambios ({manifest['lines']} líneas): se reutiliza {CORPUS_NAME}")
+        return corpus_path, manifest, False
+
+    start = time.perf_counter()
+    lines = compile_lines(text_paths, cedict_path if cedict_path in sources else None)
+    size = write_corpus(lines, corpus_path)
+    manifest = {
+        'version': FORMAT_VERSION,
+        'sources': [os.path.abspath(s) for s in sources],
+        'source_hash': source_hash,
+        'lines': len(lines),
+        'bytes': size
+    }
+    write_manifest(manifest_path, manifest)
+    log(f"Corpus compilado: {len(lines)} líneas únicas, {size // 1024} KB en "
+        f"{time.perf_counter() - start:.2f}s")
+    return corpus_path, manifest, True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compila el corpus de entrenamiento en un binario con índice de líneas")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    build = subparsers.add_parser('build')
+    build.add_argument('--text', nargs='+', default=[TEXT_FILE])
+    build.add_argument('--cedict', default=CEDICT_FILE)
+    build.add_argument('--output-dir', default='tesseract_output')
+    build.add_argument('--force', action='store_true', help="Recompilar aunque las fuentes no hayan cambiado")
+    show = subparsers.add_parser('show')
+    show.add_argument('corpus')
+    show.add_argument('start', type=int, nargs='?', default=0)
+    show.add_argument('count', type=int, nargs='?', default=10)
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        compile_corpus(args.text, args.cedict, args.output_dir, args.force)
+        return 0
+
+    corpus = CorpusStore(args.corpus)
+    print(f"{len(corpus)} líneas")
+    for offset, line in enumerate(corpus.lines(args.start, args.start + args.count)):
+        print(f"{args.start + offset:>8}  {line}")
+    corpus.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
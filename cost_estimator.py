@@ -0,0 +1,293 @@
+import os
+import sys
+import time
+import random
+import shutil
+import tempfile
+from datetime import timedelta
+from PIL import ImageFont
+
+import lstm_finetune
+import train_tesseract_pvz as pipeline
+from page_renderer import render_page
+
+# Planificador en seco: renderiza una muestra de páginas, cronometra una muestra de las
+# herramientas del modo de entrenamiento y extrapola páginas, archivos, bytes en disco y
+# duración por etapa para las fuentes, tamaños y diccionario actuales.
+#
+#   legacy  box.train / unicharset_extractor / shapeclustering / mftraining -> archivos .tr
+#   lstm    cortes de línea y lstm.train -> muestras .lstmf; lstmtraining se estima por
+#           iteración (LSTM_SECONDS_PER_ITERATION x lstm_max_iterations)
+#
+# Las etapas que no se muestrean suman un coste fijo (FIXED_STAGE_SECONDS) para no
+# subestimar el total.
+#   python cost_estimator.py [páginas_por_tamaño]
+
+# Margen de seguridad sobre el espacio en disco estimado
+DISK_MARGIN = 0.15
+# Segundos estimados de las etapas sin muestra: no dependen del número de páginas
+FIXED_STAGE_SECONDS = {
+    'run_cntraining': 120,
+    'build_dictionary': 60,
+    'combine_training_data': 30
+}
+LSTM_FIXED_STAGE_SECONDS = {
+    'extract_lstm_model': 10,
+    'finish_lstm_model': 30
+}
+# Orden de magnitud de una iteración de lstmtraining en CPU partiendo de chi_sim
+LSTM_SECONDS_PER_ITERATION = 0.5
+
+
+def ceil_div(a, b):
+    return (a + b - 1) // b
+
+
+def file_size(path):
+    return os.path.getsize(path) if os.path.exists(path) else 0
+
+
+def timed_command(command):
+    # (segundos, correcto); sin la herramienta instalada devuelve (None, False): queda sin medir
+    start = time.perf_counter()
+    try:
+        result = pipeline.run_command(command)
+    except OSError as e:
+        pipeline.log_error(f"No se pudo ejecutar {command[0]}: {e}")
+        return None, False
+    return time.perf_counter() - start, result.returncode == 0
+
+
+def sample_rendering(sample_dir, training_text, pages_per_size, rng):
+    samples = []
+    fonts = {}
+    total_blocks = ceil_div(len(training_text), pipeline.LINES_PER_IMAGE)
+    for font_size in pipeline.FONT_SIZES:
+        for n in range(pages_per_size):
+            font_path = rng.choice(pipeline.get_config().fonts)
+            page_index = rng.randrange(total_blocks)
+            start_line = page_index * pipeline.LINES_PER_IMAGE
+            text_block = training_text[start_line:start_line + pipeline.LINES_PER_IMAGE]
+            base = os.path.join(sample_dir, f"s{font_size}_{n}")
+            # La fuente se carga fuera del tiempo medido: el renderizado real la carga una vez
+            # por tarea de RENDER_CHUNK páginas, no por página
+            if (font_path, font_size) not in fonts:
+                fonts[font_path, font_size] = ImageFont.truetype(font_path, font_size)
+            font = fonts[font_path, font_size]
+
+            start = time.perf_counter()
+            render_page(font, font_size, text_block, page_index, f"{base}.png", f"{base}.box",
+                                 pipeline.get_config().augmentation, os.path.basename(font_path))
+            samples.append({
+                'font_size': font_size,
+                'base': base,
+                'render_time': time.perf_counter() - start,
+                'page_bytes': file_size(f"{base}.png") + file_size(f"{base}.box")
+            })
+    return samples
+
+
+def sample_tools(sample_dir, samples):
+    box_files = [f"{s['base']}.box" for s in samples]
+    unicharset_path = os.path.join(sample_dir, 'sample.unicharset')
+    unicharset_time, unicharset_ok = timed_command([
+        'unicharset_extractor.exe', '--output_unicharset', unicharset_path
+    ] + box_files)
+
+    for s in samples:
+        s['tool_time'], ok = timed_command(['tesseract.exe', f"{s['base']}.png", s['base'], 'nobatch', 'box.train'])
+        s['tool_bytes'] = file_size(f"{s['base']}.tr") if ok else None
+        s['training_files'] = 1
+
+    tr_files = [f"{s['base']}.tr" for s in samples if s['tool_bytes'] is not None]
+    shapeclustering_time = mftraining_time = None
+    if unicharset_ok and tr_files:
+        font_properties = os.path.join(sample_dir, 'font_properties')
+        xheights = os.path.join(sample_dir, 'xheights')
+        with open(font_properties, 'w') as f:
+            f.write("Not 0 0 0 0 0\n")
+        with open(xheights, 'w') as f:
+            f.write("Not 20\n")
+        shape_trs = tr_files[:pipeline.SHAPECLUSTERING_BATCH_SIZE]
+        elapsed, ok = timed_command([
+            'shapeclustering.exe', '-F', font_properties, '-U', unicharset_path,
+            '-O', os.path.join(sample_dir, 'sample.shapetable')
+        ] + shape_trs)
+        shapeclustering_time = elapsed / len(shape_trs) if ok else None
+        elapsed, ok = timed_command([
+            'mftraining.exe', '-F', font_properties, '-X', xheights, '-U', unicharset_path,
+            '-O', os.path.join(sample_dir, 'sample.'), '-D', sample_dir
+        ] + tr_files[:pipeline.MFTRAINING_BATCH_SIZE])
+        mftraining_time = elapsed / len(tr_files[:pipeline.MFTRAINING_BATCH_SIZE]) if ok else None
+
+    return {
+        'unicharset_per_box': unicharset_time / len(box_files) if unicharset_ok else None,
+        'shapeclustering_per_tr': shapeclustering_time,
+        'mftraining_per_tr': mftraining_time
+    }
+
+
+def sample_lstm_tools(sample_dir, samples):
+    # Mismo camino que stage_generate_lstmf: cortes de línea de cada página y lstm.train por línea
+    for s in samples:
+        bases = lstm_finetune.write_line_samples(f"{s['base']}.png", f"{s['base']}.box",
+                                                 os.path.join(sample_dir, 'lstm'))
+        s['tool_time'] = s['tool_bytes'] = 0.0
+        s['training_files'] = len(bases)
+        for base in bases:
+            elapsed, ok = timed_command(lstm_finetune.lstmf_command(base))
+            if not ok:
+                s['tool_time'] = s['tool_bytes'] = None
+                break
+            s['tool_time'] += elapsed
+            s['tool_bytes'] += sum(file_size(f"{base}{ext}") for ext in ('.png', '.box', '.lstmf'))
+    return {}
+
+
+def mean(values):
+    values = [v for v in values if v is not None]
+    return sum(values) / len(values) if values else None
+
+
+def estimate_run(pages_per_size=2, seed=0):
+    if pages_per_size < 1:
+        raise ValueError("Se necesita al menos una página de muestra por tamaño")
+    config = pipeline.get_config()
+    lstm = config.mode == 'lstm'
+    if not config.fonts:
+        raise ValueError(f"No hay fuentes .ttf en {config.fonts_dir} (PVZ_FONTS_DIR)")
+    training_text = pipeline.load_training_text()
+    pages_per_font_size = ceil_div(len(training_text), pipeline.LINES_PER_IMAGE)
+    pages_by_size = {size: len(pipeline.get_config().fonts) * pages_per_font_size for size in pipeline.FONT_SIZES}
+    total_pages = sum(pages_by_size.values())
+
+    os.makedirs(pipeline.output_folder, exist_ok=True)
+    # La muestra se escribe en el mismo disco que la salida real para medir bytes reales
+    sample_dir = tempfile.mkdtemp(prefix='.estimacion_', dir=pipeline.output_folder)
+    try:
+        samples = sample_rendering(sample_dir, training_text, pages_per_size, random.Random(seed))
+        tool_costs = sample_lstm_tools(sample_dir, samples) if lstm else sample_tools(sample_dir, samples)
+    finally:
+        shutil.rmtree(sample_dir, ignore_errors=True)
+
+    # tool_*: archivos de entrenamiento por página (.tr en legacy, líneas .lstmf en lstm)
+    render_seconds = page_bytes = tool_seconds = tool_bytes = training_files = 0.0
+    tool_measured = True
+    for font_size, pages in pages_by_size.items():
+        size_samples = [s for s in samples if s['font_size'] == font_size]
+        render_seconds += pages * mean(s['render_time'] for s in size_samples)
+        page_bytes += pages * mean(s['page_bytes'] for s in size_samples)
+        training_files += pages * mean(s['training_files'] for s in size_samples)
+        size_tool_time = mean(s['tool_time'] for s in size_samples if s['tool_bytes'] is not None)
+        size_tool_bytes = mean(s['tool_bytes'] for s in size_samples)
+        if size_tool_time is None:
+            tool_measured = False
+            continue
+        tool_seconds += pages * size_tool_time
+        tool_bytes += pages * size_tool_bytes
+
+    mftraining_trs = min(total_pages, pipeline.MFTRAINING_BATCH_SIZE * pipeline.MFTRAINING_MAX_BATCHES)
+    if lstm:
+        stages = {
+            'generate_training_data': render_seconds,
+            # lstm.train se lanza en paralelo con lstmf_workers hilos
+            'generate_lstmf': tool_seconds / config.lstmf_workers if tool_measured else None,
+            'extract_lstm_model': LSTM_FIXED_STAGE_SECONDS['extract_lstm_model'],
+            'lstm_training': config.lstm_max_iterations * LSTM_SECONDS_PER_ITERATION,
+            'finish_lstm_model': LSTM_FIXED_STAGE_SECONDS['finish_lstm_model']
+        }
+        fixed = set(LSTM_FIXED_STAGE_SECONDS) | {'lstm_training'}
+    else:
+        stages = {
+            'generate_training_data': render_seconds,
+            'process_unicharset': (tool_costs['unicharset_per_box'] * total_pages
+                                   if tool_costs['unicharset_per_box'] is not None else None),
+            'generate_tr_files': tool_seconds if tool_measured else None,
+            'complete_shapeclustering': (tool_costs['shapeclustering_per_tr'] * total_pages
+                                         if tool_costs['shapeclustering_per_tr'] is not None else None),
+            'run_mftraining': (tool_costs['mftraining_per_tr'] * mftraining_trs
+                               if tool_costs['mftraining_per_tr'] is not None else None),
+            **FIXED_STAGE_SECONDS
+        }
+        fixed = set(FIXED_STAGE_SECONDS)
+
+    required_bytes = int((page_bytes + tool_bytes) * (1 + DISK_MARGIN))
+    free_bytes = shutil.disk_usage(pipeline.output_folder).free
+    # Sin medir los archivos de entrenamiento el espacio necesario está incompleto: si aun así
+    # cabe, la comprobación queda sin medir (None) en lugar de darse por buena
+    disk_ok = free_bytes >= required_bytes
+    if disk_ok and not tool_measured:
+        disk_ok = None
+    return {
+        'mode': config.mode,
+        'fonts': len(pipeline.get_config().fonts),
+        'font_sizes': len(pipeline.FONT_SIZES),
+        'corpus_lines': len(training_text),
+        'total_pages': total_pages,
+        'training_files': int(training_files),
+        'training_kind': '.lstmf' if lstm else '.tr',
+        'unicharset_batches': ceil_div(total_pages, pipeline.UNICHARSET_BATCH_SIZE),
+        'mftraining_batches': ceil_div(mftraining_trs, pipeline.MFTRAINING_BATCH_SIZE),
+        'page_bytes': int(page_bytes),
+        'training_bytes': int(tool_bytes) if tool_measured else None,
+        'required_bytes': required_bytes,
+        'free_bytes': free_bytes,
+        'disk_ok': disk_ok,
+        'stage_seconds': stages,
+        'fixed_stages': sorted(fixed),
+        # Suma de las etapas estimadas; las que no se pudieron medir quedan en 'unmeasured'
+        'total_seconds': sum(seconds for seconds in stages.values() if seconds is not None),
+        'unmeasured': [stage for stage, seconds in stages.items() if seconds is None]
+    }
+
+
+def format_bytes(value):
+    if value is None:
+        return 'sin medir'
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if value < 1024:
+            return f"{value:.1f} {unit}"
+        value /= 1024
+    return f"{value:.1f} TB"
+
+
+def log_plan(plan, log=pipeline.log_info):
+    kind = plan['training_kind']
+    batches = '' if plan['mode'] == 'lstm' else \
+        f", {plan['unicharset_batches']} lotes de unicharset, {plan['mftraining_batches']} lotes de mftraining"
+    log(f"Plan ({plan['mode']}): {plan['fonts']} fuentes x {plan['font_sizes']} tamaños, {plan['corpus_lines']} líneas - "
+        f"{plan['total_pages']} páginas, {plan['training_files']} archivos {kind}{batches}")
+    log(f"Disco: imágenes y .box {format_bytes(plan['page_bytes'])}, {kind} {format_bytes(plan['training_bytes'])}, "
+        f"necesario {format_bytes(plan['required_bytes'])} (margen {DISK_MARGIN:.0%}), "
+        f"libre {format_bytes(plan['free_bytes'])}")
+    for stage, seconds in plan['stage_seconds'].items():
+        duration = timedelta(seconds=int(seconds)) if seconds is not None else 'sin medir'
+        fixed = ' (coste fijo)' if stage in plan['fixed_stages'] else ''
+        log(f"Duración estimada de {stage}: {duration}{fixed}")
+    unmeasured = f" - sin medir: {', '.join(plan['unmeasured'])}" if plan['unmeasured'] else ''
+    log(f"Duración total estimada: {timedelta(seconds=int(plan['total_seconds']))}{unmeasured}")
+
+
+def check_plan(plan):
+    if plan['disk_ok'] is None:
+        pipeline.log_error(f"Espacio en disco sin comprobar: no se pudo medir el tamaño de los {plan['training_kind']} "
+                           f"(solo imágenes y .box: {format_bytes(plan['required_bytes'])}, "
+                           f"libre {format_bytes(plan['free_bytes'])})")
+        return True
+    if not plan['disk_ok']:
+        pipeline.log_error(f"Espacio en disco insuficiente: se necesitan {format_bytes(plan['required_bytes'])} "
+                           f"y hay {format_bytes(plan['free_bytes'])} libres")
+        return False
+    return True
+
+
+if __name__ == "__main__":
+    pipeline.setup_logging()
+    pages_per_size = int(sys.argv[1]) if len(sys.argv) > 1 else 2
+    try:
+        plan = estimate_run(pages_per_size)
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(2)
+    log_plan(plan, print)
+    sys.exit(0 if check_plan(plan) else 1)
@@ -0,0 +1,308 @@
+import os
+import sys
+import json
+import mmap
+import time
+import struct
+import hashlib
+import argparse
+import unicodedata
+import numpy as np
+
+from translation_memory import bounded_levenshtein, join_cjk
+
+# Artefactos compilados a partir de training_dictionary.txt:
+#
+#   pvz.wordlist      lista de palabras normalizada, sin duplicados y ordenada (solo cambia si
+#                     cambian los términos); wordlist2dawg la convierte en pvz.word-dawg, que
+#                     combine_tessdata incluye en el modelo
+#   pvz.symspell      índice de borrado simétrico (SymSpell) en binario, pensado para mmap:
+#                     cada término y sus variantes con hasta k caracteres borrados se guardan
+#                     como hashes de 64 bits ordenados -> id de término. Una consulta genera
+#                     los borrados de la entrada, los busca con searchsorted y verifica los
+#                     candidatos con Levenshtein acotado.
+#   pvz.dictionary.json  manifiesto con los hashes de las entradas: si el diccionario (y el
+#                     unicharset, para el DAWG) no cambiaron, no se reconstruye nada.
+#
+# Cuando el diccionario cambia, el índice se actualiza de forma incremental: se conservan las
+# entradas de los términos que siguen (con su id reasignado al nuevo orden), se quitan las de
+# los eliminados y solo se generan los borrados de los términos añadidos. El resultado es
+# idéntico byte a byte a una reconstrucción completa, que solo se hace con --force, otra
+# distancia máxima o más de PATCH_MAX_CHANGE de términos cambiados. El DAWG lo genera
+# wordlist2dawg y no admite parches: se rehace solo si cambia el conjunto de términos.
+#
+#   python dictionary_index.py build [--force]
+#   python dictionary_index.py lookup tesseract_output/pvz.symspell 豌豆射乎 ...
+
+DICTIONARY_FILE = 'training_dictionary.txt'
+WORDLIST_NAME = 'pvz.wordlist'
+INDEX_NAME = 'pvz.symspell'
+MANIFEST_NAME = 'pvz.dictionary.json'
+FORMAT_VERSION = 1
+MAGIC = b'PVZSYM\x00\x00'
+# magic, versión, distancia máxima, longitud máxima de término, términos, entradas
+HEADER = struct.Struct('<8sIIIIQ')
+# Fracción de términos añadidos + eliminados a partir de la cual se reconstruye el índice entero
+PATCH_MAX_CHANGE = 0.5
+
+
+def file_hash(*paths):
+    digest = hashlib.blake2b(digest_size=16)
+    for path in paths:
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+
+def delete_hash(text):
+    return int.from_bytes(hashlib.blake2b(text.encode('utf-8'), digest_size=8).digest(), 'little')
+
+
+def deletes(term, distance):
+    # El propio término y todas sus variantes con hasta `distance` caracteres borrados
+    variants = {term}
+    frontier = {term}
+    for _ in range(distance):
+        frontier = {variant[:i] + variant[i + 1:] for variant in frontier if len(variant) > 1
+                    for i in range(len(variant))}
+        variants |= frontier
+    return variants
+
+
+def load_terms(path):
+    terms = {}
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            term = unicodedata.normalize('NFKC', line).strip()
+            if term and not term.startswith('#'):
+                terms.setdefault(term, None)
+    return list(terms)
+
+
+def write_wordlist(terms, path):
+    # Ordenada: reordenar el diccionario o tocar comentarios no cambia la wordlist ni el DAWG
+    with open(path, 'w', encoding='utf-8') as f:
+        for term in sorted(terms):
+            f.write(f"{term}\n")
+
+
+def index_entries(terms, max_distance, term_ids=None):
+    # (hashes, ids) de los borrados de cada término; term_ids da el id de cada uno en el índice
+    keys, ids = [], []
+    for term_id, term in zip(range(len(terms)) if term_ids is None else term_ids, terms):
+        for variant in deletes(term, max_distance):
+            keys.append(delete_hash(variant))
+            ids.append(term_id)
+    return np.array(keys, dtype=np.uint64), np.array(ids, dtype=np.uint32)
+
+
+def write_index(terms, path, max_distance):
+    return save_index(terms, *index_entries(terms, max_distance), path, max_distance)
+
+
+def patch_index(terms, path, max_distance):
+    # Actualiza el índice existente a la nueva lista de términos reutilizando sus entradas.
+    # Devuelve (entradas, añadidos, eliminados), o None si hay que reconstruirlo entero
+    try:
+        index = SymSpellIndex(path)
+    except (OSError, ValueError, struct.error):
+        return None
+    try:
+        if index.max_distance != max_distance:
+            return None
+        old_terms = [index.term(term_id) for term_id in range(index.terms)]
+        keys, ids = np.array(index._keys), np.array(index._ids)
+    finally:
+        index.close()
+
+    new_ids = {term: term_id for term_id, term in enumerate(terms)}
+    remap = np.array([new_ids.get(term, -1) for term in old_terms], dtype=np.int64)
+    old_set = set(old_terms)
+    added = [term_id for term_id, term in enumerate(terms) if term not in old_set]
+    removed = len(old_terms) - (len(terms) - len(added))
+    if len(added) + removed > PATCH_MAX_CHANGE * max(len(terms), 1):
+        return None
+
+    mapped = remap[ids]
+    keep = mapped >= 0
+    added_keys, added_ids = index_entries([terms[term_id] for term_id in added], max_distance, added)
+    keys = np.concatenate([keys[keep], added_keys])
+    ids = np.concatenate([mapped[keep].astype(np.uint32), added_ids])
+    return save_index(terms, keys, ids, path, max_distance), len(added), removed
+
+
+def save_index(terms, keys, ids, path, max_distance):
+    # Orden (hash, id): el mismo archivo tanto si se construyó entero como con patch_index
+    order = np.lexsort((ids, keys))
+    keys, ids = keys[order], ids[order]
+
+    encoded = [term.encode('utf-8') for term in terms]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.uint32)
+    offsets[1:] = np.cumsum([len(term) for term in encoded])
+    max_length = max((len(term) for term in terms), default=0)
+
+    # Cabecera, hashes (alineados a 8), ids, offsets y texto de los términos
+    temp_path = f"{path}.tmp"
+    with open(temp_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, FORMAT_VERSION, max_distance, max_length, len(terms), len(keys)))
+        f.write(keys.tobytes())
+        f.write(ids.tobytes())
+        f.write(offsets.tobytes())
+        f.write(b''.join(encoded))
+    os.replace(temp_path, path)
+    return len(keys)
+
+
+class SymSpellIndex:
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'rb')
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.max_distance, self.max_length, self.terms, entries = \
+            HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError(f"{path} no es un índice SymSpell compatible")
+        offset = HEADER.size
+        self._keys = np.frombuffer(self._mmap, dtype=np.uint64, count=entries, offset=offset)
+        offset += entries * 8
+        self._ids = np.frombuffer(self._mmap, dtype=np.uint32, count=entries, offset=offset)
+        offset += entries * 4
+        self._offsets = np.frombuffer(self._mmap, dtype=np.uint32, count=self.terms + 1, offset=offset)
+        self._text_offset = offset + (self.terms + 1) * 4
+
+    def term(self, term_id):
+        start = self._text_offset + int(self._offsets[term_id])
+        end = self._text_offset + int(self._offsets[term_id + 1])
+        return self._mmap[start:end].decode('utf-8')
+
+    def distance_limit(self, text):
+        # Con textos muy cortos cualquier corrección sería arbitraria: 2 caracteres -> solo exacto
+        return min(self.max_distance, (len(text) - 1) // 2)
+
+    def lookup(self, text, max_distance=None):
+        # Devuelve (término, distancia) del término más cercano o None
+        limit = self.distance_limit(text) if max_distance is None else min(max_distance, self.max_distance)
+        if not text or len(text) > self.max_length + limit:
+            return None
+        hashes = np.array([delete_hash(variant) for variant in deletes(text, limit)], dtype=np.uint64)
+        starts = np.searchsorted(self._keys, hashes, side='left')
+        ends = np.searchsorted(self._keys, hashes, side='right')
+        candidates = set()
+        for start, end in zip(starts, ends):
+            if end > start:
+                candidates.update(self._ids[start:end].tolist())
+
+        best = None
+        # A igual distancia gana el término que aparece antes en el diccionario
+        for term_id in sorted(candidates):
+            term = self.term(term_id)
+            bound = limit if best is None else best[1] - 1
+            if bound < 0:
+                break
+            distance = bounded_levenshtein(text, term, bound)
+            if distance <= bound:
+                best = (term, distance)
+        return best
+
+    def correct(self, line):
+        # Palabras separadas por espacios se corrigen una a una; una línea CJK, entera
+        words = join_cjk(unicodedata.normalize('NFKC', line)).split()
+        corrected = []
+        for word in words:
+            match = self.lookup(word)
+            corrected.append(match[0] if match else word)
+        return ' '.join(corrected) if corrected else line
+
+    def close(self):
+        self._keys = self._ids = self._offsets = None
+        self._mmap.close()
+        self._file.close()
+
+
+def read_manifest(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def write_manifest(path, manifest):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+
+
+def build_artifacts(dictionary=DICTIONARY_FILE, output_dir='tesseract_output', max_distance=1,
+                    force=False, log=print):
+    # Regenera wordlist e índice solo si cambió el diccionario o la distancia (el índice, con
+    # patch_index si es posible); devuelve (manifiesto, reconstruido)
+    os.makedirs(output_dir, exist_ok=True)
+    manifest_path = os.path.join(output_dir, MANIFEST_NAME)
+    wordlist_path = os.path.join(output_dir, WORDLIST_NAME)
+    index_path = os.path.join(output_dir, INDEX_NAME)
+    manifest = read_manifest(manifest_path)
+    source_hash = file_hash(dictionary)
+
+    up_to_date = (manifest.get('source_hash') == source_hash
+                  and manifest.get('max_distance') == max_distance
+                  and manifest.get('version') == FORMAT_VERSION
+                  and os.path.exists(wordlist_path) and os.path.exists(index_path))
+    if up_to_date and not force:
+        log(f"Diccionario sin cambios ({manifest['terms']} términos): se reutilizan {WORDLIST_NAME} e {INDEX_NAME}")
+        return manifest, False
+
+    terms = load_terms(dictionary)
+    write_wordlist(terms, wordlist_path)
+    patched = None
+    if not force and manifest.get('version') == FORMAT_VERSION and os.path.exists(index_path):
+        patched = patch_index(terms, index_path, max_distance)
+    if patched is None:
+        entries = write_index(terms, index_path, max_distance)
+        log("Índice de borrados reconstruido completo")
+    else:
+        entries, added, removed = patched
+        log(f"Índice de borrados actualizado: {added} términos añadidos, {removed} eliminados")
+    manifest.update({
+        'version': FORMAT_VERSION,
+        'source': os.path.abspath(dictionary),
+        'source_hash': source_hash,
+        'max_distance': max_distance,
+        'terms': len(terms),
+        'index_entries': entries
+    })
+    # El DAWG no se invalida aquí: stage_build_dictionary lo compara con el hash de la wordlist
+    write_manifest(manifest_path, manifest)
+    log(f"Diccionario compilado: {len(terms)} términos, {entries} entradas en el índice de borrados")
+    return manifest, True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compila training_dictionary.txt en wordlist e índice SymSpell")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    build = subparsers.add_parser('build')
+    build.add_argument('--dictionary', default=DICTIONARY_FILE)
+    build.add_argument('--output-dir', default='tesseract_output')
+    build.add_argument('--max-distance', type=int, default=1)
+    build.add_argument('--force', action='store_true', help="Reconstruir aunque el diccionario no haya cambiado")
+    lookup = subparsers.add_parser('lookup')
+    lookup.add_argument('index')
+    lookup.add_argument('texts', nargs='+')
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        build_artifacts(args.dictionary, args.output_dir, args.max_distance, args.force)
+        return 0
+
+    index = SymSpellIndex(args.index)
+    for text in args.texts:
+        start = time.perf_counter()
+        match = index.lookup(text)
+        elapsed = (time.perf_counter() - start) * 1e6
+        print(f"{text} -> {match[0]} (distancia {match[1]})" if match else f"{text} -> sin coincidencia",
+              f"[{elapsed:.0f} µs]")
+    index.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
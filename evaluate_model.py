@@ -0,0 +1,263 @@
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import multiprocessing
+from collections import Counter
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+from colors import background_colors, text_colors
+from translation_memory import join_cjk
+from ocr_engine import OcrEngineError, check_engine, create_engine, worker_error
+
+# Evaluación del modelo entrenado sobre un conjunto apartado: fuentes y tamaños que no se
+# usaron en el entrenamiento. Renderiza páginas con su texto esperado (.gt.txt), las
+# reconoce en paralelo (un motor residente por proceso, como el pipeline del interceptor)
+# y calcula:
+#
+#   CER              errores de edición / caracteres esperados, global y por fuente y tamaño
+#   confusiones      pares (esperado -> reconocido) más frecuentes, con '' para omisiones e
+#                    inserciones
+#   ms por página    tiempo de reconocimiento dentro del proceso (p50, p95) y páginas/s
+#
+# El informe se guarda en la tabla "evaluations" de run_history.db para comparar modelos.
+# Un modelo roto o sin tesseract falla antes de crear el pool (OcrEngineError), y una página
+# que no termina en EVAL_PAGE_TIMEOUT segundos detiene la evaluación en lugar de colgarla.
+#
+#   python evaluate_model.py --fonts Fuentes/evaluacion --workers 4 --output evaluacion.json
+
+EVAL_FOLDER = 'evaluation'
+# Tamaños que no aparecen en FONT_SIZES del entrenamiento
+EVAL_FONT_SIZES = [10, 14, 18, 26, 44]
+EVAL_LINES_PER_PAGE = 10
+EVAL_PAGES_PER_SIZE = 2
+EVAL_IMAGE_WIDTH = 1600
+TOP_CONFUSIONS = 30
+EVAL_PAGE_TIMEOUT = 120.0
+
+
+def load_eval_lines(path='training_text.txt'):
+    with open(path, 'r', encoding='utf-8') as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def render_eval_page(font, font_size, lines, page_index, image_path):
+    line_height = font_size + 8
+    color_index = page_index % len(background_colors)
+    image = Image.new('RGB', (EVAL_IMAGE_WIDTH, len(lines) * line_height + 16),
+                      color=background_colors[color_index])
+    draw = ImageDraw.Draw(image)
+    for j, line in enumerate(lines):
+        draw.text((10, 8 + j * line_height), line, font=font,
+                  fill=text_colors[(color_index + 1) % len(text_colors)])
+    image.save(image_path, format='PNG')
+    with open(f"{os.path.splitext(image_path)[0]}.gt.txt", 'w', encoding='utf-8') as f:
+        f.write('\n'.join(lines) + '\n')
+
+
+def render_eval_set(fonts, lines, output_dir=EVAL_FOLDER, sizes=EVAL_FONT_SIZES,
+                    pages_per_size=EVAL_PAGES_PER_SIZE, seed=0):
+    # Mismo texto y colores para la misma semilla: las evaluaciones son comparables entre modelos
+    rng = random.Random(seed)
+    pages = []
+    for font_path in fonts:
+        font_name = os.path.splitext(os.path.basename(font_path))[0]
+        for font_size in sizes:
+            subdir = os.path.join(output_dir, f"{font_name}_{font_size}")
+            os.makedirs(subdir, exist_ok=True)
+            font = ImageFont.truetype(font_path, font_size)
+            for page_index in range(pages_per_size):
+                page_lines = rng.sample(lines, min(EVAL_LINES_PER_PAGE, len(lines)))
+                image_path = os.path.join(subdir, f"e{page_index:04d}.png")
+                render_eval_page(font, font_size, page_lines, page_index, image_path)
+                pages.append({'image': image_path, 'font': font_name, 'size': font_size})
+    return pages
+
+
+def compact(text):
+    # Sin espacios: Tesseract separa ideogramas con espacios que no están en el texto esperado
+    return ''.join(join_cjk(text).split())
+
+
+def align(reference, hypothesis):
+    # Levenshtein con traza: devuelve (distancia, [(esperado, reconocido)] de los errores)
+    dist = [list(range(len(hypothesis) + 1))]
+    for i, ref_char in enumerate(reference, 1):
+        previous, row = dist[-1], [i]
+        for j, hyp_char in enumerate(hypothesis, 1):
+            row.append(min(previous[j] + 1, row[j - 1] + 1, previous[j - 1] + (ref_char != hyp_char)))
+        dist.append(row)
+
+    errors = []
+    i, j = len(reference), len(hypothesis)
+    while i > 0 or j > 0:
+        if i > 0 and j > 0 and dist[i][j] == dist[i - 1][j - 1] + (reference[i - 1] != hypothesis[j - 1]):
+            if reference[i - 1] != hypothesis[j - 1]:
+                errors.append((reference[i - 1], hypothesis[j - 1]))
+            i, j = i - 1, j - 1
+        elif i > 0 and dist[i][j] == dist[i - 1][j] + 1:
+            errors.append((reference[i - 1], ''))
+            i -= 1
+        else:
+            errors.append(('', hypothesis[j - 1]))
+            j -= 1
+    return dist[-1][-1], errors
+
+
+def score_page(expected, recognized):
+    # Línea a línea si Tesseract devolvió tantas líneas como se esperaban; si no, la página entera
+    expected_lines = [compact(line) for line in expected.splitlines() if compact(line)]
+    recognized_lines = [compact(line) for line in recognized.splitlines() if compact(line)]
+    pairs = list(zip(expected_lines, recognized_lines)) if len(expected_lines) == len(recognized_lines) \
+        else [(''.join(expected_lines), ''.join(recognized_lines))]
+    distance, errors = 0, []
+    for reference, hypothesis in pairs:
+        d, e = align(reference, hypothesis)
+        distance += d
+        errors += e
+    return distance, sum(len(line) for line in expected_lines), errors
+
+
+# Estado de cada proceso del pool: un motor residente por proceso, o el error al crearlo
+_eval_engine = None
+_eval_error = None
+
+
+def init_eval_worker(language, datapath, backend):
+    global _eval_engine, _eval_error
+    os.environ.setdefault('OMP_THREAD_LIMIT', '1')
+    # Un inicializador que lanza hace que el pool relance procesos sin fin
+    try:
+        _eval_engine = create_engine(language, datapath, backend=backend)
+    except Exception as e:
+        _eval_error = str(worker_error(e))
+
+
+def evaluate_page(page):
+    if _eval_engine is None:
+        raise OcrEngineError(_eval_error)
+    image = np.asarray(Image.open(page['image']).convert('L'))
+    start = time.perf_counter()
+    try:
+        recognized = _eval_engine.recognize(image, psm=6)
+    except Exception as e:
+        raise worker_error(e) from None
+    elapsed = time.perf_counter() - start
+    with open(f"{os.path.splitext(page['image'])[0]}.gt.txt", 'r', encoding='utf-8') as f:
+        expected = f.read()
+    distance, chars, errors = score_page(expected, recognized)
+    return {**page, 'ms': elapsed * 1000, 'errors': distance, 'chars': chars, 'confusions': errors}
+
+
+def summarize(results, elapsed, workers, top=TOP_CONFUSIONS):
+    chars = sum(r['chars'] for r in results)
+    errors = sum(r['errors'] for r in results)
+    times = np.array([r['ms'] for r in results]) if results else np.zeros(1)
+    confusions = Counter(pair for r in results for pair in r['confusions'])
+
+    groups = {}
+    for r in results:
+        for key in (f"font:{r['font']}", f"size:{r['size']}"):
+            group = groups.setdefault(key, [0, 0])
+            group[0] += r['errors']
+            group[1] += r['chars']
+    return {
+        'pages': len(results),
+        'chars': chars,
+        'cer': round(errors / chars, 4) if chars else None,
+        'ms_per_page': round(float(np.mean(times)), 2),
+        'ms_p50': round(float(np.percentile(times, 50)), 2),
+        'ms_p95': round(float(np.percentile(times, 95)), 2),
+        'pages_per_sec': round(len(results) / elapsed, 2) if elapsed > 0 else None,
+        'workers': workers,
+        'cer_by_group': {key: round(e / c, 4) if c else None for key, (e, c) in sorted(groups.items())},
+        'confusions': [[expected, recognized, count] for (expected, recognized), count in confusions.most_common(top)]
+    }
+
+
+def evaluate_model(fonts, lines, language='pvz', datapath=None, workers=None, backend=None,
+                   output_dir=EVAL_FOLDER, seed=0, progress=None, log=print):
+    if not fonts:
+        raise ValueError("No hay fuentes para la evaluación")
+    workers = workers or max(1, (os.cpu_count() or 2) // 2)
+    # Sin tesseract o con un .traineddata roto se falla aquí, antes de renderizar y lanzar procesos
+    backend = check_engine(language, datapath, backend=backend)
+    pages = render_eval_set(fonts, lines, output_dir, seed=seed)
+    log(f"Evaluando {language} sobre {len(pages)} páginas ({len(fonts)} fuentes, "
+        f"tamaños {EVAL_FONT_SIZES}) con {workers} procesos")
+
+    results = []
+    start = time.perf_counter()
+    # spawn: mismo comportamiento en Windows y Linux
+    with multiprocessing.get_context('spawn').Pool(workers, initializer=init_eval_worker,
+                                                   initargs=(language, datapath, backend)) as pool:
+        # chunksize 1: con lotes imap_unordered devuelve un generador sin next(timeout)
+        iterator = pool.imap_unordered(evaluate_page, pages)
+        while len(results) < len(pages):
+            try:
+                results.append(iterator.next(timeout=EVAL_PAGE_TIMEOUT))
+            except multiprocessing.TimeoutError:
+                raise OcrEngineError(f"La evaluación no avanzó en {EVAL_PAGE_TIMEOUT:.0f} s "
+                                     f"({len(results)}/{len(pages)} páginas)") from None
+            if progress is not None:
+                progress(len(results), len(pages))
+    return summarize(results, time.perf_counter() - start, workers)
+
+
+def print_report(report):
+    cer = '-' if report['cer'] is None else f"{report['cer']:.2%}"
+    print(f"Páginas: {report['pages']}  Caracteres: {report['chars']}  CER: {cer}")
+    print(f"Reconocimiento: {report['ms_per_page']:.1f} ms/página (p50 {report['ms_p50']:.1f}, "
+          f"p95 {report['ms_p95']:.1f}), {report['pages_per_sec']} páginas/s con {report['workers']} procesos")
+    for group, cer in report['cer_by_group'].items():
+        print(f"  {group:<30}{'-' if cer is None else format(cer, '.2%'):>8}")
+    print("Confusiones más frecuentes (esperado -> reconocido):")
+    for expected, recognized, count in report['confusions'][:15]:
+        print(f"  {expected or '∅'} -> {recognized or '∅'}  x{count}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evalúa precisión y velocidad del modelo entrenado")
+    parser.add_argument('--language', default='pvz')
+    parser.add_argument('--model-dir', default='tesseract_output', help="Directorio con <language>.traineddata")
+    parser.add_argument('--fonts', default=os.environ.get('PVZ_EVAL_FONTS_DIR'),
+                        help="Fuentes apartadas (no usadas en el entrenamiento)")
+    parser.add_argument('--text', default='training_text.txt')
+    parser.add_argument('--workers', type=int)
+    parser.add_argument('--backend', help="Motor de OCR (capi, tesserocr, pytesseract)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="Guardar el informe en JSON")
+    parser.add_argument('--no-history', action='store_true', help="No guardar en run_history.db")
+    args = parser.parse_args()
+
+    if not args.fonts or not os.path.isdir(args.fonts):
+        parser.error("Indica un directorio de fuentes apartadas con --fonts o PVZ_EVAL_FONTS_DIR")
+    fonts = sorted(os.path.join(args.fonts, f) for f in os.listdir(args.fonts) if f.lower().endswith(('.ttf', '.otf', '.ttc')))
+    try:
+        report = evaluate_model(fonts, load_eval_lines(args.text), args.language, args.model_dir,
+                                args.workers, args.backend, seed=args.seed)
+    except OcrEngineError as e:
+        print(f"Error: {e}")
+        return 1
+    print_report(report)
+
+    if not args.no_history:
+        from run_history import RunHistory
+        from dictionary_index import file_hash
+        history = RunHistory()
+        model_path = os.path.join(args.model_dir, f"{args.language}.traineddata")
+        model_hash = file_hash(model_path) if os.path.exists(model_path) else None
+        evaluation_id = history.record_evaluation(None, model_path, model_hash, report)
+        history.close()
+        print(f"Evaluación guardada en el historial con id {evaluation_id}")
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,65 @@
+import numpy as np
+import cv2
+
+# Detector de cambios entre fotogramas (o regiones) para no repetir el OCR cuando el
+# texto del juego no ha cambiado. Compara contra el último fotograma que se envió a OCR,
+# no contra el anterior, para que los cambios lentos acaben disparando un nuevo OCR.
+#
+#   diff   miniatura en gris, cuenta los píxeles que cambian más de pixel_threshold
+#   dhash  hash perceptual de diferencias (64 bits), distancia de Hamming
+
+CHANGE_METHODS = ('diff', 'dhash')
+
+
+def dhash(gray):
+    small = cv2.resize(gray, (9, 8), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).ravel()
+    return int(np.packbits(bits).view('>u8')[0])
+
+
+class ChangeDetector:
+    def __init__(self, method='diff', size=(64, 36), pixel_threshold=12,
+                 changed_ratio=0.004, hash_threshold=4):
+        if method not in CHANGE_METHODS:
+            raise ValueError(f"Método de detección de cambios desconocido: {method}")
+        self.method = method
+        self.size = size
+        self.pixel_threshold = pixel_threshold
+        self.changed_ratio = changed_ratio
+        self.hash_threshold = hash_threshold
+        self._references = {}
+        self._diff = np.empty((size[1], size[0]), dtype=np.uint8)
+        self.checks = 0
+        self.changes = 0
+
+    def _signature(self, gray):
+        if self.method == 'dhash':
+            return dhash(gray)
+        return cv2.resize(gray, self.size, interpolation=cv2.INTER_AREA)
+
+    def _differs(self, reference, signature):
+        if self.method == 'dhash':
+            return bin(reference ^ signature).count('1') > self.hash_threshold
+        cv2.absdiff(reference, signature, dst=self._diff)
+        changed = np.count_nonzero(self._diff > self.pixel_threshold)
+        return changed > self.changed_ratio * self._diff.size
+
+    def has_changed(self, gray, key='frame'):
+        self.checks += 1
+        signature = self._signature(gray)
+        reference = self._references.get(key)
+        if reference is not None and not self._differs(reference, signature):
+            return False
+        self._references[key] = signature
+        self.changes += 1
+        return True
+
+    def forget(self, key):
+        self._references.pop(key, None)
+
+    def reset(self):
+        self._references.clear()
+
+    @property
+    def skip_rate(self):
+        return 1 - self.changes / self.checks if self.checks else 0.0
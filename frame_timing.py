@@ -0,0 +1,87 @@
+import json
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+import numpy as np
+
+# Temporizadores por etapa del interceptor con percentiles sobre una ventana deslizante.
+#
+#   capture     grab() + copia del fotograma
+#   preprocess  escala de grises, detección de cambios, binarizado y regiones
+#   ocr         desde el envío del primer lote hasta tener todas las líneas
+#   translate   búsqueda en la memoria de traducción
+#   overlay     dibujo de las etiquetas
+#   latency     de la captura del fotograma a su resultado traducido
+#
+# Las etapas se registran desde varios hilos (captura, despachador, render).
+
+STAGES = ('capture', 'preprocess', 'ocr', 'translate', 'overlay', 'latency')
+PERCENTILES = (50, 95, 99)
+
+
+class FrameTimer:
+    def __init__(self, window=300):
+        self.window = window
+        self._samples = {}
+        self._counts = {}
+        self._lock = threading.Lock()
+        self.started_at = time.perf_counter()
+
+    def record(self, stage, seconds):
+        with self._lock:
+            samples = self._samples.get(stage)
+            if samples is None:
+                samples = self._samples[stage] = deque(maxlen=self.window)
+                self._counts[stage] = 0
+            samples.append(seconds)
+            self._counts[stage] += 1
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def count(self, stage):
+        return self._counts.get(stage, 0)
+
+    def rate(self, stage):
+        elapsed = time.perf_counter() - self.started_at
+        return self.count(stage) / elapsed if elapsed > 0 else 0.0
+
+    def percentiles(self, stage, percentiles=PERCENTILES):
+        with self._lock:
+            samples = np.array(self._samples.get(stage, ()), dtype=np.float64)
+        if not len(samples):
+            return None
+        return dict(zip(percentiles, np.percentile(samples, percentiles) * 1000))
+
+    def summary(self):
+        # Copia bajo el lock: record() puede añadir etapas desde otro hilo mientras se recorre
+        with self._lock:
+            samples = {stage: np.array(values, dtype=np.float64) for stage, values in self._samples.items()}
+            counts = dict(self._counts)
+        summary = {}
+        ordered = [stage for stage in STAGES if stage in samples]
+        ordered += sorted(stage for stage in samples if stage not in STAGES)
+        for stage in ordered:
+            values = np.percentile(samples[stage], PERCENTILES) * 1000
+            summary[stage] = {
+                'count': counts[stage],
+                **{f"p{p}_ms": round(v, 3) for p, v in zip(PERCENTILES, values)}
+            }
+        return summary
+
+    def overlay_lines(self):
+        return [f"{stage:<10} p50 {s['p50_ms']:6.1f}  p95 {s['p95_ms']:6.1f}  p99 {s['p99_ms']:6.1f} ms"
+                for stage, s in self.summary().items()]
+
+    def export(self, path, **extra):
+        data = {'window': self.window, 'elapsed': round(time.perf_counter() - self.started_at, 3),
+                **extra, 'stages': self.summary()}
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2)
+        return data
@@ -1,85 +1,258 @@
-import mss
-import numpy as np
+import os
 import cv2
-import pytesseract
-import win32gui
-import win32con
-import win32ui
 import time
+import numpy as np
+from capture import open_capture
+from frame_change import ChangeDetector
+from ocr_cache import OcrCache
+from ocr_engine import OcrEngineError, create_engine
+from ocr_pipeline import OcrPipeline
+from ocr_tiling import tile_frame, merge_results
+from translation_memory import TranslationMemory
+from dictionary_index import SymSpellIndex
+from overlay_renderer import OverlayRenderer
+from frame_timing import FrameTimer
+from text_stabilizer import TextStabilizer
+from screen_profiles import ScreenProfiles, ScreenProfile
+from preprocessing import DEFAULT_CHAIN, prepare_region, restore_scale
 
 # Configuración de Tesseract
-pytesseract.pytesseract.tesseract_cmd = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
-custom_config = r'--oem 3 --psm 6 -l pvz'  # Usar nuestro modelo de lenguaje personalizado 'pvz'
+ocr_language = 'pvz'  # Usar nuestro modelo de lenguaje personalizado 'pvz'
+tessdata_dir = os.environ.get('PVZ_TESSDATA')  # None: ruta por defecto de Tesseract
+
+# Fuente de captura: win32:<ventana>, mss, mss:<izq>,<arriba>,<ancho>,<alto> o replay:<ruta>
+window_name = "PlantsVsZombiesRH"  # Cambia esto según el nombre de tu ventana del juego
+capture_source = os.environ.get('PVZ_CAPTURE', f"win32:{window_name}")
+# Detección de cambios antes del OCR: diff (miniatura) o dhash (hash perceptual)
+change_method = os.environ.get('PVZ_CHANGE_METHOD', 'diff')
+# Cadena de preprocesado por defecto de cada región (preprocessing.py; elegir con su autotune)
+preprocess_chain = os.environ.get('PVZ_PREPROCESS', DEFAULT_CHAIN)
+# Caché de OCR por región binarizada (número máximo de entradas)
+ocr_cache = OcrCache(int(os.environ.get('PVZ_OCR_CACHE_SIZE', 2048)))
+# Procesos de OCR del pipeline asíncrono; 0 ejecuta todo en serie en el hilo principal
+ocr_workers = int(os.environ.get('PVZ_OCR_WORKERS', max(1, (os.cpu_count() or 2) // 2)))
+display_fps = int(os.environ.get('PVZ_DISPLAY_FPS', 60))
+# Reparto del OCR entre procesos: regions (regiones detectadas) o bands (franjas horizontales)
+ocr_tiling = os.environ.get('PVZ_OCR_TILING', 'regions')
+# Glosario de traducción (TSV) y distancia de edición máxima aceptada en la búsqueda aproximada
+glossary_path = os.environ.get('PVZ_GLOSSARY', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'glossary.tsv'))
+glossary_max_distance = int(os.environ.get('PVZ_GLOSSARY_MAX_DISTANCE', 2))
+translation_memory = None
+# Índice SymSpell del diccionario de entrenamiento (dictionary_index.py) para corregir el OCR
+dictionary_index_path = os.environ.get('PVZ_DICTIONARY_INDEX', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'tesseract_output', 'pvz.symspell'))
+dictionary_index = None
+overlay_renderer = None
+# Lecturas de OCR sobre las que vota el estabilizador de texto (1 lo desactiva)
+stabilize_frames = int(os.environ.get('PVZ_STABILIZE_FRAMES', 3))
+# Perfiles de OCR por pantalla del juego (ROIs, preprocesado, PSM y caracteres permitidos)
+screen_profiles_path = os.environ.get('PVZ_SCREEN_PROFILES', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'screen_profiles.json'))
+screen_profiles = None
+# Tiempos por etapa: PVZ_SHOW_TIMINGS=1 los dibuja en el overlay, PVZ_TIMINGS los guarda en JSON
+show_timings = os.environ.get('PVZ_SHOW_TIMINGS') == '1'
+timings_path = os.environ.get('PVZ_TIMINGS')
 
-def capture_game_window(window_name):
-    hwnd = win32gui.FindWindow(None, window_name)
-    if hwnd:
-        hwndDC = win32gui.GetWindowDC(hwnd)
-        mfcDC = win32ui.CreateDCFromHandle(hwndDC)
-        saveDC = mfcDC.CreateCompatibleDC()
+def frame_gray(img):
+    return cv2.cvtColor(img, cv2.COLOR_BGRA2GRAY)
 
-        left, top, right, bottom = win32gui.GetClientRect(hwnd)
-        width = right - left
-        height = bottom - top
+def select_profile(img):
+    # Los perfiles se cargan en el primer fotograma analizado; sin archivo, todo es 'default'
+    global screen_profiles
+    if screen_profiles is None:
+        if os.path.exists(screen_profiles_path):
+            screen_profiles = ScreenProfiles.load(screen_profiles_path, preprocess_chain)
+        else:
+            screen_profiles = ScreenProfiles({}, ScreenProfile('default', preprocess=preprocess_chain), None)
+    return screen_profiles.select(img)
 
-        saveBitMap = win32ui.CreateBitmap()
-        saveBitMap.CreateCompatibleBitmap(mfcDC, width, height)
-        saveDC.SelectObject(saveBitMap)
+def analyze_frame(img, gray):
+    # Devuelve las regiones a reconocer; cada una lleva la cadena de preprocesado de su perfil
+    profile = select_profile(img)
+    # Las ROIs del perfil ya son los tiles; sin ROIs se aplica el teselado configurado
+    if profile.rois or ocr_tiling == 'regions':
+        return profile.regions(gray)
+    # Las franjas solo necesitan saber dónde no hay tinta: basta un Otsu del fotograma en gris
+    _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU)
+    tiles = tile_frame(binary, None, ocr_tiling, max(1, ocr_workers))
+    for tile in tiles:
+        tile.whitelist = profile.whitelist
+        tile.chain = profile.preprocess
+    return tiles
 
-        saveDC.BitBlt((0, 0), (width, height), mfcDC, (0, 0), win32con.SRCCOPY)
+def prepare_regions(img, regions):
+    # Recorte + cadena de preprocesado de cada región: [(región, imagen para el OCR, escala)]
+    return [(region, *prepare_region(img, region, preprocess_chain)) for region in regions]
 
-        bmpinfo = saveBitMap.GetInfo()
-        bmpstr = saveBitMap.GetBitmapBits(True)
+def ocr_regions(engine, prepared):
+    # Solo se hace OCR de las regiones candidatas, cada una con su modo de segmentación
+    results = []
+    for region, binary, scale in prepared:
+        lines = ocr_cache.get_or_compute(
+            binary,
+            lambda image: restore_scale(engine.recognize_lines(image, psm=region.psm, whitelist=region.whitelist), scale),
+            extra=region.ocr_key
+        )
+        results.append((region, lines))
+    return results
 
-        win32gui.DeleteObject(saveBitMap.GetHandle())
-        saveDC.DeleteDC()
-        win32gui.ReleaseDC(hwnd, hwndDC)
+def create_stabilizer():
+    return TextStabilizer(translate_text, stabilize_frames) if stabilize_frames > 1 else None
 
-        img = np.frombuffer(bmpstr, dtype='uint8')
-        img.shape = (bmpinfo['bmHeight'], bmpinfo['bmWidth'], 4)
-        img = cv2.cvtColor(img, cv2.COLOR_BGRA2BGR)
-        return img
-    else:
-        print("No se pudo encontrar la ventana del juego.")
-        return None
+def translate_regions(results, stabilizer=None):
+    # Cada traducción conserva la caja de su línea para dibujarla en el mismo sitio.
+    # Con estabilizador devuelve None si el texto por consenso no cambió
+    lines = merge_results(results)
+    if stabilizer is None:
+        return [(translate_text(line.text), line) for line in lines]
+    labels, changed = stabilizer.update(lines)
+    return labels if changed else None
+
+def correct_text(text):
+    # El índice se abre con mmap en la primera corrección; sin índice el texto no se toca
+    global dictionary_index
+    if dictionary_index is None:
+        dictionary_index = SymSpellIndex(dictionary_index_path) if os.path.exists(dictionary_index_path) else False
+    return dictionary_index.correct(text) if dictionary_index else text
 
 def translate_text(text):
-    translations = {
-        "hello": "hola",
-        "zombie": "zombi",
-        # Agrega más traducciones aquí
-    }
-    return translations.get(text.lower(), text)
+    # El glosario se carga en la primera traducción: los procesos de OCR no lo necesitan
+    global translation_memory
+    if translation_memory is None:
+        if os.path.exists(glossary_path):
+            translation_memory = TranslationMemory.load(glossary_path, max_distance=glossary_max_distance)
+        else:
+            print(f"No se encontró el glosario {glossary_path}")
+            translation_memory = TranslationMemory(max_distance=glossary_max_distance)
+    return translation_memory.translate(correct_text(text))
 
 def overlay_translated_text(image, translated_texts):
-    for idx, text in enumerate(translated_texts):
-        position = (10, 30 + idx * 30)  # Cambia esto según donde quieras el texto
-        cv2.putText(image, text, position, cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 0, 0), 2, cv2.LINE_AA)
+    # translated_texts: [(traducción, línea de OCR)]; se dibuja sobre la caja de la línea
+    global overlay_renderer
+    if overlay_renderer is None:
+        overlay_renderer = OverlayRenderer()
+    overlay_renderer.draw(image, translated_texts)
 
-def main():
-    window_name = "PlantsVsZombiesRH"  # Cambia esto según el nombre de tu ventana del juego
+def show_frame(image, timer, delay=1):
+    if show_timings:
+        for idx, line in enumerate(timer.overlay_lines()):
+            cv2.putText(image, line, (10, image.shape[0] - 10 - idx * 18), cv2.FONT_HERSHEY_PLAIN,
+                        1, (0, 255, 255), 1, cv2.LINE_AA)
+    cv2.imshow("Overlay", image)
+    return cv2.waitKey(delay) & 0xFF != ord('q')
+
+def run_sync(source, detector, timer, headless=False):
+    translated_texts = []
+    stabilizer = create_stabilizer()
+    counts = {'captured': 0, 'processed': 0, 'skipped': 0, 'dropped': 0, 'stable': 0}
 
-    while True:
-        img = capture_game_window(window_name)
-        if img is not None:
-            gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-            _, thresh = cv2.threshold(gray, 150, 255, cv2.THRESH_BINARY)
+    # El motor carga el modelo 'pvz' una sola vez y recibe las imágenes en memoria
+    engine = create_engine(ocr_language, tessdata_dir)
+    print(f"Motor de OCR: {engine.name}")
 
-            extracted_text = pytesseract.image_to_string(thresh, config=custom_config)
-            text_lines = extracted_text.splitlines()
+    with engine:
+        while True:
+            # img es una vista BGRA sobre el buffer de captura, que se reutiliza en cada fotograma
+            with timer.stage('capture'):
+                img = source.grab()
+            if img is not None:
+                counts['captured'] += 1
+                captured_at = time.perf_counter()
+                with timer.stage('preprocess'):
+                    gray = frame_gray(img)
+                    # Si la imagen no cambió desde el último OCR se reutiliza la traducción anterior,
+                    # salvo que el estabilizador espere más lecturas para confirmar un cambio
+                    changed = detector.has_changed(gray)
+                    if not changed and stabilizer is not None and stabilizer.pending:
+                        changed = True
+                    if changed:
+                        prepared = prepare_regions(img, analyze_frame(img, gray))
 
-            translated_texts = [translate_text(line) for line in text_lines if line.strip()]
+                if changed:
+                    with timer.stage('ocr'):
+                        results = ocr_regions(engine, prepared)
+                    with timer.stage('translate'):
+                        labels = translate_regions(results, stabilizer)
+                    counts['processed'] += 1
+                    if labels is None:
+                        counts['stable'] += 1
+                    else:
+                        translated_texts = labels
+                        timer.record('latency', time.perf_counter() - captured_at)
+                else:
+                    counts['skipped'] += 1
 
-            overlay_translated_text(img, translated_texts)
+                with timer.stage('overlay'):
+                    overlay_translated_text(img, translated_texts)
 
-            cv2.imshow("Overlay", img)
+                if not headless and not show_frame(img, timer):
+                    break
+            elif source.finished:
+                break
+            else:
+                print("No se pudo capturar la ventana del juego.")
 
-        if cv2.waitKey(1) & 0xFF == ord('q'):
-            break
+            if not headless:
+                time.sleep(0.01)
+    return counts
+
+def run_async(source, detector, timer, headless=False):
+    # Captura y OCR corren en segundo plano; este bucle solo dibuja, a la frecuencia de pantalla
+    pipeline = OcrPipeline(source, frame_gray, analyze_frame, translate_text, ocr_language,
+                           tessdata_dir, workers=ocr_workers, detector=detector, cache=ocr_cache,
+                           timer=timer, stabilizer=create_stabilizer())
+    print(f"Pipeline asíncrono con {ocr_workers} procesos de OCR (teselado: {ocr_tiling})")
+    frame_delay = max(1, 1000 // display_fps)
+    display = None
+
+    with pipeline:
+        while not pipeline.done:
+            item = pipeline.latest_frame()
+            if item is not None:
+                _, _, frame = item
+                # Se dibuja sobre una copia: el fotograma puede estar siendo analizado
+                if display is None or display.shape != frame.shape:
+                    display = np.empty_like(frame)
+                np.copyto(display, frame)
+
+                result = pipeline.poll_result()
+                with timer.stage('overlay'):
+                    if result is not None:
+                        overlay_translated_text(display, result.translations)
+                if not headless and not show_frame(display, timer, frame_delay):
+                    break
+                if headless:
+                    time.sleep(frame_delay / 1000)
+            elif headless:
+                time.sleep(frame_delay / 1000)
+            elif cv2.waitKey(frame_delay) & 0xFF == ord('q'):
+                break
+
+    if pipeline.error is not None:
+        raise OcrEngineError(pipeline.error)
+    print(f"Fotogramas capturados: {pipeline.captured}, con OCR: {pipeline.processed}, "
+          f"sin cambios: {pipeline.skipped}, descartados: {pipeline.ocr_input.dropped}, "
+          f"texto estable: {pipeline.stable}, con errores de OCR: {pipeline.errors}")
+    return {'captured': pipeline.captured, 'processed': pipeline.processed,
+            'skipped': pipeline.skipped, 'dropped': pipeline.ocr_input.dropped, 'stable': pipeline.stable}
+
+def main():
+    detector = ChangeDetector(change_method)
+    timer = FrameTimer()
 
-        time.sleep(0.01)
+    with open_capture(capture_source) as source:
+        if ocr_workers > 0:
+            run_async(source, detector, timer)
+        else:
+            run_sync(source, detector, timer)
 
     cv2.destroyAllWindows()
+    stats = ocr_cache.stats()
+    print(f"Caché OCR: {stats['hits']} aciertos, {stats['misses']} fallos "
+          f"({stats['hit_rate']:.1%}), {stats['entries']} entradas")
+    for line in timer.overlay_lines():
+        print(line)
+    if timings_path:
+        timer.export(timings_path, ocr_cache=stats)
+        print(f"Tiempos por etapa guardados en {timings_path}")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,116 @@
+import os
+import re
+import zlib
+from collections import OrderedDict
+from PIL import Image
+
+# Ajuste fino (fine-tuning) de un modelo LSTM existente como alternativa al entrenamiento
+# legacy desde cero. Reutiliza las páginas ya renderizadas (p0000.png + .box):
+#
+#   1. cada página se corta en líneas según las cajas del .box; cada línea se guarda como
+#      imagen con un .box en formato WordStr (una caja por línea) y tesseract lstm.train
+#      la convierte en .lstmf
+#   2. las muestras se reparten en listas de entrenamiento y evaluación (reparto estable
+#      por hash del nombre: una muestra no cambia de lista entre ejecuciones)
+#   3. lstmtraining --continue_from parte del LSTM del modelo base (p. ej. chi_sim) o del
+#      último checkpoint si el entrenamiento se interrumpió
+#   4. lstmtraining --stop_training convierte el checkpoint en pvz.traineddata
+#
+# Este módulo solo prepara muestras y comandos; las etapas están en train_tesseract_pvz.py.
+
+LSTM_FOLDER = 'lstm_output'
+EVAL_RATIO = 0.1
+ITERATION_RE = re.compile(r"At iteration (\d+)/(\d+)/(\d+).*?BCER train=([\d.]+)%")
+
+
+def read_box_lines(box_path):
+    # Cajas del render legacy: "<carácter> izq arriba der abajo 0", una fila por línea de texto.
+    # Los espacios no tienen caja, así que el texto de la línea queda sin espacios (CJK).
+    # Las x de esas cajas son aproximadas (medio cuerpo por carácter): solo se usan las filas
+    lines = OrderedDict()
+    with open(box_path, 'r', encoding='utf-8') as f:
+        for row in f:
+            parts = row.rstrip('\n').rsplit(' ', 5)
+            if len(parts) != 6:
+                continue
+            lines.setdefault((int(parts[2]), int(parts[4])), []).append(parts[0])
+    return [(top, bottom, ''.join(chars)) for (top, bottom), chars in lines.items()]
+
+
+def write_line_samples(image_path, box_path, output_dir):
+    # Devuelve las rutas base (sin extensión) de las líneas de la página; las ya escritas se reutilizan
+    page_name = os.path.splitext(os.path.basename(image_path))[0]
+    os.makedirs(output_dir, exist_ok=True)
+    bases = []
+    page = None
+    for index, (top, bottom, text) in enumerate(read_box_lines(box_path)):
+        base = os.path.join(output_dir, f"{page_name}_l{index:02d}")
+        bases.append(base)
+        if os.path.exists(f"{base}.png") and os.path.exists(f"{base}.box"):
+            continue
+        if page is None:
+            page = Image.open(image_path)
+        # Ancho completo de la página: los caracteres CJK ocupan un cuerpo entero, no medio
+        line = page.crop((0, top, page.width, min(page.height, bottom)))
+        line.save(f"{base}.png", format='PNG')
+        write_wordstr_box(f"{base}.box", text, line.width, line.height)
+    return bases
+
+
+def write_wordstr_box(path, text, width, height):
+    # Formato de línea completa de tesstrain: el texto entero en una caja y un tabulador final
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(f"WordStr 0 0 {width} {height} 0 #{text}\n")
+        f.write(f"\t 0 0 {width} {height} 0\n")
+
+
+def lstmf_command(base):
+    return ['tesseract.exe', f"{base}.png", base, '--psm', '13', 'lstm.train']
+
+
+def is_eval_sample(path, ratio=EVAL_RATIO):
+    return zlib.crc32(os.path.basename(path).encode('utf-8')) % 1000 < ratio * 1000
+
+
+def write_list_files(lstmf_files, train_path, eval_path, ratio=EVAL_RATIO):
+    train, evaluation = [], []
+    for path in sorted(lstmf_files):
+        (evaluation if is_eval_sample(path, ratio) else train).append(path)
+    for list_path, files in ((train_path, train), (eval_path, evaluation)):
+        with open(list_path, 'w', encoding='utf-8') as f:
+            f.writelines(f"{path}\n" for path in files)
+    return len(train), len(evaluation)
+
+
+def extract_lstm_command(base_traineddata, lstm_path):
+    return ['combine_tessdata.exe', '-e', base_traineddata, lstm_path]
+
+
+def training_command(model_output, continue_from, base_traineddata, train_list, eval_list,
+                     max_iterations, target_error_rate):
+    return [
+        'lstmtraining.exe',
+        '--model_output', model_output,
+        '--continue_from', continue_from,
+        '--traineddata', base_traineddata,
+        '--train_listfile', train_list,
+        '--eval_listfile', eval_list,
+        '--max_iterations', str(max_iterations),
+        '--target_error_rate', str(target_error_rate)
+    ]
+
+
+def stop_command(checkpoint, base_traineddata, output_traineddata):
+    return [
+        'lstmtraining.exe',
+        '--stop_training',
+        '--continue_from', checkpoint,
+        '--traineddata', base_traineddata,
+        '--model_output', output_traineddata
+    ]
+
+
+def parse_iteration(line):
+    # "At iteration 1200/1200/1203, Mean rms=..., BCER train=3.41%, ..." -> (iteración, BCER %)
+    match = ITERATION_RE.search(line)
+    return (int(match.group(2)), float(match.group(4))) if match else None
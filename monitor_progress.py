@@ -1,4 +1,5 @@
 from flask import Flask, render_template, jsonify
+import os
 import json
 from datetime import timedelta
 from tqdm import tqdm
@@ -6,24 +7,32 @@ from tqdm import tqdm
 app = Flask(__name__)
 
 progress_json_path = 'progress.json'
+training_mode = os.environ.get('PVZ_TRAINING_MODE', 'legacy')
 
 def get_progress_data():
-    all_stages = [
-        'start',
-        'data_generation',
-        'data_generated',
-        'training',
-        'process_unicharset',
-        'combine_unicharset',
-        'generate_font_properties',
-        'generate_tr_files',
-        'complete_shapeclustering',
-        'run_mftraining',
-        'run_cntraining',
-        'rename_files',
-        'combine_training_data',
-        'training_completed'
-    ]
+    training_stages = {
+        'legacy': [
+            'process_unicharset',
+            'combine_unicharset',
+            'generate_font_properties',
+            'generate_tr_files',
+            'complete_shapeclustering',
+            'run_mftraining',
+            'run_cntraining',
+            'rename_files',
+            'build_dictionary',
+            'combine_training_data'
+        ],
+        'lstm': [
+            'generate_lstmf',
+            'extract_lstm_model',
+            'lstm_training',
+            'finish_lstm_model'
+        ]
+    }
+    # Mismo modo que train_tesseract_pvz.py
+    all_stages = ['start', 'data_generation', 'data_generated', 'training'] + \
+        training_stages.get(training_mode, training_stages['legacy']) + ['evaluate_model', 'training_completed']
 
     try:
         with open(progress_json_path, 'r') as f:
@@ -0,0 +1,57 @@
+import hashlib
+from collections import OrderedDict
+import numpy as np
+
+# Caché LRU de resultados de OCR indexada por el hash de la región ya binarizada.
+# Una etiqueta repetida cuesta un hash y una búsqueda en lugar de una llamada a Tesseract.
+
+
+def region_key(image, extra=''):
+    image = np.ascontiguousarray(image)
+    digest = hashlib.blake2b(image.data, digest_size=16)
+    digest.update(f"{image.shape}:{image.dtype}:{extra}".encode())
+    return digest.digest()
+
+
+class OcrCache:
+    def __init__(self, max_entries=2048):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        try:
+            value = self._entries[key]
+        except KeyError:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get_or_compute(self, image, compute, extra=''):
+        key = region_key(image, extra)
+        value = self.get(key)
+        if value is None:
+            value = compute(image)
+            self.put(key, value)
+        return value
+
+    @property
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self):
+        return {'entries': len(self._entries), 'hits': self.hits, 'misses': self.misses,
+                'hit_rate': round(self.hit_rate, 4)}
@@ -0,0 +1,352 @@
+import os
+import glob
+import shlex
+import ctypes
+import ctypes.util
+from dataclasses import dataclass, replace
+import numpy as np
+
+# Motores de OCR residentes: el modelo se carga una sola vez y las imágenes se pasan en
+# memoria, sin archivos temporales ni un proceso tesseract nuevo por fotograma.
+#
+#   tesserocr    binding de la API de Tesseract (si está instalado)
+#   capi         API C de libtesseract mediante ctypes (sin dependencias extra)
+#   pytesseract  respaldo: lanza tesseract.exe en cada llamada
+#
+# Cada motor mantiene estado interno de Tesseract: usar una instancia por hilo/proceso.
+
+OCR_BACKENDS = ('tesserocr', 'capi', 'pytesseract')
+TESSERACT_DIR = r'C:\Program Files\Tesseract-OCR'
+# Resolución de pantalla: evita el aviso "Invalid resolution 0 dpi" en cada imagen
+SCREEN_DPI = 96
+# Nivel de iteración de Tesseract (PageIteratorLevel) usado para las cajas de línea
+RIL_TEXTLINE = 2
+
+
+class OcrEngineError(RuntimeError):
+    pass
+
+
+def image_buffer(image):
+    image = np.ascontiguousarray(image, dtype=np.uint8)
+    height, width = image.shape[:2]
+    bytes_per_pixel = 1 if image.ndim == 2 else image.shape[2]
+    return image, width, height, bytes_per_pixel, width * bytes_per_pixel
+
+
+@dataclass(frozen=True)
+class OcrLine:
+    # Línea reconocida con su caja en píxeles de la imagen de entrada
+    text: str
+    x: int
+    y: int
+    w: int
+    h: int
+    confidence: float = -1.0
+
+    def offset(self, dx, dy):
+        return replace(self, x=self.x + dx, y=self.y + dy)
+
+    def scaled(self, factor):
+        return replace(self, x=int(round(self.x * factor)), y=int(round(self.y * factor)),
+                       w=max(1, int(round(self.w * factor))), h=max(1, int(round(self.h * factor))))
+
+
+class OcrEngine:
+    name = None
+
+    def recognize(self, image, psm=6, whitelist=None):
+        raise NotImplementedError
+
+    def recognize_lines(self, image, psm=6, whitelist=None):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def find_libtesseract():
+    candidates = [os.environ.get('PVZ_LIBTESSERACT'), ctypes.util.find_library('tesseract')]
+    if os.name == 'nt':
+        candidates += sorted(glob.glob(os.path.join(TESSERACT_DIR, 'libtesseract-*.dll')), reverse=True)
+    else:
+        candidates += ['libtesseract.so.5', 'libtesseract.so.4', 'libtesseract.dylib']
+    for candidate in candidates:
+        if not candidate:
+            continue
+        try:
+            return ctypes.CDLL(candidate)
+        except OSError:
+            continue
+    raise OcrEngineError("No se encontró libtesseract")
+
+
+class CApiEngine(OcrEngine):
+    name = 'capi'
+
+    def __init__(self, language, datapath=None, oem=3):
+        lib = self._lib = find_libtesseract()
+        lib.TessBaseAPICreate.restype = ctypes.c_void_p
+        lib.TessBaseAPIInit2.argtypes = [ctypes.c_void_p, ctypes.c_char_p, ctypes.c_char_p, ctypes.c_int]
+        lib.TessBaseAPIInit2.restype = ctypes.c_int
+        lib.TessBaseAPISetPageSegMode.argtypes = [ctypes.c_void_p, ctypes.c_int]
+        lib.TessBaseAPISetVariable.argtypes = [ctypes.c_void_p, ctypes.c_char_p, ctypes.c_char_p]
+        lib.TessBaseAPISetVariable.restype = ctypes.c_int
+        lib.TessBaseAPISetImage.argtypes = [ctypes.c_void_p, ctypes.c_void_p, ctypes.c_int,
+                                            ctypes.c_int, ctypes.c_int, ctypes.c_int]
+        lib.TessBaseAPISetSourceResolution.argtypes = [ctypes.c_void_p, ctypes.c_int]
+        lib.TessBaseAPIRecognize.argtypes = [ctypes.c_void_p, ctypes.c_void_p]
+        lib.TessBaseAPIRecognize.restype = ctypes.c_int
+        lib.TessBaseAPIGetIterator.argtypes = [ctypes.c_void_p]
+        lib.TessBaseAPIGetIterator.restype = ctypes.c_void_p
+        lib.TessResultIteratorGetPageIterator.argtypes = [ctypes.c_void_p]
+        lib.TessResultIteratorGetPageIterator.restype = ctypes.c_void_p
+        lib.TessResultIteratorGetUTF8Text.argtypes = [ctypes.c_void_p, ctypes.c_int]
+        lib.TessResultIteratorGetUTF8Text.restype = ctypes.c_void_p
+        lib.TessResultIteratorConfidence.argtypes = [ctypes.c_void_p, ctypes.c_int]
+        lib.TessResultIteratorConfidence.restype = ctypes.c_float
+        lib.TessResultIteratorNext.argtypes = [ctypes.c_void_p, ctypes.c_int]
+        lib.TessResultIteratorNext.restype = ctypes.c_int
+        lib.TessResultIteratorDelete.argtypes = [ctypes.c_void_p]
+        lib.TessPageIteratorBoundingBox.argtypes = [ctypes.c_void_p, ctypes.c_int] + [ctypes.POINTER(ctypes.c_int)] * 4
+        lib.TessPageIteratorBoundingBox.restype = ctypes.c_int
+        lib.TessBaseAPIGetUTF8Text.argtypes = [ctypes.c_void_p]
+        lib.TessBaseAPIGetUTF8Text.restype = ctypes.c_void_p
+        lib.TessDeleteText.argtypes = [ctypes.c_void_p]
+        lib.TessBaseAPIClear.argtypes = [ctypes.c_void_p]
+        lib.TessBaseAPIEnd.argtypes = [ctypes.c_void_p]
+        lib.TessBaseAPIDelete.argtypes = [ctypes.c_void_p]
+
+        self._handle = lib.TessBaseAPICreate()
+        path = datapath.encode() if datapath else None
+        if lib.TessBaseAPIInit2(self._handle, path, language.encode(), oem) != 0:
+            lib.TessBaseAPIDelete(self._handle)
+            self._handle = None
+            raise OcrEngineError(f"No se pudo cargar el idioma {language}")
+        self._psm = None
+        self._whitelist = None
+
+    def _configure(self, psm, whitelist):
+        if psm != self._psm:
+            self._lib.TessBaseAPISetPageSegMode(self._handle, psm)
+            self._psm = psm
+        whitelist = whitelist or ''
+        if whitelist != self._whitelist:
+            self._lib.TessBaseAPISetVariable(self._handle, b'tessedit_char_whitelist', whitelist.encode())
+            self._whitelist = whitelist
+
+    def _set_image(self, image):
+        # El array debe seguir vivo mientras Tesseract lo usa: se devuelve al llamador
+        image, width, height, bytes_per_pixel, bytes_per_line = image_buffer(image)
+        self._lib.TessBaseAPISetImage(self._handle, image.ctypes.data, width, height,
+                                      bytes_per_pixel, bytes_per_line)
+        self._lib.TessBaseAPISetSourceResolution(self._handle, SCREEN_DPI)
+        return image
+
+    def _take_text(self, pointer):
+        if not pointer:
+            return ''
+        try:
+            return ctypes.string_at(pointer).decode('utf-8', errors='replace')
+        finally:
+            self._lib.TessDeleteText(pointer)
+
+    def recognize(self, image, psm=6, whitelist=None):
+        self._configure(psm, whitelist)
+        image = self._set_image(image)
+        try:
+            return self._take_text(self._lib.TessBaseAPIGetUTF8Text(self._handle))
+        finally:
+            self._lib.TessBaseAPIClear(self._handle)
+
+    def recognize_lines(self, image, psm=6, whitelist=None):
+        lib = self._lib
+        self._configure(psm, whitelist)
+        image = self._set_image(image)
+        lines = []
+        try:
+            if lib.TessBaseAPIRecognize(self._handle, None) != 0:
+                return lines
+            iterator = lib.TessBaseAPIGetIterator(self._handle)
+            if not iterator:
+                return lines
+            page_iterator = lib.TessResultIteratorGetPageIterator(iterator)
+            box = [ctypes.c_int() for _ in range(4)]
+            try:
+                while True:
+                    text = self._take_text(lib.TessResultIteratorGetUTF8Text(iterator, RIL_TEXTLINE)).strip()
+                    if text and lib.TessPageIteratorBoundingBox(page_iterator, RIL_TEXTLINE,
+                                                                *[ctypes.byref(v) for v in box]):
+                        left, top, right, bottom = (v.value for v in box)
+                        confidence = lib.TessResultIteratorConfidence(iterator, RIL_TEXTLINE)
+                        lines.append(OcrLine(text, left, top, right - left, bottom - top, confidence))
+                    if not lib.TessResultIteratorNext(iterator, RIL_TEXTLINE):
+                        break
+            finally:
+                lib.TessResultIteratorDelete(iterator)
+        finally:
+            lib.TessBaseAPIClear(self._handle)
+        return lines
+
+    def close(self):
+        if self._handle:
+            self._lib.TessBaseAPIEnd(self._handle)
+            self._lib.TessBaseAPIDelete(self._handle)
+            self._handle = None
+
+
+class TesserocrEngine(OcrEngine):
+    name = 'tesserocr'
+
+    def __init__(self, language, datapath=None, oem=3):
+        import tesserocr
+        kwargs = {'lang': language, 'oem': oem}
+        if datapath:
+            kwargs['path'] = datapath
+        try:
+            self._api = tesserocr.PyTessBaseAPI(**kwargs)
+        except RuntimeError as e:
+            raise OcrEngineError(str(e))
+        self._psm = None
+        self._whitelist = None
+
+    def _configure(self, psm, whitelist):
+        if psm != self._psm:
+            self._api.SetPageSegMode(psm)
+            self._psm = psm
+        whitelist = whitelist or ''
+        if whitelist != self._whitelist:
+            self._api.SetVariable('tessedit_char_whitelist', whitelist)
+            self._whitelist = whitelist
+
+    def _set_image(self, image):
+        image, width, height, bytes_per_pixel, bytes_per_line = image_buffer(image)
+        self._api.SetImageBytes(image.tobytes(), width, height, bytes_per_pixel, bytes_per_line)
+        self._api.SetSourceResolution(SCREEN_DPI)
+        return image
+
+    def recognize(self, image, psm=6, whitelist=None):
+        self._configure(psm, whitelist)
+        self._set_image(image)
+        return self._api.GetUTF8Text()
+
+    def recognize_lines(self, image, psm=6, whitelist=None):
+        from tesserocr import RIL, iterate_level
+        self._configure(psm, whitelist)
+        self._set_image(image)
+        lines = []
+        if not self._api.Recognize():
+            return lines
+        iterator = self._api.GetIterator()
+        if iterator is None:
+            return lines
+        for line in iterate_level(iterator, RIL.TEXTLINE):
+            text = (line.GetUTF8Text(RIL.TEXTLINE) or '').strip()
+            box = line.BoundingBox(RIL.TEXTLINE)
+            if text and box:
+                left, top, right, bottom = box
+                lines.append(OcrLine(text, left, top, right - left, bottom - top, line.Confidence(RIL.TEXTLINE)))
+        return lines
+
+    def close(self):
+        self._api.End()
+
+
+def quote_whitelist(whitelist):
+    # pytesseract separa config con shlex.split (posix salvo en Windows). En posix se cita;
+    # en modo no posix las comillas llegan tal cual a tesseract, así que se quitan los
+    # caracteres que partirían el argumento (espacios y comillas) en lugar de citarlos
+    if os.name != 'nt':
+        return shlex.quote(whitelist)
+    return ''.join(c for c in whitelist if not c.isspace() and c not in '"\'')
+
+
+class PytesseractEngine(OcrEngine):
+    name = 'pytesseract'
+
+    def __init__(self, language, datapath=None, oem=3):
+        import pytesseract
+        if os.name == 'nt':
+            pytesseract.pytesseract.tesseract_cmd = os.path.join(TESSERACT_DIR, 'tesseract.exe')
+        self._pytesseract = pytesseract
+        self.language = language
+        self.datapath = datapath
+        self.oem = oem
+
+    def config(self, psm, whitelist=None):
+        config = f'--oem {self.oem} --psm {psm} -l {self.language}'
+        if self.datapath:
+            config += f' --tessdata-dir "{self.datapath}"'
+        if whitelist:
+            config += f' -c tessedit_char_whitelist={quote_whitelist(whitelist)}'
+        return config
+
+    def recognize(self, image, psm=6, whitelist=None):
+        return self._pytesseract.image_to_string(image, config=self.config(psm, whitelist))
+
+    def recognize_lines(self, image, psm=6, whitelist=None):
+        data = self._pytesseract.image_to_data(image, config=self.config(psm, whitelist),
+                                               output_type=self._pytesseract.Output.DICT)
+        # image_to_data da palabras: se agrupan por (bloque, párrafo, línea)
+        words = {}
+        for i, text in enumerate(data['text']):
+            if float(data['conf'][i]) < 0 or not text.strip():
+                continue
+            key = (data['block_num'][i], data['par_num'][i], data['line_num'][i])
+            words.setdefault(key, []).append(i)
+        lines = []
+        for indices in words.values():
+            left = min(data['left'][i] for i in indices)
+            top = min(data['top'][i] for i in indices)
+            right = max(data['left'][i] + data['width'][i] for i in indices)
+            bottom = max(data['top'][i] + data['height'][i] for i in indices)
+            confidence = sum(float(data['conf'][i]) for i in indices) / len(indices)
+            text = ' '.join(data['text'][i] for i in indices)
+            lines.append(OcrLine(text, left, top, right - left, bottom - top, confidence))
+        return lines
+
+
+ENGINE_CLASSES = {
+    'tesserocr': TesserocrEngine,
+    'capi': CApiEngine,
+    'pytesseract': PytesseractEngine
+}
+
+
+def create_engine(language, datapath=None, oem=3, backend=None):
+    backend = backend or os.environ.get('PVZ_OCR_BACKEND')
+    backends = [backend] if backend else OCR_BACKENDS
+    errors = []
+    for name in backends:
+        try:
+            return ENGINE_CLASSES[name](language, datapath, oem)
+        except (ImportError, OSError, OcrEngineError) as e:
+            errors.append(f"{name}: {e}")
+    raise OcrEngineError("No hay ningún motor de OCR disponible (" + "; ".join(errors) + ")")
+
+
+def check_engine(language, datapath=None, oem=3, backend=None):
+    # Crea el motor y reconoce una imagen en blanco en el proceso actual. Se usa antes de lanzar
+    # un pool: sin tesseract o sin .traineddata el fallo aparece aquí y no en los procesos (un
+    # error en el inicializador hace que el pool los relance sin fin). Devuelve el backend que
+    # funcionó, para que los procesos usen el mismo
+    try:
+        with create_engine(language, datapath, oem, backend) as engine:
+            engine.recognize(np.full((32, 32), 255, dtype=np.uint8))
+            return engine.name
+    except OcrEngineError:
+        raise
+    except Exception as e:
+        raise OcrEngineError(f"El motor de OCR no funciona: {worker_error(e)}") from e
+
+
+def worker_error(e):
+    # Algunas excepciones (TesseractNotFoundError de pytesseract) no se pueden deserializar: en
+    # un pool rompen el hilo de resultados y get() no vuelve nunca. Se reenvían como texto
+    return OcrEngineError(f"{type(e).__name__}: {e}")
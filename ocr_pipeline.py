@@ -0,0 +1,334 @@
+import os
+import time
+import threading
+import multiprocessing
+import numpy as np
+from dataclasses import dataclass, field
+from typing import List, Tuple
+
+from ocr_engine import OcrLine, OcrEngineError, create_engine, check_engine, worker_error
+from ocr_cache import region_key
+from ocr_tiling import balance_batches, merge_results
+from preprocessing import prepare_region, restore_scale
+from frame_timing import FrameTimer
+
+# Pipeline asíncrono captura -> OCR -> traducción -> render.
+#
+#   hilo de captura      copia cada fotograma y lo deja en dos "slots" de un elemento
+#   hilo despachador     detección de cambios, regiones, preprocesado y caché; los fallos se
+#                        agrupan en un lote por proceso del pool OCR (fuera del GIL)
+#   bucle de render      (en el hilo principal) dibuja el último resultado disponible
+#                        sobre el fotograma más reciente, a la frecuencia de pantalla
+#
+# Los slots guardan solo el elemento más reciente: los fotogramas viejos se descartan
+# en lugar de acumularse, y los resultados llegan etiquetados con su frame_id.
+#
+# El motor se prueba en el proceso principal antes de crear el pool, y los errores de los
+# procesos vuelven como OcrEngineError. Un fotograma con un lote fallido no se guarda en la
+# caché ni se publica; tras MAX_CONSECUTIVE_ERRORS fotogramas fallidos seguidos, o un lote que
+# no termina en OCR_TIMEOUT segundos (pool bloqueado), el pipeline se detiene con el error en
+# OcrPipeline.error.
+
+# Segundos máximos de un lote de OCR
+OCR_TIMEOUT = 30.0
+MAX_CONSECUTIVE_ERRORS = 10
+
+
+class LatestSlot:
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._item = None
+        self.dropped = 0
+
+    def put(self, item):
+        with self._condition:
+            if self._item is not None:
+                self.dropped += 1
+            self._item = item
+            self._condition.notify()
+
+    def take(self, timeout=None):
+        with self._condition:
+            if self._item is None:
+                self._condition.wait(timeout)
+            item, self._item = self._item, None
+            return item
+
+    def peek(self):
+        with self._condition:
+            return self._item
+
+
+@dataclass
+class FrameResult:
+    frame_id: int
+    captured_at: float
+    lines: List[OcrLine] = field(default_factory=list)
+    # (traducción, línea original): la caja de la línea indica dónde dibujar la traducción
+    translations: List[Tuple[str, OcrLine]] = field(default_factory=list)
+    completed_at: float = 0.0
+
+    @property
+    def latency(self):
+        return self.completed_at - self.captured_at
+
+
+# Estado de cada proceso del pool: un motor residente por proceso, o el error al crearlo
+_worker_engine = None
+_worker_error = None
+
+
+def init_ocr_worker(language, datapath, backend):
+    global _worker_engine, _worker_error
+    # El paralelismo lo dan los procesos: OpenMP dentro de Tesseract solo competiría por núcleos
+    os.environ.setdefault('OMP_THREAD_LIMIT', '1')
+    # Si el inicializador lanza, el pool relanza el proceso sin fin: el error se guarda y
+    # se devuelve en cada lote
+    try:
+        _worker_engine = create_engine(language, datapath, backend=backend)
+    except Exception as e:
+        _worker_error = str(worker_error(e))
+
+
+def recognize_batch(tiles):
+    if _worker_engine is None:
+        raise OcrEngineError(_worker_error)
+    try:
+        return [tuple(_worker_engine.recognize_lines(crop, psm=psm, whitelist=whitelist))
+                for crop, psm, whitelist in tiles]
+    except Exception as e:
+        raise worker_error(e) from None
+
+
+class FrameJob:
+    def __init__(self, frame_id, captured_at, regions):
+        self.frame_id = frame_id
+        self.captured_at = captured_at
+        self.regions = regions
+        self.lines = [None] * len(regions)
+        self.submitted_at = time.perf_counter()
+        # Un lote por proceso: (AsyncResult, [(índice de región, clave de caché, escala)])
+        self.pending = []
+
+    def ready(self):
+        return all(result.ready() for result, _ in self.pending)
+
+    def expired(self):
+        return time.perf_counter() - self.submitted_at > OCR_TIMEOUT
+
+    def wait(self, timeout):
+        for result, _ in self.pending:
+            if not result.ready():
+                result.wait(timeout)
+                return
+
+
+class OcrPipeline:
+    def __init__(self, source, frame_gray, analyze_frame, translate, language, datapath=None,
+                 backend=None, workers=2, max_in_flight=None, detector=None, cache=None, timer=None,
+                 stabilizer=None):
+        self.source = source
+        # frame_gray(frame) -> gray; analyze_frame(frame, gray) -> regiones con su cadena de preprocesado
+        self.frame_gray = frame_gray
+        self.analyze_frame = analyze_frame
+        self.translate = translate
+        self.detector = detector
+        self.cache = cache
+        self.timer = timer or FrameTimer()
+        # Con estabilizador solo se traduce y publica cuando cambia el texto por consenso
+        self.stabilizer = stabilizer
+        self.workers = workers
+        # Cada fotograma ya ocupa todos los procesos: uno en curso y otro en cola basta
+        self.max_in_flight = max_in_flight or 2
+        self.frames = LatestSlot()
+        self.ocr_input = LatestSlot()
+        self.results = LatestSlot()
+        self.latest_result = None
+        self.captured = 0
+        self.skipped = 0
+        self.processed = 0
+        self.stable = 0
+        # Fallo que detuvo el pipeline (lote de OCR sin respuesta)
+        self.error = None
+        # Fotogramas con algún lote de OCR fallido (en total y seguidos)
+        self.errors = 0
+        self._consecutive_errors = 0
+        self._stop = threading.Event()
+        self._last_published = -1
+        # Un motor roto falla aquí, con su mensaje, y no dentro de los procesos
+        backend = check_engine(language, datapath, backend=backend)
+        # spawn: mismo comportamiento en Windows y Linux, sin heredar ventanas ni buffers
+        self._pool = multiprocessing.get_context('spawn').Pool(
+            workers, initializer=init_ocr_worker, initargs=(language, datapath, backend)
+        )
+        self._threads = [
+            threading.Thread(target=self._capture_loop, name='captura', daemon=True),
+            threading.Thread(target=self._dispatch_loop, name='despachador', daemon=True)
+        ]
+
+    def start(self):
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout=2)
+        self._pool.terminate()
+        self._pool.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+    @property
+    def capture_finished(self):
+        return not self._threads[0].is_alive()
+
+    @property
+    def done(self):
+        # Cada fotograma capturado termina descartado, sin cambios o procesado
+        if self.error is not None:
+            return True
+        return self.capture_finished and \
+            self.captured == self.processed + self.skipped + self.ocr_input.dropped
+
+    def latest_frame(self):
+        return self.frames.peek()
+
+    def poll_result(self):
+        result = self.results.take(timeout=0)
+        if result is not None:
+            self.latest_result = result
+        return self.latest_result
+
+    def _capture_loop(self):
+        while not self._stop.is_set():
+            start = time.perf_counter()
+            frame = self.source.grab()
+            if frame is None:
+                if self.source.finished:
+                    break
+                time.sleep(0.01)
+                continue
+            # El buffer de captura se reutiliza: cada etapa recibe una copia propia
+            item = (self.captured, time.perf_counter(), frame.copy())
+            self.timer.record('capture', time.perf_counter() - start)
+            self.captured += 1
+            self.frames.put(item)
+            self.ocr_input.put(item)
+
+    def _dispatch_loop(self):
+        in_flight = []
+        while not self._stop.is_set():
+            while in_flight and (in_flight[0].ready() or in_flight[0].expired()):
+                self._finish(in_flight.pop(0))
+            if self.error is not None:
+                break
+
+            if len(in_flight) >= self.max_in_flight:
+                in_flight[0].wait(0.005)
+                continue
+
+            item = self.ocr_input.take(timeout=0.005)
+            if item is None:
+                continue
+            job = self._start(*item)
+            if job is None:
+                continue
+            if job.pending:
+                in_flight.append(job)
+            else:
+                self._finish(job)
+
+    def _fail(self, message):
+        self.error = message
+        print(message)
+        self._stop.set()
+
+    def _start(self, frame_id, captured_at, frame):
+        start = time.perf_counter()
+        gray = self.frame_gray(frame)
+        # Sin cambios se omite el OCR, salvo que el estabilizador espere lecturas para confirmar un cambio
+        if self.detector is not None and not self.detector.has_changed(gray) and \
+                not (self.stabilizer is not None and self.stabilizer.pending):
+            self.timer.record('preprocess', time.perf_counter() - start)
+            self.skipped += 1
+            return None
+        regions = self.analyze_frame(frame, gray)
+        prepared = [prepare_region(frame, region) for region in regions]
+        self.timer.record('preprocess', time.perf_counter() - start)
+
+        job = FrameJob(frame_id, captured_at, regions)
+        misses = []
+        for index, (region, (binary, scale)) in enumerate(zip(regions, prepared)):
+            key = None
+            if self.cache is not None:
+                key = region_key(binary, region.ocr_key)
+                cached = self.cache.get(key)
+                if cached is not None:
+                    job.lines[index] = cached
+                    continue
+            misses.append((index, binary, region, key, scale))
+
+        for batch in balance_batches(misses, self.workers, weight=lambda miss: miss[1].size):
+            tiles = [(np.ascontiguousarray(binary), region.psm, region.whitelist) for _, binary, region, _, _ in batch]
+            result = self._pool.apply_async(recognize_batch, (tiles,))
+            job.pending.append((result, [(index, key, scale) for index, _, _, key, scale in batch]))
+        return job
+
+    def _finish(self, job):
+        failure = None
+        for result, entries in job.pending:
+            try:
+                batch_lines = result.get(timeout=max(0.0, job.submitted_at + OCR_TIMEOUT - time.perf_counter()))
+            except multiprocessing.TimeoutError:
+                self._fail(f"El OCR del fotograma {job.frame_id} no terminó en {OCR_TIMEOUT:.0f} s")
+                return
+            except Exception as e:
+                # Sin resultado: no se guarda "sin texto" en la caché para esas regiones
+                failure = e
+                continue
+            for (index, key, scale), lines in zip(entries, batch_lines):
+                lines = restore_scale(lines, scale)
+                job.lines[index] = lines
+                if key is not None:
+                    self.cache.put(key, lines)
+
+        self.timer.record('ocr', time.perf_counter() - job.submitted_at)
+        self.processed += 1
+        if failure is not None:
+            # Un fotograma incompleto no se publica: contaría como ausencia de sus líneas
+            self.errors += 1
+            self._consecutive_errors += 1
+            print(f"Error de OCR en el fotograma {job.frame_id}: {failure}")
+            if self._consecutive_errors >= MAX_CONSECUTIVE_ERRORS:
+                self._fail(f"{self._consecutive_errors} fotogramas seguidos con errores de OCR: {failure}")
+            return
+        self._consecutive_errors = 0
+        # Un resultado más viejo que el ya publicado no se muestra
+        if job.frame_id <= self._last_published:
+            return
+        self._last_published = job.frame_id
+        lines = merge_results(zip(job.regions, job.lines))
+        with self.timer.stage('translate'):
+            if self.stabilizer is not None:
+                translations, changed = self.stabilizer.update(lines)
+            else:
+                translations, changed = [(self.translate(line.text), line) for line in lines], True
+        if not changed:
+            self.stable += 1
+            return
+        result = FrameResult(
+            frame_id=job.frame_id,
+            captured_at=job.captured_at,
+            lines=lines,
+            translations=translations,
+            completed_at=time.perf_counter()
+        )
+        self.timer.record('latency', result.latency)
+        self.results.put(result)
+
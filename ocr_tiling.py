@@ -0,0 +1,71 @@
+import numpy as np
+
+from text_regions import TextRegion, PSM_BLOCK, sort_reading_order
+
+# Reparto del OCR de un fotograma entre varios procesos. La llamada a Tesseract es de un
+# solo hilo, así que un fotograma grande se divide en "tiles" que se reconocen en paralelo:
+#
+#   regions   las regiones de texto detectadas, agrupadas en lotes de área similar
+#   bands     franjas horizontales del fotograma completo, cortadas por filas sin tinta
+#
+# Las líneas de cada tile se llevan a coordenadas del fotograma y se ordenan en orden de lectura.
+
+TILING_MODES = ('regions', 'bands')
+
+
+def blank_rows(binary):
+    # Una fila sin transiciones es fondo liso: cortar por ahí no parte ninguna línea de texto
+    transitions = np.count_nonzero(binary[:, 1:] != binary[:, :-1], axis=1)
+    return transitions == 0
+
+
+def split_bands(binary, count, min_height=16):
+    height, width = binary.shape[:2]
+    count = max(1, min(count, height // min_height))
+    blank = blank_rows(binary)
+    blank_indices = np.flatnonzero(blank)
+
+    cuts = [0]
+    for k in range(1, count):
+        ideal = k * height // count
+        # Se busca la fila en blanco más cercana al corte ideal, sin salirse de la franja
+        window = height // (2 * count)
+        nearby = blank_indices[np.abs(blank_indices - ideal) <= window]
+        cut = int(nearby[np.argmin(np.abs(nearby - ideal))]) if len(nearby) else ideal
+        if cut - cuts[-1] >= min_height:
+            cuts.append(cut)
+    cuts.append(height)
+
+    bands = []
+    for y0, y1 in zip(cuts, cuts[1:]):
+        # Las franjas completamente vacías no se envían a Tesseract
+        if blank[y0:y1].all():
+            continue
+        bands.append(TextRegion(0, y0, width, y1 - y0, PSM_BLOCK))
+    return bands
+
+
+def balance_batches(tiles, count, weight=lambda tile: tile.area):
+    # Reparto greedy (el tile más grande al lote más ligero): la latencia del fotograma
+    # la marca el lote más lento
+    batches = [[] for _ in range(max(1, count))]
+    loads = [0] * len(batches)
+    for tile in sorted(tiles, key=weight, reverse=True):
+        target = loads.index(min(loads))
+        batches[target].append(tile)
+        loads[target] += weight(tile)
+    return [batch for batch in batches if batch]
+
+
+def tile_frame(binary, regions, mode, workers):
+    if mode == 'bands':
+        return split_bands(binary, workers)
+    if mode == 'regions':
+        return regions
+    raise ValueError(f"Modo de teselado desconocido: {mode}")
+
+
+def merge_results(results):
+    # results: [(tile, [OcrLine relativas al tile])] -> [OcrLine del fotograma] en orden de lectura
+    lines = [line.offset(tile.x, tile.y) for tile, tile_lines in results for line in tile_lines]
+    return sort_reading_order(lines)
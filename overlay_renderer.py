@@ -0,0 +1,140 @@
+import os
+import glob
+from collections import OrderedDict
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+# Overlay de traducciones sobre la posición original del texto.
+#
+# Cada traducción se dibuja dentro de la caja de la línea de OCR de la que proviene, con una
+# fuente TrueType (Unicode completo, a diferencia de cv2.putText). Las etiquetas ya
+# renderizadas se guardan como "sprites" premultiplicados en una LRU indexada por
+# (texto, fuente, tamaño, color): volver a dibujar las mismas etiquetas en cada fotograma
+# es solo una mezcla alfa con slicing de NumPy.
+
+FONT_CANDIDATES = [
+    r'C:\Windows\Fonts\msyh.ttc',    # Microsoft YaHei: latín y CJK
+    r'C:\Windows\Fonts\simhei.ttf',
+    r'C:\Windows\Fonts\arial.ttf',
+    '/usr/share/fonts/**/NotoSansCJK*.tt[cf]',
+    '/usr/share/fonts/**/DejaVuSans.ttf',
+]
+# Los tamaños se redondean a este paso para que cajas de altura parecida compartan sprite
+SIZE_STEP = 2
+
+
+def find_font():
+    candidates = [os.environ.get('PVZ_OVERLAY_FONT')] + FONT_CANDIDATES
+    for candidate in candidates:
+        if not candidate:
+            continue
+        matches = sorted(glob.glob(candidate, recursive=True)) if '*' in candidate else [candidate]
+        for path in matches:
+            if os.path.exists(path):
+                return path
+    return None
+
+
+class LabelSprite:
+    __slots__ = ('color', 'inverse_alpha', 'width', 'height')
+
+    def __init__(self, color, inverse_alpha):
+        # color: BGR premultiplicado por alfa (uint16); inverse_alpha: 255 - alfa (uint16)
+        self.color = color
+        self.inverse_alpha = inverse_alpha
+        self.height, self.width = inverse_alpha.shape[:2]
+
+
+class OverlayRenderer:
+    def __init__(self, font_path=None, text_color=(255, 255, 255), background=(0, 0, 0),
+                 background_alpha=200, padding=2, max_sprites=512):
+        self.font_path = font_path or find_font()
+        self.text_color = text_color
+        self.background = background
+        self.background_alpha = background_alpha
+        self.padding = padding
+        self.max_sprites = max_sprites
+        self._fonts = {}
+        self._sprites = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        if self.font_path is None:
+            print("No se encontró una fuente TrueType; se usará la fuente por defecto de PIL")
+
+    def font(self, size):
+        font = self._fonts.get(size)
+        if font is None:
+            if self.font_path:
+                font = ImageFont.truetype(self.font_path, size)
+            else:
+                font = ImageFont.load_default(size)
+            self._fonts[size] = font
+        return font
+
+    def font_size(self, box_height):
+        size = max(8, int(box_height * 0.85))
+        return size - size % SIZE_STEP
+
+    def sprite(self, text, size, color=None):
+        color = color or self.text_color
+        key = (text, self.font_path, size, color)
+        sprite = self._sprites.get(key)
+        if sprite is not None:
+            self._sprites.move_to_end(key)
+            self.hits += 1
+            return sprite
+        self.misses += 1
+        sprite = self._render(text, size, color)
+        self._sprites[key] = sprite
+        while len(self._sprites) > self.max_sprites:
+            self._sprites.popitem(last=False)
+        return sprite
+
+    def _render(self, text, size, color):
+        font = self.font(size)
+        left, top, right, bottom = font.getbbox(text)
+        pad = self.padding
+        width, height = right - left + 2 * pad, bottom - top + 2 * pad
+        mask = Image.new('L', (max(1, width), max(1, height)), 0)
+        ImageDraw.Draw(mask).text((pad - left, pad - top), text, font=font, fill=255)
+
+        # Texto sobre un fondo semitransparente que tapa el original: composición "over"
+        text_alpha = np.asarray(mask, dtype=np.float32) / 255.0
+        background_alpha = self.background_alpha / 255.0
+        alpha = text_alpha + background_alpha * (1.0 - text_alpha)
+        text_bgr = np.array(color[::-1], dtype=np.float32)
+        background_bgr = np.array(self.background[::-1], dtype=np.float32)
+        premultiplied = (text_bgr * text_alpha[..., None]
+                         + background_bgr * (background_alpha * (1.0 - text_alpha))[..., None])
+        return LabelSprite(np.rint(premultiplied).astype(np.uint16),
+                           np.rint(255.0 * (1.0 - alpha)).astype(np.uint16)[..., None])
+
+    def blit(self, image, sprite, x, y):
+        # Recorte contra los bordes de la imagen; solo se tocan los canales BGR
+        height, width = image.shape[:2]
+        x0, y0 = max(0, x), max(0, y)
+        x1, y1 = min(width, x + sprite.width), min(height, y + sprite.height)
+        if x0 >= x1 or y0 >= y1:
+            return
+        sx, sy = x0 - x, y0 - y
+        roi = image[y0:y1, x0:x1, :3]
+        color = sprite.color[sy:sy + y1 - y0, sx:sx + x1 - x0]
+        inverse_alpha = sprite.inverse_alpha[sy:sy + y1 - y0, sx:sx + x1 - x0]
+        blended = color + (roi * inverse_alpha + 127) // 255
+        roi[...] = np.minimum(blended, 255)
+
+    def draw(self, image, labels):
+        # labels: [(texto traducido, caja con x, y, w, h)]
+        for text, box in labels:
+            text = text.strip()
+            if not text:
+                continue
+            sprite = self.sprite(text, self.font_size(box.h))
+            # Centrado vertical sobre la línea original
+            self.blit(image, sprite, box.x - self.padding, box.y + (box.h - sprite.height) // 2)
+        return image
+
+    @property
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
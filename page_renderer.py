@@ -0,0 +1,108 @@
+import os
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+from colors import background_colors, text_colors
+from corpus_store import CorpusStore
+from augmentation import AugmentConfig, page_rng, sample_params, compose_batch, finish_page
+
+# Renderizado de páginas de entrenamiento (imagen + .box) en procesos independientes.
+# Cada proceso abre el corpus compilado con mmap (corpus_store.py): no recibe ni copia el
+# texto, solo tareas (fuente, tamaño, rango de páginas) y lee cada página con un slice.
+# Las páginas de una tarea comparten tamaño: se componen y aumentan (augmentation.py) en
+# lotes de AUGMENT_BATCH páginas.
+
+LINES_PER_IMAGE = 25
+IMAGE_WIDTH = 1600
+AUGMENT_BATCH = 4
+# Las páginas con ruido comprimen mal: el nivel por defecto de PNG (6) dominaba el tiempo de render
+PNG_COMPRESS_LEVEL = 1
+
+
+def page_colors(page_index):
+    color_index = page_index % len(background_colors)
+    return background_colors[color_index], text_colors[(color_index + 1) % len(text_colors)]
+
+
+def draw_text_mask(font, font_size, text_block):
+    # Cobertura del texto (0-255) y cajas aproximadas de cada carácter: izq, arriba, der, abajo
+    line_height = font_size + 4
+    mask = Image.new('L', (IMAGE_WIDTH, LINES_PER_IMAGE * line_height), 0)
+    draw = ImageDraw.Draw(mask)
+    chars, boxes = [], []
+    for j, line in enumerate(text_block):
+        draw.text((10, j * line_height), line, font=font, fill=255)
+        for k, char in enumerate(line):
+            if char.strip():
+                left = 10 + k * (font_size // 2)
+                top = j * line_height
+                chars.append(char)
+                boxes.append((left, top, left + font_size, top + line_height))
+    return np.asarray(mask), chars, np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+
+
+def write_box_file(box_path, chars, boxes):
+    with open(box_path, 'w', encoding='utf-8') as box_file:
+        for char, (left, top, right, bottom) in zip(chars, boxes.astype(int)):
+            box_file.write(f"{char} {left} {top} {right} {bottom} 0\n")
+
+
+def render_pages(font, font_size, font_key, pages, config):
+    # pages: [(índice, líneas, ruta .png, ruta .box)] del mismo tamaño; se componen en lote
+    masks, backgrounds, colors, params, rngs, boxes = [], [], [], [], [], []
+    for page_index, text_block, _, _ in pages:
+        mask, chars, char_boxes = draw_text_mask(font, font_size, text_block)
+        bg_color, text_color = page_colors(page_index)
+        rng = page_rng(config.seed, font_key, font_size, page_index)
+        masks.append(mask)
+        backgrounds.append(bg_color)
+        colors.append(text_color)
+        params.append(sample_params(config, rng, text_color))
+        rngs.append(rng)
+        boxes.append((chars, char_boxes))
+
+    composed = compose_batch(np.stack(masks), backgrounds, colors, params, rngs)
+    for i, (_, _, image_path, box_path) in enumerate(pages):
+        image, page_boxes = finish_page(composed[i], boxes[i][1], params[i], backgrounds[i])
+        image.save(image_path, format='PNG', compress_level=PNG_COMPRESS_LEVEL)
+        write_box_file(box_path, boxes[i][0], page_boxes)
+
+
+def render_page(font, font_size, text_block, page_index, image_path, box_path, config=None, font_key=''):
+    render_pages(font, font_size, font_key, [(page_index, text_block, image_path, box_path)],
+                 config or AugmentConfig.off())
+
+
+# Estado de cada proceso de renderizado: el corpus mapeado en memoria y el aumentado
+_corpus = None
+_augment = None
+
+
+def init_render_worker(corpus_path, augment_config=None):
+    global _corpus, _augment
+    _corpus = CorpusStore(corpus_path)
+    _augment = augment_config or AugmentConfig.off()
+
+
+def render_block(task):
+    # task: (fuente, tamaño, directorio, primera página, página final); devuelve páginas escritas
+    font_path, font_size, subdir, first_page, last_page = task
+    font = ImageFont.truetype(font_path, font_size)
+    font_key = os.path.basename(font_path)
+    for batch_start in range(first_page, last_page, AUGMENT_BATCH):
+        pages = []
+        for page_index in range(batch_start, min(batch_start + AUGMENT_BATCH, last_page)):
+            start_line = page_index * LINES_PER_IMAGE
+            file_name = f"p{page_index:04d}"
+            pages.append((page_index, _corpus.lines(start_line, start_line + LINES_PER_IMAGE),
+                          os.path.join(subdir, f"{file_name}.png"), os.path.join(subdir, f"{file_name}.box")))
+        render_pages(font, font_size, font_key, pages, _augment)
+    return last_page - first_page
+
+
+def render_preview(font_path, font_size, corpus_path, first_page, count, output_dir, config):
+    # Mismo camino que generate_training_data, en el proceso actual; devuelve las imágenes escritas
+    init_render_worker(corpus_path, config)
+    last_page = min(first_page + count, _corpus.block_count(LINES_PER_IMAGE))
+    render_block((font_path, font_size, output_dir, first_page, last_page))
+    return [os.path.join(output_dir, f"p{page_index:04d}.png") for page_index in range(first_page, last_page)]
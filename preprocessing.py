@@ -0,0 +1,276 @@
+import os
+import sys
+import json
+import time
+import argparse
+import itertools
+import numpy as np
+import cv2
+
+from translation_memory import bounded_levenshtein, join_cjk
+
+# Cadena de preprocesado configurable para las regiones que van al OCR.
+#
+# Una cadena es una lista de pasos separados por '|', cada uno con argumentos tras ':':
+#
+#   gray | max | min | b | g | r | sat | value     canal de entrada (BGR/BGRA -> 1 canal)
+#   upscale:2                                       ampliación (las cajas se reescalan después)
+#   denoise:median3 | denoise:gauss3 | denoise:open2
+#   threshold:150 | threshold:otsu | threshold:adaptive,31,5
+#   invert | invert:auto                            auto: deja texto oscuro sobre fondo claro
+#
+#   p. ej. "max|upscale:2|denoise:median3|threshold:otsu|invert:auto"
+#
+# Todos los pasos son operaciones de OpenCV/NumPy sobre el recorte completo. Las cadenas
+# se interpretan una sola vez y se guardan por texto.
+#
+#   python preprocessing.py autotune capturas/ etiquetas.json --target 0.95
+#
+# autotune prueba cadenas candidatas sobre fotogramas grabados con su texto esperado
+# (JSON {"fotograma.png": "línea 1\nlínea 2"}) y elige la más barata que alcanza la
+# precisión objetivo.
+
+DEFAULT_CHAIN = 'gray|threshold:150'
+CHANNELS = ('gray', 'max', 'min', 'b', 'g', 'r', 'sat', 'value')
+
+
+def _channel(name):
+    def step(image):
+        if image.ndim == 2:
+            return image
+        if name == 'gray':
+            return cv2.cvtColor(image, cv2.COLOR_BGRA2GRAY if image.shape[2] == 4 else cv2.COLOR_BGR2GRAY)
+        if name in ('b', 'g', 'r'):
+            return np.ascontiguousarray(image[..., 'bgr'.index(name)])
+        if name in ('max', 'value'):
+            # value de HSV es el máximo de los tres canales
+            return cv2.max(cv2.max(image[..., 0], image[..., 1]), image[..., 2])
+        if name == 'min':
+            return cv2.min(cv2.min(image[..., 0], image[..., 1]), image[..., 2])
+        bgr = image[..., :3] if image.shape[2] == 4 else image
+        return cv2.cvtColor(np.ascontiguousarray(bgr), cv2.COLOR_BGR2HSV)[..., 1].copy()
+    return step
+
+
+def _upscale(factor):
+    def step(image):
+        return cv2.resize(image, None, fx=factor, fy=factor, interpolation=cv2.INTER_CUBIC)
+    return step
+
+
+def _denoise(method):
+    kind, size = method.rstrip('0123456789'), int(method[len(method.rstrip('0123456789')):] or 3)
+    if kind == 'median':
+        return lambda image: cv2.medianBlur(image, size | 1)
+    if kind == 'gauss':
+        return lambda image: cv2.GaussianBlur(image, (size | 1, size | 1), 0)
+    if kind == 'open':
+        kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (size, size))
+        return lambda image: cv2.morphologyEx(image, cv2.MORPH_OPEN, kernel)
+    raise ValueError(f"Filtro de ruido desconocido: {method}")
+
+
+def _threshold(args):
+    if not args or args[0] == 'otsu':
+        return lambda image: cv2.threshold(image, 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU)[1]
+    if args[0] == 'adaptive':
+        block = int(args[1]) if len(args) > 1 else 31
+        offset = float(args[2]) if len(args) > 2 else 5
+
+        def step(image):
+            # El bloque no puede superar el recorte (y debe ser impar)
+            size = min(block, (min(image.shape[:2]) // 2) * 2 + 1)
+            if size < 3:
+                return cv2.threshold(image, 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU)[1]
+            return cv2.adaptiveThreshold(image, 255, cv2.ADAPTIVE_THRESH_MEAN_C, cv2.THRESH_BINARY,
+                                         size, offset)
+        return step
+    value = int(args[0])
+    return lambda image: cv2.threshold(image, value, 255, cv2.THRESH_BINARY)[1]
+
+
+def _invert(mode):
+    if mode == 'auto':
+        # Tesseract rinde mejor con texto oscuro sobre fondo claro: el fondo es la mayoría
+        return lambda image: cv2.bitwise_not(image) if cv2.mean(image)[0] < 127 else image
+    return cv2.bitwise_not
+
+
+class PreprocessChain:
+    def __init__(self, spec):
+        self.spec = spec
+        self.scale = 1.0
+        self.steps = []
+        for part in filter(None, (p.strip() for p in spec.split('|'))):
+            name, _, argument = part.partition(':')
+            args = [a for a in argument.split(',') if a]
+            if name in CHANNELS:
+                self.steps.append(_channel(name))
+            elif name == 'upscale':
+                factor = float(args[0]) if args else 2.0
+                self.scale *= factor
+                self.steps.append(_upscale(factor))
+            elif name == 'denoise':
+                self.steps.append(_denoise(args[0] if args else 'median3'))
+            elif name == 'threshold':
+                self.steps.append(_threshold(args))
+            elif name == 'invert':
+                self.steps.append(_invert(args[0] if args else 'always'))
+            else:
+                raise ValueError(f"Paso de preprocesado desconocido: {part}")
+        # Si la cadena no elige canal, se convierte a gris antes que nada
+        if not spec.split('|')[0].partition(':')[0].strip() in CHANNELS:
+            self.steps.insert(0, _channel('gray'))
+
+    def apply(self, image):
+        for step in self.steps:
+            image = step(image)
+        return image
+
+    def __repr__(self):
+        return f"PreprocessChain({self.spec!r})"
+
+
+_chains = {}
+
+
+def get_chain(spec):
+    chain = _chains.get(spec)
+    if chain is None:
+        chain = _chains[spec] = PreprocessChain(spec)
+    return chain
+
+
+def prepare_region(image, region, default_spec=DEFAULT_CHAIN):
+    # Recorte de la región en el fotograma original -> imagen para Tesseract y su escala
+    chain = get_chain(region.chain or default_spec)
+    return chain.apply(region.crop(image)), chain.scale
+
+
+def restore_scale(lines, scale):
+    # Las cajas del OCR están en píxeles de la imagen ampliada: se devuelven a los del recorte
+    return tuple(lines) if scale == 1 else tuple(line.scaled(1 / scale) for line in lines)
+
+
+def threshold_chain(threshold=150, invert=False):
+    # Equivalente de la configuración clásica "threshold"/"invert" de los perfiles
+    return f"gray|threshold:{threshold}" + ('|invert' if invert else '')
+
+
+# --- autotune ---------------------------------------------------------------------------
+
+def candidate_chains(channels=('gray', 'max', 'value'), upscales=(1, 2), denoise=(None, 'median3'),
+                     thresholds=('150', 'otsu', 'adaptive,31,5')):
+    for channel, factor, noise, threshold in itertools.product(channels, upscales, denoise, thresholds):
+        steps = [channel]
+        if factor != 1:
+            steps.append(f"upscale:{factor}")
+        if noise:
+            steps.append(f"denoise:{noise}")
+        steps += [f"threshold:{threshold}", 'invert:auto']
+        yield '|'.join(steps)
+
+
+def text_accuracy(expected, recognized):
+    # 1 - CER sin espacios ni saltos (Tesseract inserta espacios entre ideogramas)
+    expected = ''.join(join_cjk(expected).split())
+    recognized = ''.join(join_cjk(recognized).split())
+    if not expected:
+        return 1.0 if not recognized else 0.0
+    limit = max(len(expected), len(recognized))
+    return max(0.0, 1.0 - bounded_levenshtein(expected, recognized, limit) / len(expected))
+
+
+def evaluate_chain(spec, frames, engine, repeats=3):
+    # frames: [(imagen BGR, regiones, texto esperado)]; devuelve (precisión media, ms por fotograma).
+    # Cada fotograma se mide `repeats` veces y se queda el mínimo: las diferencias entre
+    # cadenas son de pocos ms y el ruido del sistema las taparía
+    chain = get_chain(spec)
+    accuracies, elapsed = [], 0.0
+    for image, regions, expected in frames:
+        best = None
+        for _ in range(max(1, repeats)):
+            start = time.perf_counter()
+            texts = []
+            for region in regions:
+                binary = chain.apply(region.crop(image))
+                texts.append(engine.recognize(binary, psm=region.psm))
+            duration = time.perf_counter() - start
+            best = duration if best is None else min(best, duration)
+        elapsed += best
+        accuracies.append(text_accuracy(expected, '\n'.join(texts)))
+    return float(np.mean(accuracies)), elapsed * 1000 / len(frames)
+
+
+def autotune(frames_dir, labels_path, engine, target=0.95, chains=None, repeats=3, log=print):
+    from text_regions import detect_text_regions
+    with open(labels_path, 'r', encoding='utf-8') as f:
+        labels = json.load(f)
+
+    frames = []
+    for name, expected in sorted(labels.items()):
+        image = cv2.imread(os.path.join(frames_dir, name), cv2.IMREAD_COLOR)
+        if image is None:
+            log(f"No se pudo leer {name}")
+            continue
+        regions = detect_text_regions(cv2.cvtColor(image, cv2.COLOR_BGR2GRAY))
+        frames.append((image, regions, expected))
+    if not frames:
+        raise ValueError("No hay fotogramas etiquetados")
+
+    results = []
+    for spec in chains or candidate_chains():
+        accuracy, latency = evaluate_chain(spec, frames, engine, repeats)
+        results.append({'chain': spec, 'accuracy': round(accuracy, 4), 'ms_per_frame': round(latency, 2)})
+        log(f"{accuracy:7.2%} {latency:9.1f} ms  {spec}")
+
+    passing = [r for r in results if r['accuracy'] >= target]
+    # La más barata que cumple el objetivo; si ninguna lo cumple, la más precisa
+    best = min(passing, key=lambda r: r['ms_per_frame']) if passing else \
+        max(results, key=lambda r: (r['accuracy'], -r['ms_per_frame']))
+    return best, results, bool(passing)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cadenas de preprocesado para el OCR del interceptor")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    tune = subparsers.add_parser('autotune', help="Elegir la cadena más barata que alcanza la precisión objetivo")
+    tune.add_argument('frames', help="Directorio de fotogramas grabados")
+    tune.add_argument('labels', help="JSON {fotograma: texto esperado}")
+    tune.add_argument('--target', type=float, default=0.95, help="Precisión de caracteres objetivo (1 - CER)")
+    tune.add_argument('--language', default='pvz')
+    tune.add_argument('--tessdata', default=os.environ.get('PVZ_TESSDATA'))
+    tune.add_argument('--chains', nargs='+', help="Cadenas a probar (por defecto, una rejilla de candidatas)")
+    tune.add_argument('--repeats', type=int, default=3, help="Mediciones por fotograma (se toma la más rápida)")
+    tune.add_argument('--output', help="Guardar todos los resultados en JSON")
+    apply = subparsers.add_parser('apply', help="Aplicar una cadena a una imagen y guardar el resultado")
+    apply.add_argument('chain')
+    apply.add_argument('image')
+    apply.add_argument('output')
+    args = parser.parse_args()
+
+    if args.command == 'apply':
+        image = cv2.imread(args.image, cv2.IMREAD_COLOR)
+        start = time.perf_counter()
+        result = get_chain(args.chain).apply(image)
+        print(f"{args.chain}: {(time.perf_counter() - start) * 1000:.2f} ms")
+        cv2.imwrite(args.output, result)
+        return 0
+
+    from ocr_engine import create_engine
+    with create_engine(args.language, args.tessdata) as engine:
+        best, results, reached = autotune(args.frames, args.labels, engine, args.target, args.chains,
+                                          args.repeats)
+    if reached:
+        print(f"Cadena elegida: {best['chain']} ({best['accuracy']:.2%}, {best['ms_per_frame']:.1f} ms/fotograma)")
+    else:
+        print(f"Ninguna cadena alcanza {args.target:.0%}; la más precisa es {best['chain']} ({best['accuracy']:.2%})")
+    print(f"Para usarla: PVZ_PREPROCESS=\"{best['chain']}\" o \"preprocess\" en screen_profiles.json")
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'target': args.target, 'best': best, 'results': results}, f, indent=2, ensure_ascii=False)
+    return 0 if reached else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,212 @@
+import os
+import csv
+import json
+import time
+import threading
+import psutil
+
+# Se muestrean el entrenador y todos sus descendientes: herramientas de Tesseract
+# (tesseract, mftraining, lstmtraining...) y procesos python del pool de renderizado, la
+# evaluación o los trabajadores locales de la cola. Solo se excluyen los intérpretes de
+# comandos, que no hacen trabajo propio
+SHELL_NAMES = {'sh', 'bash', 'dash', 'zsh', 'cmd', 'powershell', 'pwsh', 'conhost'}
+
+# Umbral de E/S (bytes/s) a partir del cual consideramos una etapa limitada por disco
+DISK_BOUND_BYTES_PER_SEC = 50 * 1024 * 1024
+
+_active_sampler = None
+
+
+def tool_name(name):
+    name = (name or '').lower()
+    return name[:-4] if name.endswith('.exe') else name
+
+
+class ResourceSampler(threading.Thread):
+    def __init__(self, samples_path, summary_path, interval=1.0, pid=None):
+        super().__init__(name='resource_sampler', daemon=True)
+        self.samples_path = samples_path
+        self.summary_path = summary_path
+        self.interval = interval
+        self.root = psutil.Process(pid or os.getpid())
+        self.stage = 'start'
+        self.batch = None
+        self._processes = {}
+        self._io_last = {}
+        self._summaries = {}
+        self._stop_event = threading.Event()
+        self._lock = threading.Lock()
+        self._start_time = time.time()
+
+    def set_stage(self, stage):
+        with self._lock:
+            self.stage = stage
+            self.batch = None
+
+    def set_batch(self, batch):
+        with self._lock:
+            self.batch = batch
+
+    def stage_summary(self, stage):
+        with self._lock:
+            summary = self._summaries.get(stage)
+            # Una etapa sin muestras completas no tiene picos ni clasificación que dar
+            return self._finish_summary(summary) if summary and summary['samples'] else None
+
+    def run(self):
+        os.makedirs(os.path.dirname(self.samples_path) or '.', exist_ok=True)
+        with open(self.samples_path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(['t', 'stage', 'batch', 'pid', 'name', 'cpu', 'rss',
+                             'read_bytes', 'write_bytes', 'open_files'])
+            while not self._stop_event.wait(self.interval):
+                self._sample(writer)
+                f.flush()
+        self._write_summary()
+
+    def stop(self):
+        self._stop_event.set()
+        if self.is_alive():
+            self.join()
+
+    def _tracked_processes(self):
+        processes = [self.root]
+        try:
+            children = self.root.children(recursive=True)
+        except psutil.Error:
+            children = []
+        for child in children:
+            try:
+                if tool_name(child.name()) not in SHELL_NAMES:
+                    processes.append(child)
+            except psutil.Error:
+                continue
+        return processes
+
+    def _sample(self, writer):
+        with self._lock:
+            stage, batch = self.stage, self.batch
+        t = round(time.time() - self._start_time, 1)
+        seen = set()
+        cpu_total = rss_total = open_total = 0
+        read_total = write_total = 0
+
+        for process in self._tracked_processes():
+            # Reutilizamos el objeto Process para que cpu_percent mida el intervalo
+            cached = self._processes.setdefault(process.pid, process)
+            try:
+                with cached.oneshot():
+                    cpu = cached.cpu_percent(None)
+                    rss = cached.memory_info().rss
+                    try:
+                        io = cached.io_counters()
+                        read_bytes, write_bytes = io.read_bytes, io.write_bytes
+                    except (AttributeError, psutil.AccessDenied):
+                        read_bytes = write_bytes = 0
+                    try:
+                        open_files = len(cached.open_files())
+                    except psutil.AccessDenied:
+                        open_files = 0
+                    name = tool_name(cached.name())
+            except psutil.Error:
+                continue
+
+            seen.add(cached.pid)
+            writer.writerow([t, stage, '' if batch is None else batch, cached.pid, name,
+                             cpu, rss, read_bytes, write_bytes, open_files])
+            cpu_total += cpu
+            rss_total += rss
+            open_total += open_files
+            read_delta, write_delta = self._io_delta(cached.pid, read_bytes, write_bytes)
+            read_total += read_delta
+            write_total += write_delta
+
+        for pid in set(self._processes) - seen:
+            del self._processes[pid]
+            self._io_last.pop(pid, None)
+
+        # La muestra se suma de una vez: stage_summary nunca ve una etapa a medio muestrear
+        with self._lock:
+            summary = self._summaries.setdefault(stage, {
+                'first_t': t, 'last_t': t, 'samples': 0, 'cpu_sum': 0.0, 'cpu_max': 0.0,
+                'rss_peak': 0, 'open_files_max': 0, 'read_bytes': 0, 'write_bytes': 0
+            })
+            summary['last_t'] = t
+            summary['samples'] += 1
+            summary['cpu_sum'] += cpu_total
+            summary['cpu_max'] = max(summary['cpu_max'], cpu_total)
+            summary['rss_peak'] = max(summary['rss_peak'], rss_total)
+            summary['open_files_max'] = max(summary['open_files_max'], open_total)
+            summary['read_bytes'] += read_total
+            summary['write_bytes'] += write_total
+
+    def _io_delta(self, pid, read_bytes, write_bytes):
+        # Los contadores de E/S son acumulativos por proceso: el delta se asigna a la etapa actual
+        last_read, last_write = self._io_last.get(pid, (read_bytes, write_bytes))
+        self._io_last[pid] = (read_bytes, write_bytes)
+        return read_bytes - last_read, write_bytes - last_write
+
+    def _finish_summary(self, summary):
+        duration = max(summary['last_t'] - summary['first_t'], self.interval)
+        cpu_mean = summary['cpu_sum'] / summary['samples'] if summary['samples'] else 0.0
+        io_rate = (summary['read_bytes'] + summary['write_bytes']) / duration
+
+        utilization = {
+            'cpu': cpu_mean / (100.0 * (psutil.cpu_count() or 1)),
+            'memory': summary['rss_peak'] / psutil.virtual_memory().total,
+            'disk': io_rate / DISK_BOUND_BYTES_PER_SEC
+        }
+        return {
+            'duration': round(duration, 1),
+            'samples': summary['samples'],
+            'cpu_mean': round(cpu_mean, 1),
+            'cpu_max': round(summary['cpu_max'], 1),
+            'rss_peak': summary['rss_peak'],
+            'read_bytes': summary['read_bytes'],
+            'write_bytes': summary['write_bytes'],
+            'io_bytes_per_sec': round(io_rate),
+            'open_files_max': summary['open_files_max'],
+            'bound': max(utilization, key=utilization.get)
+        }
+
+    def _write_summary(self):
+        with self._lock:
+            summaries = {stage: self._finish_summary(summary)
+                         for stage, summary in self._summaries.items()}
+        with open(self.summary_path, 'w', encoding='utf-8') as f:
+            json.dump(summaries, f, indent=2)
+
+
+def start_sampler(logs_folder='logs', interval=1.0):
+    global _active_sampler
+    if _active_sampler is None:
+        _active_sampler = ResourceSampler(
+            os.path.join(logs_folder, 'resource_samples.csv'),
+            os.path.join(logs_folder, 'resource_summary.json'),
+            interval=interval
+        )
+        _active_sampler.start()
+    return _active_sampler
+
+
+def stop_sampler():
+    global _active_sampler
+    if _active_sampler is not None:
+        _active_sampler.stop()
+        _active_sampler = None
+
+
+def tag_stage(stage):
+    if _active_sampler is not None:
+        _active_sampler.set_stage(stage)
+
+
+def tag_batch(batch):
+    if _active_sampler is not None:
+        _active_sampler.set_batch(batch)
+
+
+def get_stage_summary(stage):
+    if _active_sampler is not None:
+        return _active_sampler.stage_summary(stage)
+    return None
@@ -0,0 +1,228 @@
+import sys
+import json
+import sqlite3
+import argparse
+from datetime import datetime
+
+# Historial de ejecuciones del entrenamiento en SQLite, para comparar tiempos por etapa
+# entre ejecuciones. CLI:
+#   python run_history.py list
+#   python run_history.py show 12
+#   python run_history.py diff 11 12 --threshold 0.2   (sin ids: las dos últimas)
+#   python run_history.py evals                        (evaluaciones del modelo, evaluate_model.py)
+
+HISTORY_DB = 'run_history.db'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    started_at TEXT NOT NULL,
+    finished_at TEXT,
+    status TEXT NOT NULL,
+    config TEXT,
+    corpus_size INTEGER
+);
+CREATE TABLE IF NOT EXISTS stages (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    run_id INTEGER NOT NULL REFERENCES runs(id),
+    stage TEXT NOT NULL,
+    started_at TEXT NOT NULL,
+    wall_time REAL NOT NULL,
+    items INTEGER NOT NULL,
+    failures INTEGER NOT NULL,
+    ok INTEGER NOT NULL,
+    cpu_mean REAL,
+    cpu_max REAL,
+    rss_peak INTEGER,
+    read_bytes INTEGER,
+    write_bytes INTEGER,
+    bound TEXT
+);
+CREATE INDEX IF NOT EXISTS stages_run ON stages(run_id);
+CREATE TABLE IF NOT EXISTS evaluations (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    run_id INTEGER REFERENCES runs(id),
+    created_at TEXT NOT NULL,
+    model TEXT NOT NULL,
+    model_hash TEXT,
+    pages INTEGER NOT NULL,
+    chars INTEGER NOT NULL,
+    cer REAL,
+    ms_per_page REAL NOT NULL,
+    ms_p95 REAL,
+    pages_per_sec REAL,
+    workers INTEGER,
+    details TEXT
+);
+"""
+
+
+class RunHistory:
+    def __init__(self, db_path=HISTORY_DB):
+        self.db_path = db_path
+        self.conn = sqlite3.connect(db_path)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def start_run(self, config, corpus_size=None):
+        with self.conn:
+            cursor = self.conn.execute(
+                "INSERT INTO runs (started_at, status, config, corpus_size) VALUES (?, 'running', ?, ?)",
+                (datetime.now().isoformat(timespec='seconds'), json.dumps(config, default=str), corpus_size)
+            )
+        return cursor.lastrowid
+
+    def finish_run(self, run_id, status):
+        with self.conn:
+            self.conn.execute("UPDATE runs SET finished_at = ?, status = ? WHERE id = ?",
+                              (datetime.now().isoformat(timespec='seconds'), status, run_id))
+
+    def record_stage(self, run_id, stage, started_at, wall_time, items, failures, ok, resources=None):
+        resources = resources or {}
+        with self.conn:
+            self.conn.execute(
+                "INSERT INTO stages (run_id, stage, started_at, wall_time, items, failures, ok, "
+                "cpu_mean, cpu_max, rss_peak, read_bytes, write_bytes, bound) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (run_id, stage, started_at.isoformat(timespec='seconds'), wall_time, items, failures,
+                 int(bool(ok)), resources.get('cpu_mean'), resources.get('cpu_max'),
+                 resources.get('rss_peak'), resources.get('read_bytes'), resources.get('write_bytes'),
+                 resources.get('bound'))
+            )
+
+    def record_evaluation(self, run_id, model, model_hash, report):
+        # CER por fuente/tamaño y confusiones se guardan como JSON en details
+        details = {key: report[key] for key in ('cer_by_group', 'confusions', 'ms_p50') if key in report}
+        with self.conn:
+            cursor = self.conn.execute(
+                "INSERT INTO evaluations (run_id, created_at, model, model_hash, pages, chars, cer, "
+                "ms_per_page, ms_p95, pages_per_sec, workers, details) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (run_id, datetime.now().isoformat(timespec='seconds'), model, model_hash, report['pages'],
+                 report['chars'], report['cer'], report['ms_per_page'], report.get('ms_p95'),
+                 report.get('pages_per_sec'), report.get('workers'), json.dumps(details, ensure_ascii=False))
+            )
+        return cursor.lastrowid
+
+    def list_evaluations(self, limit=20):
+        return self.conn.execute("SELECT * FROM evaluations ORDER BY id DESC LIMIT ?", (limit,)).fetchall()
+
+    def list_runs(self, limit=20):
+        return self.conn.execute("SELECT * FROM runs ORDER BY id DESC LIMIT ?", (limit,)).fetchall()
+
+    def last_run_ids(self, count=2):
+        rows = self.conn.execute("SELECT id FROM runs ORDER BY id DESC LIMIT ?", (count,)).fetchall()
+        return [row['id'] for row in reversed(rows)]
+
+    def stage_rows(self, run_id):
+        # Una ejecución reanudada puede repetir etapas: nos quedamos con la última de cada una
+        rows = self.conn.execute("SELECT * FROM stages WHERE run_id = ? ORDER BY id", (run_id,)).fetchall()
+        return {row['stage']: row for row in rows}
+
+    def diff_runs(self, base_id, new_id, threshold=0.2):
+        base_stages = self.stage_rows(base_id)
+        new_stages = self.stage_rows(new_id)
+        diff = []
+        for stage in list(base_stages) + [s for s in new_stages if s not in base_stages]:
+            base, new = base_stages.get(stage), new_stages.get(stage)
+            base_tp, new_tp = throughput(base), throughput(new)
+            change = (new_tp / base_tp - 1) if base_tp and new_tp is not None else None
+            diff.append({
+                'stage': stage,
+                'base_time': base['wall_time'] if base else None,
+                'new_time': new['wall_time'] if new else None,
+                'base_throughput': base_tp,
+                'new_throughput': new_tp,
+                'change': change,
+                'regression': change is not None and change < -threshold
+            })
+        return diff
+
+
+def throughput(row):
+    if row is None or row['wall_time'] <= 0:
+        return None
+    return row['items'] / row['wall_time']
+
+
+def format_value(value, fmt):
+    return '-' if value is None else format(value, fmt)
+
+
+def print_runs(history, limit):
+    print(f"{'Id':>4}  {'Inicio':<20}{'Fin':<20}{'Estado':<12}{'Corpus':>8}")
+    for run in history.list_runs(limit):
+        print(f"{run['id']:>4}  {run['started_at']:<20}{run['finished_at'] or '-':<20}"
+              f"{run['status']:<12}{format_value(run['corpus_size'], 'd'):>8}")
+
+
+def print_run(history, run_id):
+    print(f"{'Etapa':<28}{'Tiempo (s)':>12}{'Elementos':>11}{'Fallos':>8}{'Elem/s':>10}"
+          f"{'CPU %':>8}{'RSS (MB)':>10}  Límite")
+    for stage, row in history.stage_rows(run_id).items():
+        rss = row['rss_peak'] / (1024 * 1024) if row['rss_peak'] is not None else None
+        print(f"{stage:<28}{row['wall_time']:>12.1f}{row['items']:>11}{row['failures']:>8}"
+              f"{format_value(throughput(row), '.2f'):>10}{format_value(row['cpu_mean'], '.1f'):>8}"
+              f"{format_value(rss, '.1f'):>10}  {row['bound'] or '-'}")
+
+
+def print_evaluations(history, limit):
+    print(f"{'Id':>4}{'Ejec.':>7}  {'Fecha':<20}{'Modelo':<10}{'Páginas':>9}{'CER':>9}{'ms/pág':>9}{'pág/s':>8}")
+    for row in history.list_evaluations(limit):
+        cer = format_value(row['cer'] * 100 if row['cer'] is not None else None, '.2f')
+        print(f"{row['id']:>4}{format_value(row['run_id'], 'd'):>7}  {row['created_at']:<20}"
+              f"{(row['model_hash'] or '-')[:8]:<10}{row['pages']:>9}{cer + '%' if cer != '-' else cer:>9}"
+              f"{row['ms_per_page']:>9.1f}{format_value(row['pages_per_sec'], '.2f'):>8}")
+
+
+def print_diff(diff, base_id, new_id, threshold):
+    print(f"Comparando ejecución {base_id} -> {new_id} (umbral {threshold:.0%})")
+    print(f"{'Etapa':<28}{'T base (s)':>12}{'T nuevo (s)':>12}{'Elem/s base':>13}{'Elem/s nuevo':>14}{'Cambio':>9}")
+    for row in diff:
+        mark = '  <-- REGRESIÓN' if row['regression'] else ''
+        print(f"{row['stage']:<28}{format_value(row['base_time'], '.1f'):>12}"
+              f"{format_value(row['new_time'], '.1f'):>12}{format_value(row['base_throughput'], '.2f'):>13}"
+              f"{format_value(row['new_throughput'], '.2f'):>14}{format_value(row['change'], '+.0%'):>9}{mark}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Historial de ejecuciones del entrenamiento")
+    parser.add_argument('--db', default=HISTORY_DB)
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    list_parser = subparsers.add_parser('list', help="Listar ejecuciones")
+    list_parser.add_argument('--limit', type=int, default=20)
+    show_parser = subparsers.add_parser('show', help="Detalle por etapa de una ejecución")
+    show_parser.add_argument('run_id', type=int)
+    diff_parser = subparsers.add_parser('diff', help="Comparar dos ejecuciones")
+    diff_parser.add_argument('run_ids', type=int, nargs='*')
+    diff_parser.add_argument('--threshold', type=float, default=0.2,
+                             help="Caída de throughput a partir de la cual se marca regresión")
+    evals_parser = subparsers.add_parser('evals', help="Listar evaluaciones del modelo")
+    evals_parser.add_argument('--limit', type=int, default=20)
+    args = parser.parse_args()
+
+    history = RunHistory(args.db)
+    try:
+        if args.command == 'list':
+            print_runs(history, args.limit)
+        elif args.command == 'show':
+            print_run(history, args.run_id)
+        elif args.command == 'evals':
+            print_evaluations(history, args.limit)
+        else:
+            run_ids = args.run_ids or history.last_run_ids(2)
+            if len(run_ids) != 2:
+                parser.error("diff necesita dos ejecuciones")
+            diff = history.diff_runs(run_ids[0], run_ids[1], args.threshold)
+            print_diff(diff, run_ids[0], run_ids[1], args.threshold)
+            if any(row['regression'] for row in diff):
+                sys.exit(1)
+    finally:
+        history.close()
+
+
+if __name__ == '__main__':
+    main()
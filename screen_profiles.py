@@ -0,0 +1,222 @@
+import os
+import sys
+import json
+import shutil
+from dataclasses import dataclass, field
+from typing import List, Optional
+import numpy as np
+import cv2
+
+from text_regions import TextRegion, PSM_SINGLE_LINE, detect_text_regions
+from preprocessing import DEFAULT_CHAIN, threshold_chain
+
+# Clasificador de pantallas de PvZ y perfiles de OCR por pantalla.
+#
+# Cada pantalla (menú, almanaque, HUD de nivel, diálogos...) tiene fotogramas de referencia
+# en screens/<pantalla>/. El clasificador reduce el fotograma a una miniatura en color,
+# la normaliza y la compara con todas las referencias en un único producto matricial
+# (correlación normalizada). La pantalla elegida aplica su perfil: ROIs fijas en
+# coordenadas relativas, cadena de preprocesado ("preprocess", o el atajo "threshold" e
+# "invert"), PSM y lista de caracteres permitidos (p. ej. solo dígitos en el contador de
+# soles, o los caracteres de pvz.unicharset). Una ROI puede tener su propia cadena.
+# Si ninguna referencia se parece lo suficiente se usa el perfil por defecto.
+#
+#   python screen_profiles.py add <pantalla> <captura.png>    añadir una referencia
+#   python screen_profiles.py classify <captura.png> ...      probar el clasificador
+
+PROFILES_FILE = 'screen_profiles.json'
+THUMBNAIL_SIZE = (32, 18)
+DIGITS = '0123456789'
+
+
+def load_unicharset(path):
+    # Primera línea: número de entradas; después "<carácter> <propiedades...>"
+    chars = []
+    with open(path, 'r', encoding='utf-8') as f:
+        next(f, None)
+        for line in f:
+            parts = line.split()
+            if parts and parts[0] != 'NULL':
+                chars.append(parts[0])
+    return ''.join(dict.fromkeys(chars))
+
+
+def resolve_whitelist(spec, unicharset_chars):
+    # null, "unicharset", "digits", "unicharset+digits" o una cadena literal de caracteres.
+    # Sin pvz.unicharset una lista que lo incluye se ignora entera: reducirla al resto (p. ej.
+    # solo dígitos) haría que la ROI no reconociera el texto
+    if not spec:
+        return None
+    chars = []
+    for part in spec.split('+'):
+        if part == 'unicharset':
+            if not unicharset_chars:
+                return None
+            chars.append(unicharset_chars)
+        elif part == 'digits':
+            chars.append(DIGITS)
+        else:
+            chars.append(part)
+    whitelist = ''.join(dict.fromkeys(''.join(chars)))
+    return whitelist or None
+
+
+@dataclass
+class RoiSpec:
+    # Caja en fracciones del fotograma: x, y, ancho, alto
+    box: List[float]
+    psm: int = PSM_SINGLE_LINE
+    whitelist: Optional[str] = None
+    preprocess: Optional[str] = None
+
+
+@dataclass
+class ScreenProfile:
+    name: str
+    rois: List[RoiSpec] = field(default_factory=list)
+    preprocess: str = DEFAULT_CHAIN
+    whitelist: Optional[str] = None
+
+    def regions(self, gray):
+        # Con ROIs el OCR solo mira esas zonas; sin ellas se detectan regiones en todo el fotograma
+        if not self.rois:
+            regions = detect_text_regions(gray)
+            for region in regions:
+                region.whitelist = self.whitelist
+                region.chain = self.preprocess
+            return regions
+        height, width = gray.shape[:2]
+        regions = []
+        for roi in self.rois:
+            x, y, w, h = roi.box
+            x0, y0 = int(round(x * width)), int(round(y * height))
+            x1, y1 = min(width, int(round((x + w) * width))), min(height, int(round((y + h) * height)))
+            if x1 > x0 and y1 > y0:
+                regions.append(TextRegion(x0, y0, x1 - x0, y1 - y0, roi.psm, roi.whitelist or self.whitelist,
+                                          roi.preprocess or self.preprocess))
+        return regions
+
+
+def thumbnail(image, size=THUMBNAIL_SIZE):
+    # Se reduce antes de quitar el canal alfa: evita copiar el fotograma BGRA completo
+    small = cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+    small = small[..., :3].astype(np.float32).ravel()
+    small -= small.mean()
+    norm = np.linalg.norm(small)
+    return small / norm if norm > 0 else small
+
+
+class ScreenClassifier:
+    def __init__(self, references, size=THUMBNAIL_SIZE, min_score=0.85):
+        # references: {pantalla: [imágenes BGR/BGRA]}
+        self.size = size
+        self.min_score = min_score
+        self.labels = []
+        thumbnails = []
+        for name, images in references.items():
+            for image in images:
+                self.labels.append(name)
+                thumbnails.append(thumbnail(image, size))
+        self._matrix = np.vstack(thumbnails) if thumbnails else np.empty((0, size[0] * size[1] * 3), np.float32)
+
+    @classmethod
+    def from_directory(cls, directory, **kwargs):
+        references = {}
+        if os.path.isdir(directory):
+            for name in sorted(os.listdir(directory)):
+                folder = os.path.join(directory, name)
+                if not os.path.isdir(folder):
+                    continue
+                images = [cv2.imread(os.path.join(folder, f), cv2.IMREAD_COLOR) for f in sorted(os.listdir(folder))
+                          if f.lower().endswith(('.png', '.jpg', '.jpeg', '.bmp'))]
+                images = [image for image in images if image is not None]
+                if images:
+                    references[name] = images
+        return cls(references, **kwargs)
+
+    def __len__(self):
+        return len(self.labels)
+
+    def classify(self, image):
+        # Devuelve (pantalla o None, puntuación de la mejor referencia)
+        if not self.labels:
+            return None, 0.0
+        scores = self._matrix @ thumbnail(image, self.size)
+        best = int(np.argmax(scores))
+        score = float(scores[best])
+        return (self.labels[best] if score >= self.min_score else None), score
+
+
+class ScreenProfiles:
+    def __init__(self, profiles, default, classifier):
+        self.profiles = profiles
+        self.default = default
+        self.classifier = classifier
+        self.counts = {}
+
+    @classmethod
+    def load(cls, path, default_chain=DEFAULT_CHAIN):
+        base_dir = os.path.dirname(os.path.abspath(path))
+        with open(path, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+
+        unicharset_path = os.path.join(base_dir, config.get('unicharset', 'tesseract_output/pvz.unicharset'))
+        unicharset_chars = load_unicharset(unicharset_path) if os.path.exists(unicharset_path) else None
+        if unicharset_chars is None:
+            print(f"No se encontró {unicharset_path}: se ignoran las listas 'unicharset'")
+
+        def build(name, spec):
+            rois = [RoiSpec(roi['box'], roi.get('psm', PSM_SINGLE_LINE),
+                            resolve_whitelist(roi.get('whitelist'), unicharset_chars), roi.get('preprocess'))
+                    for roi in spec.get('rois', [])]
+            # "preprocess" manda; "threshold"/"invert" siguen valiendo como atajo
+            preprocess = spec.get('preprocess')
+            if preprocess is None and ('threshold' in spec or 'invert' in spec):
+                preprocess = threshold_chain(spec.get('threshold', 150), spec.get('invert', False))
+            return ScreenProfile(name, rois, preprocess or default_chain,
+                                 resolve_whitelist(spec.get('whitelist'), unicharset_chars))
+
+        profiles = {name: build(name, spec) for name, spec in config.get('screens', {}).items()}
+        default = build('default', config.get('default', {}))
+        classifier = ScreenClassifier.from_directory(os.path.join(base_dir, config.get('reference_dir', 'screens')),
+                                                     min_score=config.get('min_score', 0.85))
+        return cls(profiles, default, classifier)
+
+    def select(self, image):
+        name = self.classifier.classify(image)[0] if self.classifier is not None else None
+        profile = self.profiles.get(name, self.default)
+        self.counts[profile.name] = self.counts.get(profile.name, 0) + 1
+        return profile
+
+
+def main():
+    if len(sys.argv) < 3 or sys.argv[1] not in ('add', 'classify') or (sys.argv[1] == 'add' and len(sys.argv) < 4):
+        print("Uso: python screen_profiles.py add <pantalla> <captura> | classify <captura> ...")
+        return 1
+    config_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), PROFILES_FILE)
+    with open(config_path, 'r', encoding='utf-8') as f:
+        reference_dir = os.path.join(os.path.dirname(config_path), json.load(f).get('reference_dir', 'screens'))
+
+    if sys.argv[1] == 'add':
+        screen, image_path = sys.argv[2], sys.argv[3]
+        folder = os.path.join(reference_dir, screen)
+        os.makedirs(folder, exist_ok=True)
+        target = os.path.join(folder, f"{len(os.listdir(folder)):03d}{os.path.splitext(image_path)[1]}")
+        shutil.copyfile(image_path, target)
+        print(f"Referencia añadida: {target}")
+        return 0
+
+    profiles = ScreenProfiles.load(config_path)
+    print(f"{len(profiles.classifier)} referencias de {len(set(profiles.classifier.labels))} pantallas")
+    for image_path in sys.argv[2:]:
+        image = cv2.imread(image_path, cv2.IMREAD_COLOR)
+        if image is None:
+            print(f"{image_path}: no se pudo leer")
+            continue
+        name, score = profiles.classifier.classify(image)
+        print(f"{image_path}: {name or 'default'} ({score:.3f})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
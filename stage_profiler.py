@@ -0,0 +1,144 @@
+import os
+import io
+import time
+import pstats
+import cProfile
+import tracemalloc
+from contextlib import contextmanager
+
+# PVZ_PROFILE="generate_training_data:cprofile+tracemalloc,process_unicharset"
+# Etapas separadas por comas; los modos (cprofile, tracemalloc) se unen con '+'.
+# Sin modo se usa cprofile. 'all' activa el perfilado en todas las etapas.
+# cProfile se activa solo en uno de cada PVZ_PROFILE_EVERY elementos; tracemalloc traza la
+# etapa completa y la instantánea se toma al terminarla, de modo que cubre toda la etapa.
+# "Proyecto 2.0/Libs/profiling.py" reutiliza esta implementación.
+PROFILE_ENV = 'PVZ_PROFILE'
+PROFILE_EVERY_ENV = 'PVZ_PROFILE_EVERY'
+PROFILE_MODES = ('cprofile', 'tracemalloc')
+
+profile_dir = 'profiles'
+profile_stages = {}
+profile_every = 100
+_active_profiler = None
+
+
+def parse_profile_spec(spec):
+    stages = {}
+    for entry in (spec or '').split(','):
+        entry = entry.strip()
+        if not entry:
+            continue
+        stage, _, modes = entry.partition(':')
+        modes = {m.strip() for m in modes.split('+') if m.strip()} or {'cprofile'}
+        unknown = modes - set(PROFILE_MODES)
+        if unknown:
+            raise ValueError(f"Modo de perfilado desconocido: {', '.join(sorted(unknown))}")
+        stages[stage.strip()] = modes
+    return stages
+
+
+def configure_profiling(spec=None, every=None, output_dir=None):
+    global profile_stages, profile_every, profile_dir
+    profile_stages = parse_profile_spec(spec if spec is not None else os.environ.get(PROFILE_ENV))
+    if every is None:
+        every = int(os.environ.get(PROFILE_EVERY_ENV, profile_every))
+    profile_every = max(1, every)
+    if output_dir is not None:
+        profile_dir = output_dir
+
+
+class StageProfiler:
+    def __init__(self, stage, modes, every, output_dir, log):
+        self.stage = stage
+        self.modes = modes
+        self.every = every
+        self.output_dir = output_dir
+        self.log = log
+        self.items = 0
+        self.sampled_items = 0
+        self.sampling = False
+        self.profile = cProfile.Profile() if 'cprofile' in modes else None
+        self.snapshot = None
+        self.traced_peak = 0
+        self._owns_tracemalloc = False
+
+    def start(self):
+        if 'tracemalloc' in self.modes and not tracemalloc.is_tracing():
+            tracemalloc.start(25)
+            self._owns_tracemalloc = True
+        # Hasta el primer tick se perfila la etapa completa (incluye la preparación)
+        self._resume()
+
+    def tick(self):
+        if self.sampling:
+            self._pause()
+        if self.items % self.every == 0:
+            self.sampled_items += 1
+            self._resume()
+        self.items += 1
+
+    def stop(self):
+        if self.sampling:
+            self._pause()
+        if 'tracemalloc' in self.modes and tracemalloc.is_tracing():
+            self.snapshot = tracemalloc.take_snapshot()
+            self.traced_peak = tracemalloc.get_traced_memory()[1]
+            if self._owns_tracemalloc:
+                tracemalloc.stop()
+                self._owns_tracemalloc = False
+        self._write_results()
+
+    def _resume(self):
+        self.sampling = True
+        if self.profile is not None:
+            self.profile.enable()
+
+    def _pause(self):
+        self.sampling = False
+        if self.profile is not None:
+            self.profile.disable()
+
+    def _write_results(self):
+        os.makedirs(self.output_dir, exist_ok=True)
+        base = os.path.join(self.output_dir, f"{self.stage}_{time.strftime('%Y%m%d_%H%M%S')}")
+        self.log(f"Perfilado de {self.stage}: {self.sampled_items} de {self.items} elementos muestreados "
+                 f"(cada {self.every})")
+
+        if self.profile is not None:
+            self.profile.dump_stats(f"{base}.prof")
+            stream = io.StringIO()
+            pstats.Stats(self.profile, stream=stream).sort_stats('cumulative').print_stats(15)
+            self.log(f"Perfil cProfile guardado en {base}.prof\n{stream.getvalue()}")
+
+        if self.snapshot is not None:
+            self.snapshot.dump(f"{base}.snapshot")
+            top = self.snapshot.statistics('lineno')[:10]
+            lines = '\n'.join(str(stat) for stat in top)
+            self.log(f"Instantánea de memoria guardada en {base}.snapshot - "
+                     f"pico trazado {self.traced_peak // 1024} KB\n{lines}")
+
+
+@contextmanager
+def profile_stage(stage, log):
+    global _active_profiler
+    modes = profile_stages.get(stage) or profile_stages.get('all')
+    if not modes or _active_profiler is not None:
+        yield None
+        return
+
+    profiler = StageProfiler(stage, modes, profile_every, profile_dir, log)
+    _active_profiler = profiler
+    profiler.start()
+    try:
+        yield profiler
+    finally:
+        _active_profiler = None
+        profiler.stop()
+
+
+def profile_tick():
+    if _active_profiler is not None:
+        _active_profiler.tick()
+
+
+configure_profiling()
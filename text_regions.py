@@ -0,0 +1,90 @@
+from dataclasses import dataclass
+from typing import Optional
+import numpy as np
+import cv2
+
+# Detector rápido de regiones candidatas a texto: gradiente morfológico + Otsu, cierre
+# horizontal para unir caracteres en líneas y filtrado de componentes conexas por tamaño,
+# proporción y densidad. El OCR solo se ejecuta sobre estas regiones.
+
+# Modos de segmentación de Tesseract usados por región
+PSM_SINGLE_LINE = 7
+PSM_BLOCK = 6
+
+
+@dataclass
+class TextRegion:
+    x: int
+    y: int
+    w: int
+    h: int
+    psm: int = PSM_SINGLE_LINE
+    # Caracteres permitidos para Tesseract en esta región (None: todos los del modelo)
+    whitelist: Optional[str] = None
+    # Cadena de preprocesado (preprocessing.py) que convierte el recorte en la entrada del OCR
+    chain: Optional[str] = None
+
+    def crop(self, image):
+        return image[self.y:self.y + self.h, self.x:self.x + self.w]
+
+    @property
+    def area(self):
+        return self.w * self.h
+
+    @property
+    def ocr_key(self):
+        # Parte de la clave de caché que depende de la configuración de OCR, no de los píxeles
+        return f"psm{self.psm}:{hash(self.whitelist) if self.whitelist else ''}:{self.chain or ''}"
+
+
+def detect_text_regions(gray, min_height=8, max_height_ratio=0.35, min_width=8,
+                        min_fill=0.15, padding=3, join_width=None):
+    height, width = gray.shape[:2]
+    gradient = cv2.morphologyEx(gray, cv2.MORPH_GRADIENT, cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (3, 3)))
+    _, mask = cv2.threshold(gradient, 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU)
+
+    # El núcleo horizontal une los caracteres de una misma línea sin fusionar líneas distintas
+    join_width = join_width or max(9, width // 80)
+    mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, cv2.getStructuringElement(cv2.MORPH_RECT, (join_width, 1)))
+
+    count, _, stats, _ = cv2.connectedComponentsWithStats(mask, connectivity=8)
+    boxes = []
+    for x, y, w, h, pixels in stats[1:count]:
+        if h < min_height or h > height * max_height_ratio or w < min_width:
+            continue
+        if w < h * 0.8 or pixels < min_fill * w * h:
+            continue
+        boxes.append((x, y, w, h))
+    if not boxes:
+        return []
+
+    line_height = float(np.median([h for _, _, _, h in boxes]))
+    regions = []
+    for x, y, w, h in boxes:
+        x0, y0 = max(0, x - padding), max(0, y - padding)
+        x1, y1 = min(width, x + w + padding), min(height, y + h + padding)
+        psm = PSM_BLOCK if h > 1.8 * line_height else PSM_SINGLE_LINE
+        regions.append(TextRegion(int(x0), int(y0), int(x1 - x0), int(y1 - y0), psm))
+
+    return sort_reading_order(regions, line_height)
+
+
+def sort_reading_order(regions, line_height=None, key=lambda region: region):
+    # Orden de lectura: se agrupan en filas las regiones cuyo centro vertical cae a menos de
+    # media línea del de la fila actual, y cada fila se lee de izquierda a derecha
+    items = list(regions)
+    if not items:
+        return items
+    if line_height is None:
+        line_height = float(np.median([key(item).h for item in items]))
+    tolerance = max(1.0, line_height / 2)
+    items.sort(key=lambda item: key(item).y + key(item).h / 2)
+
+    rows, row_center = [], None
+    for item in items:
+        center = key(item).y + key(item).h / 2
+        if row_center is None or center - row_center > tolerance:
+            rows.append([])
+            row_center = center
+        rows[-1].append(item)
+    return [item for row in rows for item in sorted(row, key=lambda item: key(item).x)]
@@ -0,0 +1,121 @@
+from collections import Counter, deque
+
+from text_regions import sort_reading_order
+
+# Estabilizador temporal de la salida de OCR.
+#
+# Aunque la pantalla apenas cambie, Tesseract devuelve variantes de la misma línea (un
+# carácter distinto, una línea que desaparece un fotograma). Cada línea se asigna a una
+# "pista" por solapamiento de cajas y la pista vota entre sus últimas N lecturas: solo
+# cuando cambia el texto por consenso se traduce de nuevo y se publica un resultado.
+# Una ausencia también cuenta como voto, así que una línea que falta un fotograma no
+# desaparece del overlay.
+#
+# Mientras alguna pista tenga una lectura nueva sin consenso (pending), el llamador debe
+# seguir haciendo OCR aunque el detector de cambios no vea diferencias: tras un cambio
+# en el sitio ("hola" -> "adios") la pantalla queda quieta y sin más lecturas el empate
+# no se resolvería nunca.
+
+
+def box_iou(a, b):
+    x0, y0 = max(a.x, b.x), max(a.y, b.y)
+    x1, y1 = min(a.x + a.w, b.x + b.w), min(a.y + a.h, b.y + b.h)
+    if x1 <= x0 or y1 <= y0:
+        return 0.0
+    intersection = (x1 - x0) * (y1 - y0)
+    return intersection / float(a.w * a.h + b.w * b.h - intersection)
+
+
+class TextTrack:
+    def __init__(self, line, history):
+        self.votes = deque([line.text], maxlen=history)
+        self.text = line.text
+        # Última caja observada de cada variante: se dibuja la del texto por consenso
+        self.boxes = {line.text: line}
+        self.line = line
+        self.translation = None
+
+    def observe(self, line):
+        self.votes.append(None if line is None else line.text)
+        if line is not None:
+            self.boxes[line.text] = line
+
+    @property
+    def pending(self):
+        # La última lectura (o ausencia) no es el texto por consenso: falta confirmarla
+        return self.votes[-1] != self.text
+
+    def consensus(self):
+        counts = Counter(self.votes)
+        # En caso de empate se mantiene el texto actual
+        best = max(counts, key=lambda text: (counts[text], text == self.text))
+        return best, counts[best]
+
+
+class TextStabilizer:
+    def __init__(self, translate, history=3, min_votes=2, iou_threshold=0.3):
+        self.translate = translate
+        self.history = history
+        self.min_votes = min_votes
+        self.iou_threshold = iou_threshold
+        self.tracks = []
+        self.translations = 0
+
+    def _match(self, lines):
+        # Emparejamiento greedy por mayor solapamiento; cada pista recibe como mucho una línea
+        pairs = sorted(((box_iou(track.line, line), t, l)
+                        for t, track in enumerate(self.tracks) for l, line in enumerate(lines)),
+                       reverse=True)
+        matched_tracks, matched_lines, matches = set(), set(), {}
+        for iou, t, l in pairs:
+            if iou < self.iou_threshold:
+                break
+            if t in matched_tracks or l in matched_lines:
+                continue
+            matched_tracks.add(t)
+            matched_lines.add(l)
+            matches[t] = lines[l]
+        return matches, [line for l, line in enumerate(lines) if l not in matched_lines]
+
+    def update(self, lines):
+        # Devuelve ([(traducción, línea)], cambió): cambió es False si el consenso es el mismo
+        matches, new_lines = self._match(lines)
+        changed = False
+        tracks = []
+        for t, track in enumerate(self.tracks):
+            track.observe(matches.get(t))
+            text, votes = track.consensus()
+            if text is None:
+                if votes >= self.min_votes:
+                    changed = True
+                    continue
+            elif text != track.text and votes >= self.min_votes:
+                track.text = text
+                track.translation = None
+                changed = True
+            track.boxes = {variant: box for variant, box in track.boxes.items()
+                           if variant == track.text or variant in track.votes}
+            track.line = track.boxes.get(track.text, track.line)
+            tracks.append(track)
+
+        # Una línea nueva se muestra en cuanto aparece, sin esperar votos
+        for line in new_lines:
+            tracks.append(TextTrack(line, self.history))
+            changed = True
+        self.tracks = sort_reading_order(tracks, key=lambda track: track.line)
+
+        for track in self.tracks:
+            if track.translation is None:
+                track.translation = self.translate(track.text)
+                self.translations += 1
+        return self.labels(), changed
+
+    @property
+    def pending(self):
+        return any(track.pending for track in self.tracks)
+
+    def labels(self):
+        return [(track.translation, track.line) for track in self.tracks]
+
+    def reset(self):
+        self.tracks = []
@@ -1,45 +1,63 @@
 import subprocess
 import os
+import sys
+import argparse
 import logging
 import shutil
-import random
 import json
 import time
 import io
 import unicodedata
 import traceback
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from tqdm import tqdm
 from logging.handlers import RotatingFileHandler
-from PIL import Image, ImageDraw, ImageFont, ImageColor
-from colors import background_colors, text_colors
-
-# Crear carpeta para logs
+from resource_sampler import start_sampler, stop_sampler, tag_stage, tag_batch, get_stage_summary
+import stage_profiler
+from stage_profiler import profile_stage, profile_tick, configure_profiling
+from run_history import RunHistory
+from dictionary_index import DICTIONARY_FILE, MANIFEST_NAME, WORDLIST_NAME, build_artifacts, file_hash, write_manifest
+from evaluate_model import EVAL_FOLDER, evaluate_model, load_eval_lines
+from corpus_store import TEXT_FILE, CEDICT_FILE, CorpusStore, compile_corpus
+from page_renderer import LINES_PER_IMAGE, init_render_worker, render_block
+from training_config import TRAINING_MODES, TrainingConfig, get_config, set_config
+import lstm_finetune
+import work_queue
+
+# Los logs y las carpetas se crean en setup_logging() / main(), no al importar: los procesos
+# de renderizado y evaluación importan este módulo y un FileHandler en modo 'w' truncaría el
+# log de la ejecución en curso
 logs_folder = 'logs'
-os.makedirs(logs_folder, exist_ok=True)
-
-# Configuración del logging principal
 logger = logging.getLogger('current_logger')
-logger.setLevel(logging.INFO)
-file_handler = logging.FileHandler(os.path.join(logs_folder, 'tesseract_training_current.log'), mode='w')
-formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
-file_handler.setFormatter(formatter)
-logger.addHandler(file_handler)
-logging.basicConfig(filename=os.path.join(logs_folder, 'tesseract_training_current.log'), 
-                    level=logging.INFO,
-                    format='%(asctime)s - %(levelname)s - %(message)s',
-                    filemode='w', 
-                    encoding='utf-8')
-
-# Configuración del logging histórico
 historical_logger = logging.getLogger('historical')
-historical_logger.setLevel(logging.INFO)
-handler = RotatingFileHandler(os.path.join(logs_folder, 'tesseract_training_historical.log'), 
-                              maxBytes=1000000, 
-                              backupCount=5, 
-                              encoding='utf-8')
-handler.setFormatter(formatter)
-historical_logger.addHandler(handler)
+
+def setup_logging():
+    if logger.handlers:
+        return
+    os.makedirs(logs_folder, exist_ok=True)
+
+    # Configuración del logging principal
+    logger.setLevel(logging.INFO)
+    file_handler = logging.FileHandler(os.path.join(logs_folder, 'tesseract_training_current.log'), mode='w')
+    formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
+    file_handler.setFormatter(formatter)
+    logger.addHandler(file_handler)
+    logging.basicConfig(filename=os.path.join(logs_folder, 'tesseract_training_current.log'),
+                        level=logging.INFO,
+                        format='%(asctime)s - %(levelname)s - %(message)s',
+                        filemode='w',
+                        encoding='utf-8')
+
+    # Configuración del logging histórico
+    historical_logger.setLevel(logging.INFO)
+    handler = RotatingFileHandler(os.path.join(logs_folder, 'tesseract_training_historical.log'),
+                                  maxBytes=1000000,
+                                  backupCount=5,
+                                  encoding='utf-8')
+    handler.setFormatter(formatter)
+    historical_logger.addHandler(handler)
 
 # Función para registrar en ambos logs
 def log_info(message):
@@ -47,6 +65,7 @@ def log_info(message):
     historical_logger.info(message)
 
 def log_error(message):
+    stage_counters['failures'] += 1
     logger.error(message)
     historical_logger.error(message)
     log_error_to_file(message)
@@ -56,14 +75,25 @@ def log_error_to_file(error_message):
         f.write(f"{datetime.now()} - {error_message}\n")
 
 
-# Rutas y configuraciones
-tesseract_path = r'C:\Program Files\Tesseract-OCR'
+# Contadores de la etapa en curso y ejecución activa en el historial
+stage_counters = {'items': 0, 'failures': 0}
+current_run = {'history': None, 'run_id': None}
+
+# Rutas fijas; fuentes, procesos, modo y aumentado están en training_config.py (get_config())
 output_folder = 'tesseract_output'
-os.makedirs(output_folder, exist_ok=True)
 
-# Lista de fuentes
-fonts_folder = r'C:\Users\talol\Desktop\Proyecto Traduccion Tiempo Real\Fuentes'
-fonts = [os.path.join(fonts_folder, f) for f in os.listdir(fonts_folder) if f.endswith('.ttf')]
+# Parámetros de renderizado (LINES_PER_IMAGE e IMAGE_WIDTH en page_renderer.py) y tamaños de
+# lote de las herramientas
+FONT_SIZES = [9, 12, 16, 20, 24, 28, 32, 36, 40, 48, 56]
+UNICHARSET_BATCH_SIZE = 100
+SHAPECLUSTERING_BATCH_SIZE = 100
+MFTRAINING_BATCH_SIZE = 80
+MFTRAINING_MAX_BATCHES = 500
+# Páginas por tarea de renderizado y por tarea de box.train en la cola compartida
+RENDER_CHUNK = 20
+TR_QUEUE_BATCH = 20
+# Distancia de edición del índice SymSpell que usa el interceptor para corregir el OCR
+DICTIONARY_MAX_DISTANCE = 1
 
 def run_command(command):
     log_info(f"Ejecutando comando: {command}")
@@ -73,6 +103,37 @@ def run_command(command):
         log_error(f"Error (código {result.returncode}): {result.stderr}")
     return result
 
+def run_stage(stage, stage_function):
+    tag_stage(stage)
+    stage_counters['items'] = stage_counters['failures'] = 0
+    started_at = datetime.now()
+    start_time = time.time()
+    result = False
+    try:
+        with profile_stage(stage, log_info):
+            result = stage_function()
+    finally:
+        wall_time = time.time() - start_time
+        summary = get_stage_summary(stage)
+        if summary:
+            log_info(f"Recursos de la etapa {stage}: CPU media {summary['cpu_mean']}% - "
+                     f"RSS máximo {summary['rss_peak'] // (1024 * 1024)} MB - "
+                     f"E/S {summary['io_bytes_per_sec'] // 1024} KB/s - limitada por {summary['bound']}")
+        if current_run['history'] is not None:
+            # Las etapas sin bucle (cntraining, combine) cuentan como un único elemento
+            items = stage_counters['items'] or 1
+            current_run['history'].record_stage(current_run['run_id'], stage, started_at, wall_time,
+                                                items, stage_counters['failures'],
+                                                result is not False, summary)
+    return result
+
+def mark_item(index):
+    # Se llama al inicio de cada imagen/lote para etiquetar las muestras de recursos,
+    # contar elementos procesados y para que el perfilador muestree uno de cada N
+    stage_counters['items'] += 1
+    tag_batch(index)
+    profile_tick()
+
 def find_file(filename, search_dirs):
     for directory in search_dirs:
         filepath = os.path.join(directory, filename)
@@ -80,97 +141,123 @@ def find_file(filename, search_dirs):
             return filepath
     return None
 
-def process_cedict(file_path):
-    chinese_characters = set()
-    with open(file_path, 'r', encoding='utf-8') as f:
-        for line in f:
-            if line.startswith('#'):
-                continue
-            parts = line.split(' ')
-            if len(parts) > 1:
-                chinese_characters.update(parts[0])
-    return list(chinese_characters)
-
-def generate_training_data():
-    with open('training_text.txt', 'r', encoding='utf-8') as f:
-        training_text = f.read().splitlines()
-
-    chinese_chars = process_cedict('cedict_1_0_ts_utf-8_mdbg.txt')
-    training_text.extend(chinese_chars)
+def compile_training_corpus():
+    # training_text.txt + CEDICT normalizados y sin duplicados; solo se recompila si cambian
+    corpus_path, _, _ = compile_corpus([TEXT_FILE], CEDICT_FILE, output_folder, log=log_info)
+    return corpus_path
 
-    lines_per_image = 25
-    image_width = 1600
+def load_training_text():
+    corpus = CorpusStore(compile_training_corpus())
+    try:
+        return corpus.lines(0, len(corpus))
+    finally:
+        corpus.close()
 
-    font_sizes = [9, 12, 16, 20, 24, 28, 32, 36, 40, 48, 56]
+def generate_training_data():
+    config = get_config()
+    fonts = config.fonts
+    if not fonts:
+        log_error(f"No hay fuentes .ttf en {config.fonts_dir} (PVZ_FONTS_DIR)")
+        return False
+    corpus_path = compile_training_corpus()
+    corpus = CorpusStore(corpus_path)
+    pages_per_size = corpus.block_count(LINES_PER_IMAGE)
+    corpus.close()
+
+    # Tareas de RENDER_CHUNK páginas por fuente y tamaño; cada proceso lee su texto del mmap
+    tasks = []
+    for font_path in fonts:
+        font_name = os.path.basename(font_path).split('.')[0][:3]
+        for font_size in FONT_SIZES:
+            subdir = os.path.join(output_folder, f"{font_name}_{font_size}")
+            os.makedirs(subdir, exist_ok=True)
+            for first_page in range(0, pages_per_size, RENDER_CHUNK):
+                tasks.append((font_path, font_size, subdir, first_page, min(first_page + RENDER_CHUNK, pages_per_size)))
+
+    total_iterations = len(fonts) * len(FONT_SIZES) * pages_per_size
+    if config.queue:
+        # Rutas relativas a tesseract_output y nombres de fuente: cada máquina usa las suyas
+        queued = [(f"{os.path.basename(font_path)}:{font_size}:{first_page}", {
+            'font': os.path.basename(font_path),
+            'size': font_size,
+            'subdir': os.path.relpath(subdir, output_folder),
+            'first': first_page,
+            'last': last_page,
+            'corpus': os.path.relpath(corpus_path, output_folder),
+            'augment': config.augmentation.to_dict()
+        }) for font_path, font_size, subdir, first_page, last_page in tasks]
+        log_info(f"Generando {total_iterations} páginas en la cola compartida")
+        if not run_queued('generate_training_data', 'render', queued, file_hash(corpus_path)):
+            return False
+        log_info("Generación de datos de entrenamiento completada")
+        save_progress('data_generation', 'completed')
+        return True
 
-    total_iterations = len(fonts) * len(font_sizes) * (len(training_text) // lines_per_image)
+    log_info(f"Generando {total_iterations} páginas con {config.render_workers} procesos")
     start_time = time.time()
 
-    with tqdm(total=total_iterations, desc="Generando datos de entrenamiento") as pbar:
-        for font_path in fonts:
-            font_name = os.path.basename(font_path).split('.')[0][:3]
-            log_info(f"Generando datos de entrenamiento para {font_name}")
-           
-            for font_size in font_sizes:
-                line_height = font_size + 4
-                image_height = lines_per_image * line_height
-               
-                for i in range(0, len(training_text), lines_per_image):
-                    text_block = training_text[i:i+lines_per_image]
-                   
-                    subdir = os.path.join(output_folder, f"{font_name}_{font_size}")
-                    os.makedirs(subdir, exist_ok=True)
-                   
-                    file_name = f"p{i//lines_per_image:04d}"
-                    image_path = os.path.join(subdir, f"{file_name}.png")
-                    box_path = os.path.join(subdir, f"{file_name}.box")
-                   
-                    color_index = (i // lines_per_image) % len(background_colors)
-                    bg_color = background_colors[color_index]
-                    text_color = text_colors[(color_index + 1) % len(text_colors)]
-                   
-                    image = Image.new('RGB', (image_width, image_height), color=bg_color)
-                   
-                    if random.choice([True, False]):
-                        draw = ImageDraw.Draw(image)
-                        for x in range(0, image_width, 10):
-                            for y in range(0, image_height, 10):
-                                draw.point((x, y), fill='lightgray')
-                   
-                    draw = ImageDraw.Draw(image)
-                    font = ImageFont.truetype(font_path, font_size)
-                   
-                    for j, line in enumerate(text_block):
-                        draw.text((10, j * line_height), line, font=font, fill=text_color)
-                   
-                    image.save(image_path, format='PNG')
-                   
-                    with open(box_path, 'w', encoding='utf-8') as box_file:
-                        for j, line in enumerate(text_block):
-                            for k, char in enumerate(line):
-                                if char.strip():
-                                    left = 10 + k * (font_size // 2)
-                                    top = j * line_height
-                                    right = left + font_size
-                                    bottom = top + line_height
-                                    box_file.write(f"{char} {left} {top} {right} {bottom} 0\n")
-                   
-                    pbar.update(1)
-                    progress_percentage = (pbar.n / total_iterations) * 100
-                    save_progress('data_generation', 'generate_training_data', {
-                        'progress_percentage': round(progress_percentage, 2)
-                    })
+    # spawn: mismo comportamiento en Windows y Linux
+    with tqdm(total=total_iterations, desc="Generando datos de entrenamiento") as pbar, \
+            multiprocessing.get_context('spawn').Pool(config.render_workers, initializer=init_render_worker,
+                                                      initargs=(corpus_path, config.augmentation)) as pool:
+        for rendered in pool.imap_unordered(render_block, tasks):
+            for _ in range(rendered):
+                mark_item(pbar.n)
+            pbar.update(rendered)
+            progress_percentage = (pbar.n / total_iterations) * 100
+            save_progress('data_generation', 'generate_training_data', {
+                'progress_percentage': round(progress_percentage, 2)
+            })
 
-                    elapsed_time = time.time() - start_time
-                    estimated_total_time = elapsed_time * total_iterations / pbar.n
-                    remaining_time = estimated_total_time - elapsed_time
-                    log_info(f"Progreso: {pbar.n}/{total_iterations} ({pbar.n/total_iterations*100:.2f}%) - "
-                             f"Tiempo transcurrido: {timedelta(seconds=int(elapsed_time))} - "
-                             f"Tiempo estimado restante: {timedelta(seconds=int(remaining_time))}")
+            elapsed_time = time.time() - start_time
+            estimated_total_time = elapsed_time * total_iterations / pbar.n
+            remaining_time = estimated_total_time - elapsed_time
+            log_info(f"Progreso: {pbar.n}/{total_iterations} ({pbar.n/total_iterations*100:.2f}%) - "
+                     f"Tiempo transcurrido: {timedelta(seconds=int(elapsed_time))} - "
+                     f"Tiempo estimado restante: {timedelta(seconds=int(remaining_time))}")
 
     log_info("Generación de datos de entrenamiento completada")
     save_progress('data_generation', 'completed')
 
+def run_queued(stage, kind, tasks, fingerprint=None):
+    # Encola las tareas en work_queue.py, lanza los trabajadores locales y espera a que la cola
+    # (con trabajadores de cualquier máquina) las termine. Las salidas quedan en output_folder
+    config = get_config()
+    queue = work_queue.open_queue(config.queue)
+    job = work_queue.job_name(stage, [payload for _, payload in tasks], fingerprint)
+    added = queue.enqueue(job, kind, tasks)
+    log_info(f"Cola {config.queue}: trabajo {job} con {len(tasks)} tareas ({len(tasks) - added} ya existían) - "
+             f"{config.local_queue_workers} trabajadores locales")
+    workers = work_queue.spawn_local_workers(config.queue, config.local_queue_workers,
+                                             os.path.abspath(output_folder), config.fonts_dir, [kind])
+    start_time = time.time()
+    try:
+        with tqdm(total=len(tasks), desc=f"{stage} (cola)") as pbar:
+            def progress(done, total):
+                for index in range(pbar.n, done):
+                    mark_item(index)
+                pbar.update(done - pbar.n)
+                save_progress('training' if kind == 'box_train' else 'data_generation', stage,
+                              {'progress': done, 'total': total})
+                if done:
+                    elapsed_time = time.time() - start_time
+                    log_info(f"Progreso: {done}/{total} tareas - "
+                             f"Tiempo transcurrido: {timedelta(seconds=int(elapsed_time))} - "
+                             f"Tiempo estimado restante: {timedelta(seconds=int(elapsed_time * (total - done) / done))}")
+            status = work_queue.wait_for_job(queue, job, len(tasks), progress)
+        failures = queue.failures(job)
+    finally:
+        for process in workers:
+            process.wait()
+        queue.close()
+
+    if status.get('failed'):
+        for failure in failures:
+            log_error(f"Tarea {failure['task_key']} fallida tras {failure['attempts']} intentos: {failure['error']}")
+        log_error(f"{status['failed']} tareas de {job} fallaron (python work_queue.py retry --job {job})")
+        return False
+    return True
+
 def load_progress():
     try:
         with open('progress.json', 'r') as f:
@@ -203,12 +290,13 @@ def stage_process_unicharset():
     for root, dirs, files in os.walk(output_folder):
         box_files.extend([os.path.join(root, f) for f in files if f.endswith('.box')])
     
-    batch_size = 100
+    batch_size = UNICHARSET_BATCH_SIZE
     total_batches = (len(box_files) + batch_size - 1) // batch_size
     start_time = time.time()
 
     with tqdm(total=total_batches, desc="Procesando unicharset") as pbar:
         for i in range(0, len(box_files), batch_size):
+            mark_item(i//batch_size)
             batch = box_files[i:i+batch_size]
             unicharset_cmd = [
                 'unicharset_extractor.exe',
@@ -279,6 +367,7 @@ def stage_generate_font_properties():
         try:
             with open(os.path.join(output_folder, 'font_properties'), 'w') as f:
                 for box_file in box_files:
+                    mark_item(pbar.n)
                     relative_path = os.path.relpath(box_file, output_folder)
                     f.write(f'{os.path.splitext(relative_path)[0]} 0 0 0 0 0\n')
                     pbar.update(1)
@@ -302,11 +391,26 @@ def stage_generate_tr_files():
     for root, dirs, files in os.walk(output_folder):
         box_files.extend([os.path.join(root, f) for f in files if f.endswith('.box')])
 
+    if get_config().queue:
+        # Lotes de páginas (rutas relativas) para box.train en la cola; la huella incluye el
+        # tamaño y la fecha de cada imagen para no reutilizar .tr de páginas re-renderizadas
+        pages = sorted(os.path.relpath(os.path.splitext(box_file)[0], output_folder) for box_file in box_files)
+        queued = [(f"{index:06d}", {'pages': pages[index:index + TR_QUEUE_BATCH]})
+                  for index in range(0, len(pages), TR_QUEUE_BATCH)]
+        stats = [(os.stat(os.path.join(output_folder, f"{page}.png")).st_size,
+                  os.stat(os.path.join(output_folder, f"{page}.png")).st_mtime_ns) for page in pages]
+        if not run_queued('generate_tr_files', 'box_train', queued, stats):
+            save_progress('training', 'generate_tr_files', {'error': "tareas fallidas en la cola"})
+            return False
+        save_progress('training', 'tr_files_generated')
+        return True
+
     tr_files = []
     start_time = time.time()
 
     with tqdm(total=len(box_files), desc="Generando archivos .tr") as pbar:
         for box_file in box_files:
+            mark_item(pbar.n)
             base_name = os.path.splitext(box_file)[0]
             image_file = f"{base_name}.png"
             tr_cmd = [
@@ -341,12 +445,13 @@ def stage_complete_shapeclustering():
     for root, dirs, files in os.walk(output_folder):
         tr_files.extend([os.path.join(root, f) for f in files if f.endswith('.tr')])
 
-    batch_size = 100
+    batch_size = SHAPECLUSTERING_BATCH_SIZE
     total_batches = (len(tr_files) + batch_size - 1) // batch_size
     start_time = time.time()
 
     with tqdm(total=total_batches, desc="Ejecutando shapeclustering") as pbar:
         for i in range(0, len(tr_files), batch_size):
+            mark_item(i//batch_size)
             batch = tr_files[i:i+batch_size]
             shape_cmd = [
                 'shapeclustering.exe',
@@ -391,13 +496,14 @@ def stage_run_mftraining():
         with open(xheights_path, 'w') as f:
             f.write("Not 20\n")
 
-    batch_size = 80
-    max_batches = 500
+    batch_size = MFTRAINING_BATCH_SIZE
+    max_batches = MFTRAINING_MAX_BATCHES
     total_batches = min(max_batches, (len(tr_files) + batch_size - 1) // batch_size)
     start_time = time.time()
 
     with tqdm(total=total_batches, desc="Ejecutando mftraining") as pbar:
         for i in range(0, min(len(tr_files), (max_batches * batch_size)), batch_size):
+            mark_item(i//batch_size)
             batch = tr_files[i:i+batch_size]
             mf_cmd = [
                 'mftraining.exe',
@@ -474,6 +580,7 @@ def stage_rename_files():
 
     with tqdm(total=len(files_to_rename), desc="Renombrando archivos") as pbar:
         for file in files_to_rename:
+            mark_item(pbar.n)
             src = find_file(file, [os.getcwd(), output_folder])
             if src:
                 dst = os.path.join(output_folder, f'pvz.{file}')
@@ -496,6 +603,42 @@ def stage_rename_files():
     save_progress('training', 'files_renamed')
     return True
 
+def stage_build_dictionary():
+    log_info("Compilando diccionario de entrenamiento")
+    start_time = time.time()
+
+    if not os.path.exists(DICTIONARY_FILE):
+        log_info(f"No se encontró {DICTIONARY_FILE}: el modelo se combinará sin diccionario")
+        save_progress('training', 'dictionary_built')
+        return True
+
+    try:
+        # Wordlist e índice SymSpell solo se regeneran si cambió el diccionario
+        manifest, _ = build_artifacts(DICTIONARY_FILE, output_folder, DICTIONARY_MAX_DISTANCE, log=log_info)
+        wordlist_path = os.path.join(output_folder, WORDLIST_NAME)
+        unicharset_path = os.path.join(output_folder, 'pvz.unicharset')
+        dawg_path = os.path.join(output_folder, 'pvz.word-dawg')
+        dawg_hash = file_hash(wordlist_path, unicharset_path)
+
+        if manifest.get('dawg_hash') == dawg_hash and os.path.exists(dawg_path):
+            log_info("pvz.word-dawg está al día: se omite wordlist2dawg")
+        else:
+            mark_item(0)
+            dawg_cmd = ['wordlist2dawg.exe', wordlist_path, dawg_path, unicharset_path]
+            if run_command(dawg_cmd).returncode != 0:
+                raise Exception("Error en wordlist2dawg")
+            manifest['dawg_hash'] = dawg_hash
+            write_manifest(os.path.join(output_folder, MANIFEST_NAME), manifest)
+    except Exception as e:
+        log_error(f"Error al compilar el diccionario: {str(e)}")
+        save_progress('training', 'build_dictionary', {'error': str(e)})
+        return False
+
+    elapsed_time = time.time() - start_time
+    log_info(f"Diccionario compilado - Tiempo transcurrido: {timedelta(seconds=int(elapsed_time))}")
+    save_progress('training', 'dictionary_built')
+    return True
+
 def stage_combine_training_data():
     log_info("Combinando datos de entrenamiento")
     start_time = time.time()
@@ -519,35 +662,232 @@ def stage_combine_training_data():
     save_progress('training', 'data_combined')
     return True
 
-def resume_training(substage):
-    stages = [
-        'process_unicharset',
-        'generate_font_properties',
-        'generate_tr_files',
-        'complete_shapeclustering',
-        'run_mftraining',
-        'run_cntraining',
-        'rename_files',
-        'combine_training_data'
-    ]
-   
-    stage_functions = {
-        'process_unicharset': stage_process_unicharset,
-        'generate_font_properties': stage_generate_font_properties,
-        'generate_tr_files': stage_generate_tr_files,
-        'complete_shapeclustering': stage_complete_shapeclustering,
-        'run_mftraining': stage_run_mftraining,
-        'run_cntraining': stage_run_cntraining,
-        'rename_files': stage_rename_files,
-        'combine_training_data': stage_combine_training_data
+def lstm_paths():
+    folder = lstm_finetune.LSTM_FOLDER
+    base_name = os.path.splitext(os.path.basename(get_config().lstm_base))[0]
+    return {
+        'base_lstm': os.path.join(folder, f'{base_name}.lstm'),
+        'train_list': os.path.join(folder, 'pvz.training_files.txt'),
+        'eval_list': os.path.join(folder, 'pvz.eval_files.txt'),
+        'model_output': os.path.join(folder, 'pvz'),
+        'checkpoint': os.path.join(folder, 'pvz_checkpoint')
     }
 
+def stage_generate_lstmf():
+    log_info("Generando muestras de línea .lstmf")
+    pages = []
+    for root, dirs, files in os.walk(output_folder):
+        pages.extend(os.path.join(root, f) for f in sorted(files) if f.endswith('.box'))
+
+    # Las líneas se cortan en el hilo principal; tesseract lstm.train se lanza en paralelo
+    samples = []
+    for box_file in pages:
+        base_name = os.path.splitext(box_file)[0]
+        subdir = os.path.join(lstm_finetune.LSTM_FOLDER, os.path.relpath(os.path.dirname(box_file), output_folder))
+        samples.extend(lstm_finetune.write_line_samples(f"{base_name}.png", box_file, subdir))
+    pending = [base for base in samples if not os.path.exists(f"{base}.lstmf")]
+    log_info(f"{len(samples)} líneas en {len(pages)} páginas; {len(samples) - len(pending)} ya tenían .lstmf")
+
+    start_time = time.time()
+    failures = 0
+    with tqdm(total=len(pending), desc="Generando .lstmf") as pbar, \
+            ThreadPoolExecutor(max_workers=get_config().lstmf_workers) as executor:
+        results = executor.map(lambda base: run_command(lstm_finetune.lstmf_command(base)).returncode, pending)
+        for base, returncode in zip(pending, results):
+            mark_item(pbar.n)
+            if returncode != 0:
+                failures += 1
+            pbar.update(1)
+            if pbar.n % 100 == 0 or pbar.n == len(pending):
+                save_progress('training', 'generate_lstmf', {'progress': pbar.n, 'total': len(pending)})
+                elapsed_time = time.time() - start_time
+                log_info(f"Progreso: {pbar.n}/{len(pending)} - "
+                         f"Tiempo transcurrido: {timedelta(seconds=int(elapsed_time))}")
+
+    lstmf_files = [f"{base}.lstmf" for base in samples if os.path.exists(f"{base}.lstmf")]
+    if failures or not lstmf_files:
+        log_error(f"No se pudieron generar {failures} muestras .lstmf")
+        save_progress('training', 'generate_lstmf', {'error': f"{failures} muestras fallidas"})
+        return False
+
+    paths = lstm_paths()
+    train_count, eval_count = lstm_finetune.write_list_files(lstmf_files, paths['train_list'], paths['eval_list'])
+    log_info(f"Muestras .lstmf: {train_count} de entrenamiento y {eval_count} de evaluación")
+    save_progress('training', 'lstmf_generated')
+    return True
+
+def stage_extract_lstm_model():
+    base_model = get_config().lstm_base
+    log_info(f"Extrayendo el LSTM del modelo base {base_model}")
+    paths = lstm_paths()
+    if os.path.exists(paths['base_lstm']):
+        log_info(f"{paths['base_lstm']} ya existe: se reutiliza")
+    else:
+        mark_item(0)
+        try:
+            if not os.path.exists(base_model):
+                raise Exception(f"No existe el modelo base {base_model} (PVZ_LSTM_BASE)")
+            if run_command(lstm_finetune.extract_lstm_command(base_model, paths['base_lstm'])).returncode != 0:
+                raise Exception("Error en combine_tessdata -e")
+        except Exception as e:
+            log_error(f"Error al extraer el modelo LSTM: {str(e)}")
+            save_progress('training', 'extract_lstm_model', {'error': str(e)})
+            return False
+    save_progress('training', 'lstm_model_extracted')
+    return True
+
+def stage_lstm_training():
+    config = get_config()
+    max_iterations = config.lstm_max_iterations
+    paths = lstm_paths()
+    # Si hay checkpoint, el entrenamiento interrumpido continúa donde se quedó
+    resume = os.path.exists(paths['checkpoint'])
+    continue_from = paths['checkpoint'] if resume else paths['base_lstm']
+    log_info(f"Ejecutando lstmtraining desde {continue_from} (máximo {max_iterations} iteraciones)")
+    command = lstm_finetune.training_command(paths['model_output'], continue_from, config.lstm_base,
+                                             paths['train_list'], paths['eval_list'],
+                                             max_iterations, config.lstm_target_error_rate)
+    log_info(f"Ejecutando comando: {command}")
+    start_time = time.time()
+    try:
+        # lstmtraining informa cada 100 iteraciones y escribe pvz_checkpoint periódicamente
+        process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                   text=True, encoding='utf-8', errors='replace')
+        with tqdm(total=max_iterations, desc="Ejecutando lstmtraining") as pbar:
+            for line in process.stdout:
+                report = lstm_finetune.parse_iteration(line)
+                if report is None:
+                    continue
+                iteration, bcer = report
+                mark_item(iteration)
+                pbar.update(max(0, min(iteration, max_iterations) - pbar.n))
+                save_progress('training', 'lstm_training', {'progress': iteration, 'total': max_iterations,
+                                                            'bcer': bcer})
+                log_info(f"Iteración {iteration}/{max_iterations} - BCER {bcer:.3f}% - "
+                         f"Tiempo transcurrido: {timedelta(seconds=int(time.time() - start_time))}")
+        if process.wait() != 0:
+            raise Exception(f"lstmtraining terminó con código {process.returncode}")
+        if not os.path.exists(paths['checkpoint']):
+            raise Exception(f"lstmtraining no escribió {paths['checkpoint']}")
+    except Exception as e:
+        log_error(f"Error en lstmtraining: {str(e)}")
+        save_progress('training', 'lstm_training', {'error': str(e)})
+        return False
+
+    save_progress('training', 'lstm_training_completed')
+    return True
+
+def stage_finish_lstm_model():
+    log_info("Generando pvz.traineddata a partir del checkpoint LSTM")
+    paths = lstm_paths()
+    output_traineddata = os.path.join(output_folder, 'pvz.traineddata')
+    mark_item(0)
+    try:
+        command = lstm_finetune.stop_command(paths['checkpoint'], get_config().lstm_base, output_traineddata)
+        if run_command(command).returncode != 0:
+            raise Exception("Error en lstmtraining --stop_training")
+    except Exception as e:
+        log_error(f"Error al generar el modelo LSTM: {str(e)}")
+        save_progress('training', 'finish_lstm_model', {'error': str(e)})
+        return False
+    log_info(f"Modelo LSTM guardado en {output_traineddata}")
+    save_progress('training', 'lstm_model_finished')
+    return True
+
+def eval_fonts():
+    config = get_config()
+    eval_fonts_folder = config.eval_fonts_folder
+    training_names = {os.path.basename(font) for font in config.fonts}
+    if os.path.isdir(eval_fonts_folder):
+        held_out = [os.path.join(eval_fonts_folder, f) for f in sorted(os.listdir(eval_fonts_folder))
+                    if f.endswith('.ttf') and f not in training_names]
+        if held_out:
+            return held_out
+    log_info(f"No hay fuentes apartadas en {eval_fonts_folder}: se evalúa con las de entrenamiento "
+             f"y solo los tamaños quedan fuera del entrenamiento")
+    return config.fonts
+
+def stage_evaluate_model():
+    log_info("Evaluando el modelo pvz sobre fuentes y tamaños apartados")
+    start_time = time.time()
+
+    def progress(done, total):
+        mark_item(done)
+        save_progress('training', 'evaluate_model', {'progress': done, 'total': total})
+
+    try:
+        report = evaluate_model(eval_fonts(), load_eval_lines(), 'pvz', output_folder, get_config().eval_workers,
+                                output_dir=EVAL_FOLDER, progress=progress, log=log_info)
+        if current_run['history'] is not None:
+            model_path = os.path.join(output_folder, 'pvz.traineddata')
+            current_run['history'].record_evaluation(current_run['run_id'], model_path,
+                                                     file_hash(model_path), report)
+    except Exception as e:
+        log_error(f"Error al evaluar el modelo: {str(e)}")
+        save_progress('training', 'evaluate_model', {'error': str(e)})
+        return False
+
+    elapsed_time = time.time() - start_time
+    cer = f"{report['cer']:.2%}" if report['cer'] is not None else '-'
+    log_info(f"Evaluación completada: CER {cer} en {report['pages']} páginas - "
+             f"{report['ms_per_page']:.1f} ms/página (p95 {report['ms_p95']:.1f}) - "
+             f"Tiempo transcurrido: {timedelta(seconds=int(elapsed_time))}")
+    confusions = ', '.join(f"{e or '∅'}->{r or '∅'} x{n}" for e, r, n in report['confusions'][:10])
+    log_info(f"Confusiones más frecuentes: {confusions or 'ninguna'}")
+    save_progress('training', 'model_evaluated')
+    return True
+
+TRAINING_STAGES = [
+    ('process_unicharset', stage_process_unicharset),
+    ('generate_font_properties', stage_generate_font_properties),
+    ('generate_tr_files', stage_generate_tr_files),
+    ('complete_shapeclustering', stage_complete_shapeclustering),
+    ('run_mftraining', stage_run_mftraining),
+    ('run_cntraining', stage_run_cntraining),
+    ('rename_files', stage_rename_files),
+    ('build_dictionary', stage_build_dictionary),
+    ('combine_training_data', stage_combine_training_data),
+    ('evaluate_model', stage_evaluate_model)
+]
+
+LSTM_TRAINING_STAGES = [
+    ('generate_lstmf', stage_generate_lstmf),
+    ('extract_lstm_model', stage_extract_lstm_model),
+    ('lstm_training', stage_lstm_training),
+    ('finish_lstm_model', stage_finish_lstm_model),
+    ('evaluate_model', stage_evaluate_model)
+]
+
+def training_stages(mode=None):
+    mode = mode or get_config().mode
+    if mode == 'lstm':
+        return LSTM_TRAINING_STAGES
+    if mode == 'legacy':
+        return TRAINING_STAGES
+    raise ValueError(f"Modo de entrenamiento desconocido: {mode}")
+
+def all_stages(mode=None):
+    return [('generate_training_data', generate_training_data)] + training_stages(mode)
+
+def selected_stages(names, mode=None):
+    # Etapas pedidas con --stages, en el orden del pipeline
+    available = all_stages(mode)
+    unknown = set(names) - {stage for stage, _ in available}
+    if unknown:
+        raise ValueError(f"Etapas desconocidas: {', '.join(sorted(unknown))} "
+                         f"(disponibles: {', '.join(stage for stage, _ in available)})")
+    return [(stage, function) for stage, function in available if stage in names]
+
+def resume_training(substage):
+    stages = [stage for stage, _ in training_stages()]
+    stage_functions = dict(training_stages())
+
     start_index = stages.index(substage) if substage in stages else 0
 
     for stage in stages[start_index:]:
         log_info(f"Ejecutando etapa: {stage}")
         try:
-            if not stage_functions[stage]():
+            if not run_stage(stage, stage_functions[stage]):
                 raise Exception(f"Fallo en la etapa: {stage}")
         except Exception as e:
             log_error(f"Error en la etapa {stage}: {str(e)}")
@@ -559,7 +899,115 @@ def resume_training(substage):
     log_info("Proceso de entrenamiento completado con éxito")
     return True
 
-def main():
+def count_lines(path):
+    if not os.path.exists(path):
+        return None
+    with open(path, 'rb') as f:
+        return sum(1 for _ in f)
+
+def start_run_history(progress):
+    history = RunHistory()
+    training_config = get_config()
+    config = {
+        'fonts': [os.path.basename(font) for font in training_config.fonts],
+        'fonts_folder': training_config.fonts_dir,
+        'output_folder': output_folder,
+        'resume_from': progress.get('substage') or progress.get('last_completed_stage'),
+        'mode': training_config.mode,
+        'stages': training_config.stages,
+        'workers': {name: getattr(training_config, name)
+                    for name in ('render_workers', 'eval_workers', 'lstmf_workers')},
+        'augment': training_config.augmentation.to_dict(),
+        'profile': {stage: sorted(modes) for stage, modes in stage_profiler.profile_stages.items()}
+    }
+    current_run['history'] = history
+    current_run['run_id'] = history.start_run(config, count_lines('training_text.txt'))
+    log_info(f"Ejecución registrada en el historial con id {current_run['run_id']}")
+
+def finish_run_history(status):
+    history = current_run['history']
+    if history is not None:
+        history.finish_run(current_run['run_id'], status)
+        history.close()
+        current_run['history'] = current_run['run_id'] = None
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Entrenamiento de Tesseract para PvZ")
+    parser.add_argument('--stages', help="Etapas a ejecutar, separadas por comas (por defecto se reanuda "
+                                         "desde progress.json)")
+    parser.add_argument('--config', help="JSON con campos de TrainingConfig (training_config.py)")
+    parser.add_argument('--workers', type=int, help="Procesos de renderizado, evaluación y lstm.train")
+    parser.add_argument('--profile', help="Etapas a perfilar, con el formato de PVZ_PROFILE")
+    parser.add_argument('--mode', choices=TRAINING_MODES, help="Modo de entrenamiento")
+    parser.add_argument('--dry-run', action='store_true', help="Mostrar la configuración y las etapas sin ejecutar nada")
+    return parser.parse_args(argv)
+
+def build_config(args):
+    config = TrainingConfig.from_env()
+    if args.config:
+        config = config.load(args.config)
+    overrides = {}
+    if args.workers is not None:
+        overrides.update(render_workers=args.workers, eval_workers=args.workers, lstmf_workers=args.workers)
+    if args.mode:
+        overrides['mode'] = args.mode
+    if args.profile is not None:
+        overrides['profile'] = args.profile
+    if args.stages:
+        overrides['stages'] = args.stages
+    return config.replace(**overrides)
+
+def print_plan(config, stages):
+    for name, value in config.to_dict().items():
+        print(f"{name:<24}{value}")
+    print(f"{'fuentes encontradas':<24}{len(config.fonts)}")
+    print(f"{'aumentado':<24}{config.augmentation.to_dict()}")
+    if stages is None:
+        progress = load_progress()
+        print(f"Se reanuda desde {progress.get('substage') or progress.get('last_completed_stage')}; etapas: "
+              f"{', '.join(stage for stage, _ in all_stages(config.mode))}")
+    else:
+        print(f"Etapas: {', '.join(stage for stage, _ in stages)}")
+
+def main(argv=None):
+    args = parse_args(argv)
+    try:
+        config = set_config(build_config(args))
+        if config.profile is not None:
+            configure_profiling(config.profile)
+        stages = selected_stages(config.stages, config.mode) if config.stages else None
+    except (OSError, ValueError) as e:
+        print(f"Configuración no válida: {e}")
+        return 2
+
+    if args.dry_run:
+        print_plan(config, stages)
+        return 0
+
+    setup_logging()
+    os.makedirs(output_folder, exist_ok=True)
+    start_sampler(logs_folder)
+    start_run_history(load_progress())
+    status = 'failed'
+    try:
+        result = run_selected(stages) if stages is not None else run_training()
+        if result is not False:
+            status = 'completed'
+    finally:
+        stop_sampler()
+        finish_run_history(status)
+    return 0 if status == 'completed' else 1
+
+def run_selected(stages):
+    # --stages ejecuta solo esas etapas, sin consultar progress.json para elegir dónde empezar
+    for stage, stage_function in stages:
+        log_info(f"Ejecutando etapa: {stage}")
+        if run_stage(stage, stage_function) is False:
+            log_error(f"Fallo en la etapa: {stage}")
+            return False
+    return True
+
+def run_training():
     progress = load_progress()
     current_stage = progress['last_completed_stage']
     current_substage = progress['substage']
@@ -570,15 +1018,27 @@ def main():
 
     if current_stage in ['start', 'data_generated']:
         if current_stage == 'start':
+            # Importación diferida: cost_estimator importa este módulo
+            from cost_estimator import estimate_run, log_plan, check_plan
+            log_info("Estimando coste de la ejecución")
+            try:
+                plan = estimate_run()
+            except ValueError as e:
+                log_error(f"No se puede estimar la ejecución: {e}")
+                return False
+            log_plan(plan)
+            if not check_plan(plan):
+                return False
             log_info("Iniciando generación de datos de entrenamiento")
-            generate_training_data()
+            if run_stage('generate_training_data', generate_training_data) is False:
+                return False
             save_progress('data_generated')
-        log_info("Iniciando proceso de entrenamiento de Tesseract")
-        resume_training('process_unicharset')
+        log_info(f"Iniciando proceso de entrenamiento de Tesseract (modo {get_config().mode})")
+        return resume_training(training_stages()[0][0])
     else:
         log_info(f"Reanudando entrenamiento desde la sub-etapa: {current_substage}")
-        resume_training(current_substage)
+        return resume_training(current_substage)
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
 
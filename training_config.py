@@ -0,0 +1,170 @@
+import os
+import json
+import dataclasses
+from dataclasses import dataclass, fields
+from functools import cached_property
+from typing import List, Optional
+
+from augmentation import load_config as load_augment_config
+
+# Configuración del pipeline de entrenamiento (train_tesseract_pvz.py). Se construye en el
+# primer uso y no al importar: los procesos de renderizado, evaluación y los scripts que
+# importan el pipeline (cost_estimator.py, benchmarks) no listan fuentes, no crean carpetas
+# ni abren logs. La lista de fuentes y el aumentado se cargan la primera vez que se piden.
+#
+# Prioridad: valores por defecto < variables de entorno < --config archivo.json < opciones
+# de la línea de comandos. El JSON usa los nombres de los campos de TrainingConfig:
+#
+#   {"fonts_dir": "Fuentes", "mode": "lstm", "render_workers": 8, "stages": ["generate_lstmf"]}
+#
+# PVZ_WORKERS fija a la vez los procesos de renderizado, evaluación y lstm.train; las
+# variables específicas (PVZ_RENDER_WORKERS...) tienen prioridad sobre ella.
+
+TRAINING_MODES = ('legacy', 'lstm')
+ENV_VARS = {
+    'fonts_dir': 'PVZ_FONTS_DIR',
+    'eval_fonts_dir': 'PVZ_EVAL_FONTS_DIR',
+    'tesseract_dir': 'PVZ_TESSERACT_DIR',
+    'mode': 'PVZ_TRAINING_MODE',
+    'render_workers': 'PVZ_RENDER_WORKERS',
+    'eval_workers': 'PVZ_EVAL_WORKERS',
+    'lstmf_workers': 'PVZ_LSTMF_WORKERS',
+    'lstm_base_model': 'PVZ_LSTM_BASE',
+    'lstm_max_iterations': 'PVZ_LSTM_MAX_ITERATIONS',
+    'augment': 'PVZ_AUGMENT',
+    'augment_config': 'PVZ_AUGMENT_CONFIG',
+    'augment_seed': 'PVZ_AUGMENT_SEED',
+    'profile': 'PVZ_PROFILE',
+    'queue': 'PVZ_QUEUE',
+    'queue_workers': 'PVZ_QUEUE_WORKERS'
+}
+WORKERS_ENV = 'PVZ_WORKERS'
+WORKER_FIELDS = ('render_workers', 'eval_workers', 'lstmf_workers')
+
+
+def cpu_count():
+    return os.cpu_count() or 2
+
+
+@dataclass
+class TrainingConfig:
+    fonts_dir: str = r'C:\Users\talol\Desktop\Proyecto Traduccion Tiempo Real\Fuentes'
+    # Fuentes apartadas para evaluar el modelo; por defecto <fonts_dir>/evaluacion
+    eval_fonts_dir: Optional[str] = None
+    tesseract_dir: str = r'C:\Program Files\Tesseract-OCR'
+    mode: str = 'legacy'
+    render_workers: int = dataclasses.field(default_factory=cpu_count)
+    eval_workers: int = dataclasses.field(default_factory=lambda: max(1, cpu_count() // 2))
+    lstmf_workers: int = dataclasses.field(default_factory=cpu_count)
+    # Modelo base del ajuste fino LSTM; por defecto chi_sim de la instalación de Tesseract
+    lstm_base_model: Optional[str] = None
+    lstm_max_iterations: int = 10000
+    lstm_target_error_rate: float = 0.01
+    augment: bool = True
+    augment_config: Optional[str] = None
+    augment_seed: int = 0
+    # Especificación de perfilado (formato de PVZ_PROFILE); None deja la del entorno
+    profile: Optional[str] = None
+    # Etapas a ejecutar; None reanuda desde progress.json
+    stages: Optional[List[str]] = None
+    # Cola compartida (work_queue.py: archivo SQLite o URL) para renderizado y .tr; None = local
+    queue: Optional[str] = None
+    # Trabajadores de la cola en esta máquina; None = render_workers
+    queue_workers: Optional[int] = None
+
+    @classmethod
+    def from_env(cls, environ=None):
+        environ = os.environ if environ is None else environ
+        values = {}
+        if environ.get(WORKERS_ENV):
+            values.update({name: environ[WORKERS_ENV] for name in WORKER_FIELDS})
+        for name, variable in ENV_VARS.items():
+            if environ.get(variable):
+                values[name] = environ[variable]
+        return cls().replace(**values)
+
+    def load(self, path):
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if not isinstance(data, dict):
+            raise ValueError(f"{path} debe contener un objeto JSON")
+        return self.replace(**data)
+
+    def replace(self, **values):
+        # Convierte cada valor al tipo del campo (las variables de entorno llegan como texto) y valida
+        types = {f.name: f.type for f in fields(self)}
+        unknown = set(values) - set(types)
+        if unknown:
+            raise ValueError(f"Campos de configuración desconocidos: {', '.join(sorted(unknown))}")
+        converted = {name: convert(value, types[name]) for name, value in values.items()}
+        config = dataclasses.replace(self, **converted)
+        config.validate()
+        return config
+
+    def validate(self):
+        if self.mode not in TRAINING_MODES:
+            raise ValueError(f"Modo de entrenamiento desconocido: {self.mode} (válidos: {', '.join(TRAINING_MODES)})")
+        for name in WORKER_FIELDS:
+            if getattr(self, name) < 1:
+                raise ValueError(f"{name} debe ser al menos 1")
+        if self.queue_workers is not None and self.queue_workers < 0:
+            raise ValueError("queue_workers no puede ser negativo")
+
+    @property
+    def eval_fonts_folder(self):
+        return self.eval_fonts_dir or os.path.join(self.fonts_dir, 'evaluacion')
+
+    @property
+    def local_queue_workers(self):
+        return self.render_workers if self.queue_workers is None else self.queue_workers
+
+    @property
+    def lstm_base(self):
+        return self.lstm_base_model or os.path.join(self.tesseract_dir, 'tessdata', 'chi_sim.traineddata')
+
+    @cached_property
+    def fonts(self):
+        if not os.path.isdir(self.fonts_dir):
+            return []
+        return [os.path.join(self.fonts_dir, f) for f in sorted(os.listdir(self.fonts_dir)) if f.endswith('.ttf')]
+
+    @cached_property
+    def augmentation(self):
+        return load_augment_config(self.augment_config, enabled=self.augment, seed=self.augment_seed)
+
+    def to_dict(self):
+        return {f.name: getattr(self, f.name) for f in fields(self)}
+
+
+def convert(value, field_type):
+    if value is None:
+        return None
+    if field_type in (bool, 'bool'):
+        if isinstance(value, str):
+            return value.strip().lower() not in ('0', 'false', 'no', 'off', '')
+        return bool(value)
+    if field_type in (int, 'int', Optional[int]):
+        return int(value)
+    if field_type in (float, 'float'):
+        return float(value)
+    if field_type == Optional[List[str]]:
+        if isinstance(value, str):
+            return [stage.strip() for stage in value.split(',') if stage.strip()]
+        return list(value)
+    return str(value)
+
+
+_config = None
+
+
+def get_config():
+    global _config
+    if _config is None:
+        _config = TrainingConfig.from_env()
+    return _config
+
+
+def set_config(config):
+    global _config
+    _config = config
+    return config
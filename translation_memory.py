@@ -0,0 +1,186 @@
+import re
+import sys
+import time
+import unicodedata
+from collections import Counter, OrderedDict
+import numpy as np
+
+# Memoria de traducción con búsqueda aproximada para texto de OCR con ruido.
+#
+# El glosario (TSV: origen<TAB>traducción, '#' para comentarios) se normaliza y se indexa
+# por bigramas de caracteres en un índice invertido con listas de enteros. Una consulta:
+#   1. busca la línea normalizada exacta (dict)
+#   2. si no está, cuenta bigramas compartidos para obtener candidatos y descarta los que
+#      no pueden estar a distancia <= k (filtro de longitud y de número de bigramas). Los
+#      bigramas se cuentan como multiconjunto: en "哈哈哈哈" el bigrama 哈哈 cuenta tres veces
+#   3. verifica los candidatos con Levenshtein acotado (corta en cuanto supera k)
+# Los resultados se memorizan por línea de entrada en una LRU.
+
+GRAM_SIZE = 2
+PAD = '\x00'
+CJK_CHARS = '\u3000-\u303f\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uff00-\uffef'
+_cjk_spaces = re.compile(f'(?<=[{CJK_CHARS}])\\s+|\\s+(?=[{CJK_CHARS}])')
+_spaces = re.compile(r'\s+')
+_edge_punctuation = re.compile(r'^[\W_]+|[\W_]+$')
+
+
+def join_cjk(text):
+    # Tesseract suele separar los ideogramas con espacios que no existen en el original
+    return _cjk_spaces.sub('', text.strip())
+
+
+def normalize(text):
+    text = join_cjk(unicodedata.normalize('NFKC', text).casefold())
+    text = _spaces.sub(' ', text)
+    return _edge_punctuation.sub('', text)
+
+
+def grams(text):
+    padded = f"{PAD}{text}{PAD}"
+    return Counter(padded[i:i + GRAM_SIZE] for i in range(len(padded) - GRAM_SIZE + 1))
+
+
+def bounded_levenshtein(a, b, limit):
+    # Distancia de edición con corte: devuelve limit + 1 en cuanto no puede bajar de limit
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    if len(a) > len(b):
+        a, b = b, a
+    previous = list(range(len(a) + 1))
+    for j, char_b in enumerate(b, 1):
+        current = [j]
+        row_min = j
+        for i, char_a in enumerate(a, 1):
+            cost = min(previous[i] + 1, current[i - 1] + 1, previous[i - 1] + (char_a != char_b))
+            current.append(cost)
+            row_min = min(row_min, cost)
+        if row_min > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+class TranslationMemory:
+    def __init__(self, entries=(), max_distance=2, max_ratio=0.3, memo_size=4096):
+        self.max_distance = max_distance
+        self.max_ratio = max_ratio
+        self.memo_size = memo_size
+        self.sources = []
+        self.targets = []
+        self._exact = {}
+        self._memo = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        for source, target in entries:
+            self.add(source, target)
+        self._build_index()
+
+    @classmethod
+    def load(cls, path, **kwargs):
+        entries = []
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.rstrip('\n')
+                if not line.strip() or line.startswith('#'):
+                    continue
+                source, sep, target = line.partition('\t')
+                if sep and target.strip():
+                    entries.append((source, target.strip()))
+        return cls(entries, **kwargs)
+
+    def add(self, source, target):
+        key = normalize(source)
+        if not key or key in self._exact:
+            return
+        self._exact[key] = len(self.sources)
+        self.sources.append(key)
+        self.targets.append(target)
+
+    def _build_index(self):
+        postings = {}
+        for entry_id, source in enumerate(self.sources):
+            for gram, count in grams(source).items():
+                postings.setdefault(gram, []).append((entry_id, count))
+        # Listas de enteros compactas (entrada, repeticiones del bigrama): el índice ocupa poco
+        # aunque el glosario sea grande
+        self._postings = {gram: tuple(np.array(column, dtype=np.int32) for column in zip(*items))
+                          for gram, items in postings.items()}
+        self._lengths = np.array([len(source) for source in self.sources], dtype=np.int32)
+        self._memo.clear()
+
+    def __len__(self):
+        return len(self.sources)
+
+    def distance_limit(self, text):
+        return min(self.max_distance, int(len(text) * self.max_ratio))
+
+    def lookup(self, text):
+        # Devuelve (traducción, distancia) o None
+        key = normalize(text)
+        if not key:
+            return None
+        entry_id = self._exact.get(key)
+        if entry_id is not None:
+            return self.targets[entry_id], 0
+
+        limit = self.distance_limit(key)
+        if limit == 0:
+            return None
+        found = [(self._postings[gram], count) for gram, count in grams(key).items() if gram in self._postings]
+        if not found:
+            return None
+        # Bigramas compartidos como multiconjunto: min(repeticiones en la consulta, en la entrada)
+        ids = np.concatenate([entry_ids for (entry_ids, _), _ in found])
+        common = np.concatenate([np.minimum(counts, count) for (_, counts), count in found])
+        candidates, inverse = np.unique(ids, return_inverse=True)
+        shared = np.bincount(inverse, weights=common).astype(np.int64)
+
+        # Cada edición destruye como mucho GRAM_SIZE bigramas de la cadena más larga
+        lengths = self._lengths[candidates]
+        longest = np.maximum(lengths, len(key))
+        keep = (np.abs(lengths - len(key)) <= limit) & (shared >= longest + 1 - GRAM_SIZE * limit)
+        best = None
+        # Primero los que más bigramas comparten: suelen ser los más cercanos
+        for index in np.argsort(-shared[keep], kind='stable'):
+            entry_id = int(candidates[keep][index])
+            bound = limit if best is None else best[1] - 1
+            if bound < 0:
+                break
+            distance = bounded_levenshtein(key, self.sources[entry_id], bound)
+            if distance <= bound:
+                best = (self.targets[entry_id], distance)
+        return best
+
+    def translate(self, text):
+        memo = self._memo
+        if text in memo:
+            memo.move_to_end(text)
+            self.hits += 1
+            return memo[text]
+        self.misses += 1
+        match = self.lookup(text)
+        result = match[0] if match else text
+        memo[text] = result
+        while len(memo) > self.memo_size:
+            memo.popitem(last=False)
+        return result
+
+
+def main():
+    if len(sys.argv) < 2:
+        print("Uso: python translation_memory.py <glosario.tsv> [texto ...]")
+        return 1
+    start = time.perf_counter()
+    memory = TranslationMemory.load(sys.argv[1])
+    print(f"{len(memory)} entradas indexadas en {time.perf_counter() - start:.3f}s")
+    for text in sys.argv[2:]:
+        start = time.perf_counter()
+        match = memory.lookup(text)
+        elapsed = (time.perf_counter() - start) * 1000
+        print(f"{text!r} -> {match[0]!r} (distancia {match[1]})" if match else f"{text!r} -> sin coincidencia",
+              f"[{elapsed:.3f} ms]")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,520 @@
+import os
+import sys
+import json
+import time
+import shutil
+import socket
+import sqlite3
+import hashlib
+import argparse
+import threading
+import subprocess
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Cola de trabajo para repartir el renderizado (generate_training_data) y los .tr
+# (generate_tr_files) entre varias máquinas. La cola es un único archivo SQLite en
+# almacenamiento compartido, o un servidor HTTP mínimo delante de ese archivo cuando el
+# recurso compartido no bloquea bien los archivos (SMB) o los relojes de las máquinas no
+# coinciden: con el servidor todas las concesiones usan su reloj.
+#
+# Cada tarea se reclama con una concesión (lease) de LEASE_SECONDS que el trabajador renueva
+# con latidos (heartbeat). Si el trabajador muere, la concesión caduca y otro la reclama;
+# cada reclamación cuenta como intento y tras MAX_ATTEMPTS la tarea queda como fallida.
+# Los trabajadores escriben en un directorio temporal y mueven el resultado a la estructura
+# normal de tesseract_output (pNNNN.png/.box por fuente y tamaño, .tr junto a cada página):
+# las etapas siguientes no saben si la etapa se hizo en local o en la cola.
+#
+# Los trabajos llevan una huella de sus entradas (corpus, aumentado, fuentes, páginas): al
+# reanudar, las tareas ya terminadas de la misma huella no se repiten.
+#
+#   PVZ_QUEUE=//nas/pvz/cola.db python train_tesseract_pvz.py         coordinador (+ trabajadores locales)
+#   python work_queue.py worker --queue //nas/pvz/cola.db --output //nas/pvz/tesseract_output
+#   python work_queue.py serve --db cola.db --host 0.0.0.0 --port 8765
+#   python work_queue.py worker --queue http://servidor:8765 --output ...
+#   python work_queue.py status --queue //nas/pvz/cola.db
+#   python work_queue.py retry --queue //nas/pvz/cola.db --job generate_training_data:1f2e...
+
+LEASE_SECONDS = 300
+HEARTBEAT_SECONDS = 60
+MAX_ATTEMPTS = 3
+RETRY_DELAY = 10
+POLL_SECONDS = 2.0
+TASK_KINDS = ('render', 'box_train')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    job TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    task_key TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    available_at REAL NOT NULL,
+    worker TEXT,
+    lease_until REAL,
+    created_at REAL NOT NULL,
+    finished_at REAL,
+    error TEXT,
+    result TEXT,
+    UNIQUE (job, task_key)
+);
+CREATE INDEX IF NOT EXISTS tasks_claim ON tasks(status, kind, available_at);
+CREATE INDEX IF NOT EXISTS tasks_job ON tasks(job, status);
+"""
+
+
+class WorkQueue:
+    def __init__(self, db_path):
+        self.db_path = db_path
+        # Sin WAL: no funciona en sistemas de archivos de red. Las escrituras van en
+        # transacciones BEGIN IMMEDIATE cortas y los demás esperan con busy_timeout
+        self.conn = sqlite3.connect(db_path, timeout=60, isolation_level=None, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.lock = threading.Lock()
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def _write(self, function):
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = function(self.conn)
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+            self.conn.execute("COMMIT")
+            return result
+
+    def enqueue(self, job, kind, tasks, max_attempts=MAX_ATTEMPTS):
+        # tasks: [(clave, payload)]; las claves ya presentes en el trabajo se ignoran
+        now = time.time()
+        rows = [(job, kind, key, json.dumps(payload), 'pending', max_attempts, now, now) for key, payload in tasks]
+
+        def insert(conn):
+            before = conn.total_changes
+            conn.executemany(
+                "INSERT OR IGNORE INTO tasks (job, kind, task_key, payload, status, max_attempts, available_at, "
+                "created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            return conn.total_changes - before
+        return self._write(insert)
+
+    def claim(self, worker, kinds=TASK_KINDS, lease=LEASE_SECONDS):
+        # Una tarea pendiente, o en curso con la concesión caducada (su trabajador murió)
+        now = time.time()
+        placeholders = ','.join('?' * len(kinds))
+
+        def take(conn):
+            self._expire(conn, now)
+            row = conn.execute(
+                f"SELECT * FROM tasks WHERE status = 'pending' AND available_at <= ? AND kind IN ({placeholders}) "
+                "ORDER BY id LIMIT 1", (now, *kinds)).fetchone()
+            if row is None:
+                return None
+            conn.execute("UPDATE tasks SET status = 'leased', worker = ?, lease_until = ?, attempts = attempts + 1 "
+                         "WHERE id = ?", (worker, now + lease, row['id']))
+            task = dict(row)
+            task['payload'] = json.loads(task['payload'])
+            task['attempts'] += 1
+            return task
+        return self._write(take)
+
+    def _expire(self, conn, now):
+        conn.execute("UPDATE tasks SET status = 'failed', finished_at = ?, error = 'concesión caducada' "
+                     "WHERE status = 'leased' AND lease_until < ? AND attempts >= max_attempts", (now, now))
+        conn.execute("UPDATE tasks SET status = 'pending', worker = NULL, lease_until = NULL "
+                     "WHERE status = 'leased' AND lease_until < ?", (now,))
+
+    def heartbeat(self, task_id, worker, lease=LEASE_SECONDS):
+        # False si la concesión ya no es de este trabajador (caducó y otro la reclamó)
+        def renew(conn):
+            return conn.execute("UPDATE tasks SET lease_until = ? WHERE id = ? AND worker = ? AND status = 'leased'",
+                                (time.time() + lease, task_id, worker)).rowcount == 1
+        return self._write(renew)
+
+    def complete(self, task_id, worker, result=None):
+        def finish(conn):
+            return conn.execute("UPDATE tasks SET status = 'done', finished_at = ?, result = ?, error = NULL "
+                                "WHERE id = ? AND worker = ? AND status = 'leased'",
+                                (time.time(), json.dumps(result), task_id, worker)).rowcount == 1
+        return self._write(finish)
+
+    def fail(self, task_id, worker, error):
+        # Vuelve a pendiente con espera creciente, o queda fallida tras max_attempts intentos
+        now = time.time()
+
+        def record(conn):
+            row = conn.execute("SELECT attempts, max_attempts FROM tasks WHERE id = ? AND worker = ? "
+                               "AND status = 'leased'", (task_id, worker)).fetchone()
+            if row is None:
+                return False
+            if row['attempts'] >= row['max_attempts']:
+                conn.execute("UPDATE tasks SET status = 'failed', finished_at = ?, error = ? WHERE id = ?",
+                             (now, error, task_id))
+            else:
+                conn.execute("UPDATE tasks SET status = 'pending', worker = NULL, lease_until = NULL, error = ?, "
+                             "available_at = ? WHERE id = ?", (error, now + RETRY_DELAY * row['attempts'], task_id))
+            return True
+        return self._write(record)
+
+    def retry_failed(self, job):
+        def reset(conn):
+            return conn.execute("UPDATE tasks SET status = 'pending', attempts = 0, available_at = ?, worker = NULL, "
+                                "finished_at = NULL WHERE job = ? AND status = 'failed'", (time.time(), job)).rowcount
+        return self._write(reset)
+
+    def job_status(self, job):
+        self._write(lambda conn: self._expire(conn, time.time()))
+        with self.lock:
+            rows = self.conn.execute("SELECT status, COUNT(*) AS n FROM tasks WHERE job = ? GROUP BY status",
+                                     (job,)).fetchall()
+        return {row['status']: row['n'] for row in rows}
+
+    def failures(self, job, limit=20):
+        with self.lock:
+            rows = self.conn.execute("SELECT task_key, attempts, error FROM tasks WHERE job = ? AND status = 'failed' "
+                                     "ORDER BY id LIMIT ?", (job, limit)).fetchall()
+        return [dict(row) for row in rows]
+
+    def has_open(self, kinds=TASK_KINDS):
+        placeholders = ','.join('?' * len(kinds))
+        with self.lock:
+            row = self.conn.execute(f"SELECT COUNT(*) FROM tasks WHERE status IN ('pending', 'leased') "
+                                    f"AND kind IN ({placeholders})", tuple(kinds)).fetchone()
+        return row[0] > 0
+
+    def jobs(self):
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT job, kind, status, COUNT(*) AS n, MAX(finished_at) AS last FROM tasks "
+                "GROUP BY job, kind, status ORDER BY MIN(id)").fetchall()
+        return [dict(row) for row in rows]
+
+
+# Servidor sustituto: la misma interfaz que WorkQueue por HTTP/JSON (RemoteQueue), con un
+# solo proceso dueño del archivo SQLite
+REMOTE_METHODS = ('enqueue', 'claim', 'heartbeat', 'complete', 'fail', 'retry_failed', 'job_status',
+                  'failures', 'has_open', 'jobs')
+
+
+class RemoteQueue:
+    def __init__(self, url):
+        self.url = url.rstrip('/')
+
+    def close(self):
+        pass
+
+    def _call(self, method, **kwargs):
+        request = urllib.request.Request(f"{self.url}/{method}", data=json.dumps(kwargs).encode('utf-8'),
+                                         headers={'Content-Type': 'application/json'})
+        with urllib.request.urlopen(request, timeout=60) as response:
+            return json.loads(response.read().decode('utf-8'))['result']
+
+    def enqueue(self, job, kind, tasks, max_attempts=MAX_ATTEMPTS):
+        return self._call('enqueue', job=job, kind=kind, tasks=tasks, max_attempts=max_attempts)
+
+    def claim(self, worker, kinds=TASK_KINDS, lease=LEASE_SECONDS):
+        return self._call('claim', worker=worker, kinds=list(kinds), lease=lease)
+
+    def heartbeat(self, task_id, worker, lease=LEASE_SECONDS):
+        return self._call('heartbeat', task_id=task_id, worker=worker, lease=lease)
+
+    def complete(self, task_id, worker, result=None):
+        return self._call('complete', task_id=task_id, worker=worker, result=result)
+
+    def fail(self, task_id, worker, error):
+        return self._call('fail', task_id=task_id, worker=worker, error=error)
+
+    def retry_failed(self, job):
+        return self._call('retry_failed', job=job)
+
+    def job_status(self, job):
+        return self._call('job_status', job=job)
+
+    def failures(self, job, limit=20):
+        return self._call('failures', job=job, limit=limit)
+
+    def has_open(self, kinds=TASK_KINDS):
+        return self._call('has_open', kinds=list(kinds))
+
+    def jobs(self):
+        return self._call('jobs')
+
+
+def serve(db_path, host, port):
+    queue = WorkQueue(db_path)
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            method = self.path.strip('/')
+            if method not in REMOTE_METHODS:
+                self.send_error(404)
+                return
+            length = int(self.headers.get('Content-Length', 0))
+            try:
+                kwargs = json.loads(self.rfile.read(length) or b'{}')
+                body = json.dumps({'result': getattr(queue, method)(**kwargs)}).encode('utf-8')
+            except (TypeError, ValueError, sqlite3.Error) as e:
+                self.send_error(400, str(e))
+                return
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    print(f"Cola {db_path} servida en http://{host}:{port}")
+    try:
+        server.serve_forever()
+    finally:
+        queue.close()
+
+
+def open_queue(location):
+    return RemoteQueue(location) if location.startswith(('http://', 'https://')) else WorkQueue(location)
+
+
+def job_name(stage, payloads, extra=None):
+    # Huella de las entradas del trabajo: si cambian, es un trabajo nuevo
+    digest = hashlib.blake2b(digest_size=8)
+    digest.update(json.dumps([payloads, extra], sort_keys=True).encode('utf-8'))
+    return f"{stage}:{digest.hexdigest()}"
+
+
+def worker_id():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+# Ejecución de tareas en el trabajador
+
+def merge_outputs(staging_dir, dest_dir):
+    # Mueve los archivos de staging a su sitio definitivo; cada archivo aparece completo o no aparece
+    os.makedirs(dest_dir, exist_ok=True)
+    moved = []
+    for name in sorted(os.listdir(staging_dir)):
+        source, target = os.path.join(staging_dir, name), os.path.join(dest_dir, name)
+        try:
+            os.replace(source, target)
+        except OSError:
+            # Otro sistema de archivos (--scratch local): copia con nombre temporal y renombrado
+            temp = os.path.join(dest_dir, f".{name}.tmp")
+            shutil.copyfile(source, temp)
+            os.replace(temp, target)
+            os.remove(source)
+        moved.append(name)
+    os.rmdir(staging_dir)
+    return moved
+
+
+def staging_dir(dest_dir, scratch, task):
+    root = scratch or dest_dir
+    path = os.path.join(root, f".cola-{task['id']}-{os.getpid()}")
+    shutil.rmtree(path, ignore_errors=True)
+    os.makedirs(path)
+    return path
+
+
+_render_state = {'key': None}
+
+
+def run_render(task, output_root, fonts_dir, scratch):
+    # Importación diferida: el trabajador de .tr no necesita PIL ni el corpus
+    from augmentation import AugmentConfig
+    from page_renderer import init_render_worker, render_block
+    payload = task['payload']
+    font_path = os.path.join(fonts_dir, payload['font'])
+    if not os.path.exists(font_path):
+        raise FileNotFoundError(f"No existe la fuente {font_path} en este equipo (--fonts-dir)")
+    corpus_path = os.path.join(output_root, payload['corpus'])
+    key = (corpus_path, json.dumps(payload['augment'], sort_keys=True))
+    if _render_state['key'] != key:
+        init_render_worker(corpus_path, AugmentConfig.from_dict(payload['augment']))
+        _render_state['key'] = key
+
+    dest_dir = os.path.join(output_root, payload['subdir'])
+    staging = staging_dir(dest_dir, scratch, task)
+    try:
+        pages = render_block((font_path, payload['size'], staging, payload['first'], payload['last']))
+    except Exception:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+    merge_outputs(staging, dest_dir)
+    return {'pages': pages}
+
+
+def run_box_train(task, output_root, fonts_dir, scratch):
+    pages = task['payload']['pages']
+    for base in pages:
+        image_path = os.path.join(output_root, f"{base}.png")
+        dest_dir = os.path.dirname(image_path)
+        staging = staging_dir(dest_dir, scratch, task)
+        command = ['tesseract.exe', image_path, os.path.join(staging, os.path.basename(base)), 'nobatch', 'box.train']
+        result = subprocess.run(command, capture_output=True, text=True, encoding='utf-8', errors='replace')
+        if result.returncode != 0:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise RuntimeError(f"box.train falló para {base} (código {result.returncode}): {result.stderr.strip()[-500:]}")
+        merge_outputs(staging, dest_dir)
+    return {'pages': len(pages)}
+
+
+TASK_RUNNERS = {'render': run_render, 'box_train': run_box_train}
+
+
+class Heartbeat(threading.Thread):
+    def __init__(self, queue, task_id, worker, lease, interval):
+        super().__init__(daemon=True)
+        self.queue, self.task_id, self.worker = queue, task_id, worker
+        self.lease, self.interval = lease, interval
+        self.stopped = threading.Event()
+        self.lost = False
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            try:
+                if not self.queue.heartbeat(self.task_id, self.worker, self.lease):
+                    self.lost = True
+                    return
+            except (OSError, sqlite3.Error):
+                # Un latido perdido no es grave: la concesión aguanta varios intervalos
+                continue
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+        self.queue.close()
+
+
+def run_worker(location, output_root, fonts_dir, kinds=TASK_KINDS, scratch=None, lease=LEASE_SECONDS,
+               heartbeat=HEARTBEAT_SECONDS, exit_when_empty=False, max_tasks=None, log=print):
+    queue = open_queue(location)
+    worker = worker_id()
+    done = 0
+    try:
+        while max_tasks is None or done < max_tasks:
+            task = queue.claim(worker, list(kinds), lease)
+            if task is None:
+                if exit_when_empty and not queue.has_open(list(kinds)):
+                    break
+                time.sleep(POLL_SECONDS)
+                continue
+
+            beat = Heartbeat(open_queue(location), task['id'], worker, lease, heartbeat)
+            beat.start()
+            start = time.perf_counter()
+            try:
+                result = TASK_RUNNERS[task['kind']](task, output_root, fonts_dir, scratch)
+            except Exception as e:
+                beat.stop()
+                queue.fail(task['id'], worker, f"{type(e).__name__}: {e}")
+                log(f"[{worker}] tarea {task['id']} ({task['kind']}) falló en el intento {task['attempts']}: {e}")
+                continue
+            beat.stop()
+            if beat.lost or not queue.complete(task['id'], worker, result):
+                # Otro trabajador la reclamó: sus salidas son idénticas (render determinista)
+                log(f"[{worker}] tarea {task['id']} terminada tras perder la concesión")
+            done += 1
+            log(f"[{worker}] tarea {task['id']} ({task['kind']}) en {time.perf_counter() - start:.1f}s")
+    finally:
+        queue.close()
+    return done
+
+
+def spawn_local_workers(location, count, output_root, fonts_dir, kinds):
+    # Trabajadores en esta máquina mientras el coordinador espera; terminan cuando la cola se vacía
+    command = [sys.executable, os.path.abspath(__file__), 'worker', '--queue', location, '--output', output_root,
+               '--fonts-dir', fonts_dir, '--kinds', ','.join(kinds), '--exit-when-empty', '--quiet']
+    return [subprocess.Popen(command) for _ in range(count)]
+
+
+def wait_for_job(queue, job, total, progress=None, poll=POLL_SECONDS):
+    # Espera a que no queden tareas pendientes ni en curso; devuelve el recuento por estado.
+    # Si no hay trabajadores vivos se sigue esperando: pueden unirse desde otras máquinas
+    reported = -1
+    while True:
+        status = queue.job_status(job)
+        finished = status.get('done', 0) + status.get('failed', 0)
+        if progress is not None and finished != reported:
+            progress(status.get('done', 0), total)
+            reported = finished
+        if not status.get('pending') and not status.get('leased'):
+            return status
+        time.sleep(poll)
+
+
+def print_jobs(queue):
+    jobs = {}
+    for row in queue.jobs():
+        jobs.setdefault((row['job'], row['kind']), {})[row['status']] = row['n']
+    if not jobs:
+        print("La cola está vacía")
+        return
+    print(f"{'Trabajo':<44}{'Tipo':<11}{'Pend.':>7}{'Curso':>7}{'Hechas':>8}{'Fallidas':>10}")
+    for (job, kind), counts in jobs.items():
+        print(f"{job:<44}{kind:<11}{counts.get('pending', 0):>7}{counts.get('leased', 0):>7}"
+              f"{counts.get('done', 0):>8}{counts.get('failed', 0):>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cola de trabajo compartida para renderizado y box.train")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    worker = subparsers.add_parser('worker', help="Reclamar y ejecutar tareas")
+    worker.add_argument('--queue', default=os.environ.get('PVZ_QUEUE'), help="Archivo SQLite o URL del servidor")
+    worker.add_argument('--output', default='tesseract_output', help="tesseract_output compartido")
+    worker.add_argument('--fonts-dir', default=os.environ.get('PVZ_FONTS_DIR', 'Fuentes'))
+    worker.add_argument('--kinds', default=','.join(TASK_KINDS))
+    worker.add_argument('--scratch', help="Directorio local para las salidas antes de moverlas")
+    worker.add_argument('--lease', type=int, default=LEASE_SECONDS)
+    worker.add_argument('--max-tasks', type=int)
+    worker.add_argument('--exit-when-empty', action='store_true')
+    worker.add_argument('--quiet', action='store_true')
+    server = subparsers.add_parser('serve', help="Servir un archivo de cola por HTTP")
+    server.add_argument('--db', required=True)
+    server.add_argument('--host', default='127.0.0.1')
+    server.add_argument('--port', type=int, default=8765)
+    for name in ('status', 'retry'):
+        command = subparsers.add_parser(name)
+        command.add_argument('--queue', default=os.environ.get('PVZ_QUEUE'))
+        command.add_argument('--job', required=name == 'retry')
+    args = parser.parse_args()
+
+    if args.command == 'serve':
+        serve(args.db, args.host, args.port)
+        return 0
+    if not args.queue:
+        parser.error("falta --queue (o PVZ_QUEUE)")
+
+    if args.command == 'worker':
+        kinds = [kind for kind in args.kinds.split(',') if kind]
+        unknown = set(kinds) - set(TASK_KINDS)
+        if unknown:
+            parser.error(f"tipos de tarea desconocidos: {', '.join(sorted(unknown))}")
+        done = run_worker(args.queue, args.output, args.fonts_dir, kinds, args.scratch, args.lease,
+                          exit_when_empty=args.exit_when_empty, max_tasks=args.max_tasks,
+                          log=(lambda message: None) if args.quiet else print)
+        if not args.quiet:
+            print(f"{done} tareas completadas")
+        return 0
+
+    queue = open_queue(args.queue)
+    if args.command == 'retry':
+        print(f"{queue.retry_failed(args.job)} tareas fallidas vuelven a la cola")
+    elif args.job:
+        print(queue.job_status(args.job))
+        for failure in queue.failures(args.job):
+            print(f"  {failure['task_key']} ({failure['attempts']} intentos): {failure['error']}")
+    else:
+        print_jobs(queue)
+    queue.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())